@@ -0,0 +1,9 @@
+# GitHub CSV tools: one package behind the Streamlit entry scripts
+# Keep this module free of imports so a cold start only pays for the mode in use.
+
+# Mode name -> (label, module providing render())
+MODES = {
+    "editor": ("CSV Editor", "github_csv.editor"),
+    "appender": ("CSV Appender", "github_csv.appender"),
+    "token_checker": ("Token Checker", "github_csv.token_checker")
+}
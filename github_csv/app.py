@@ -0,0 +1,16 @@
+# Entry point shared by all modes; a mode's module is imported only when it is shown
+import importlib
+import streamlit as st
+from github_csv import MODES
+from github_csv.core import get_env_variable
+from github_csv.profiling import run_profiled, render_profiling_panel
+
+# Run one mode: the caller's choice, then APP_MODE from .env, then a sidebar picker
+def main(mode=None):
+    mode = mode or get_env_variable('APP_MODE')
+    if mode not in MODES:
+        mode = st.sidebar.selectbox(
+            "App mode:", list(MODES), format_func=lambda name: MODES[name][0]
+        )
+    run_profiled(importlib.import_module(MODES[mode][1]).render)
+    render_profiling_panel()
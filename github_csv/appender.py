@@ -0,0 +1,302 @@
+# Appender mode: append comma-separated lines to a CSV, locally or in a repository
+import os
+import csv
+import json
+import base64
+import streamlit as st
+from github_csv.core import (
+    GITHUB_API_URL, get_env_variable, get_headers, get_github_token, token_hash, fetch_file_entry
+)
+
+# Check if running locally or remotely
+def is_local():
+    return os.path.exists('test.csv')
+
+# The cached parse is reused while the file's sha, read from its directory listing, still matches
+def read_csv_file_remote(repo_owner, repo_name, file_path):
+    import requests
+
+    cached = get_parsed_files().get(parsed_key(repo_owner, repo_name, file_path))
+    if cached:
+        entry = fetch_file_entry(repo_owner, repo_name, file_path, get_headers())
+        if entry and entry.get('sha') == cached['sha']:
+            return cached['frame']
+
+    url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/contents/{file_path}"
+
+    # Add debug information
+    st.write("Attempting to access:", url)
+    st.write("Token exists:", bool(get_env_variable('GITHUB_TOKEN')))
+    st.write("Owner:", repo_owner)
+    st.write("Repo:", repo_name)
+
+    try:
+        response = requests.get(url, headers=get_headers())
+        if response.status_code == 200:
+            return parsed_file(repo_owner, repo_name, file_path, response.json())['frame']
+        else:
+            st.error(f"Failed to fetch file. Status code: {response.status_code}")
+            st.error(f"Response: {response.text}")
+            return None
+    except requests.exceptions.RequestException as e:
+        st.error(f"Network error: {str(e)}")
+        return None
+
+def read_csv_file_local():
+    import pandas as pd
+
+    try:
+        return pd.read_csv('test.csv')
+    except Exception as e:
+        st.error(f"Failed to read local CSV file: {str(e)}")
+        return None
+
+def read_csv_file(repo_owner, repo_name, file_path):
+    if is_local():
+        return read_csv_file_local()
+    else:
+        return read_csv_file_remote(repo_owner, repo_name, file_path)
+
+# Parsed copy of each remote CSV, kept in memory and extended by every append, so showing the
+# file after an append needs neither a download nor a parse
+@st.cache_resource
+def get_parsed_files():
+    return {}
+
+def parsed_key(repo_owner, repo_name, file_path):
+    return (token_hash(get_github_token()), repo_owner, repo_name, file_path)
+
+# The parsed file (frame, dialect, sha) for a Contents API entry; parsed again only when the sha changes
+# raw can be passed in when the file's bytes were already fetched
+def parsed_file(repo_owner, repo_name, file_path, file_info, raw=None):
+    from github_csv.csv_io import decode_csv
+
+    cache_key = parsed_key(repo_owner, repo_name, file_path)
+    cached = get_parsed_files().get(cache_key)
+    if cached and cached['sha'] == file_info['sha']:
+        return cached
+
+    df, dialect = decode_csv(file_info, raw=raw)
+    cached = {"sha": file_info['sha'], "frame": df, "dialect": dialect}
+    get_parsed_files()[cache_key] = cached
+    return cached
+
+# Keys already in each remote CSV, kept in memory and rebuilt only when the file's sha changes
+@st.cache_resource
+def get_key_sets():
+    return {}
+
+# The key set of a CSV's key column (the first column when key is empty) and the column's position
+def existing_keys(repo_owner, repo_name, file_path, parsed, key):
+    cache_key = parsed_key(repo_owner, repo_name, file_path) + (key,)
+    cached = get_key_sets().get(cache_key)
+    if cached and cached['sha'] == parsed['sha']:
+        return cached
+
+    df = parsed['frame']
+    column = key or df.columns[0]
+    if column not in df.columns:
+        raise ValueError(f"Key column {column!r} is not in the file.")
+    cached = {
+        "sha": parsed['sha'],
+        "position": list(df.columns).index(column),
+        "keys": set(df[column].astype('string').str.strip().dropna())
+    }
+    get_key_sets()[cache_key] = cached
+    return cached
+
+# Check a column of submitted values against the type the file's column was parsed as
+# values are the cells as read_csv reads them without types (missing cells are NaN). Returns the
+# typed values and a mask of the cells that do not fit: text in a number or true/false column,
+# fractions or gaps in an integer column. An all-empty column takes anything.
+def typed_values(values, column):
+    import pandas as pd
+
+    kind = column.dtype.kind
+    if (kind == 'f' and column.isna().all()) or kind not in 'iufb':
+        return values, pd.Series(False, index=values.index)
+    if kind == 'b':
+        lowered = values.str.strip().str.lower()
+        return lowered == "true", ~lowered.isin(["true", "false"])
+    numbers = pd.to_numeric(values.str.strip(), errors='coerce')
+    bad = numbers.isna() & values.notna()
+    if kind in 'iu':
+        bad |= values.isna() | (numbers % 1 != 0)
+        numbers = numbers.where(~bad, 0).astype(column.dtype)
+    return numbers, bad
+
+# Parse submitted lines against the file's header and column types in one pass
+# Returns the accepted lines, their rows typed like the file, and (line number, reason) for each
+# rejected line: a quoting error, a wrong number of fields or a value that does not fit its column.
+def parse_new_rows(new_data, parsed):
+    import io
+    import pandas as pd
+
+    df, dialect = parsed['frame'], parsed['dialect']
+    lines = [line for line in new_data.splitlines() if line.strip()]
+    reasons = [""] * len(lines)
+    for number, line in enumerate(lines):
+        try:
+            fields = next(csv.reader([line], delimiter=dialect['sep'], quotechar=dialect['quotechar'], strict=True))
+        except csv.Error as e:
+            reasons[number] = str(e)
+            continue
+        if len(fields) != len(df.columns):
+            reasons[number] = f"{len(fields)} field(s), the file has {len(df.columns)}"
+
+    # The well-formed lines are read together, with read_csv's handling of missing values
+    good = [number for number, reason in enumerate(reasons) if not reason]
+    cells = pd.read_csv(io.StringIO("\n".join(lines[number] for number in good)), header=None, names=list(df.columns),
+                        sep=dialect['sep'], quotechar=dialect['quotechar'], dtype=object,
+                        skip_blank_lines=False) if good else pd.DataFrame(columns=df.columns, dtype=object)
+    cells.index = good
+    rows = {}
+    for col in df.columns:
+        rows[col], bad = typed_values(cells[col], df[col])
+        for number in bad[bad].index:
+            reasons[number] = reasons[number] or f"{col} is not {'a number' if df[col].dtype.kind in 'iuf' else 'true or false'}"
+
+    accepted = [number for number in good if not reasons[number]]
+    rows = pd.DataFrame(rows).loc[accepted].reset_index(drop=True)
+    rejected = [(number + 1, reason) for number, reason in enumerate(reasons) if reason]
+    return [lines[number] for number in accepted], rows, rejected
+
+# Encode appended lines the way the file is written: in its encoding (without a second byte order
+# mark) and with its line terminator, starting on a new line and ending like the file does
+def encode_new_lines(raw, encoding, lines):
+    import codecs
+
+    if encoding == 'utf-8-sig':
+        encoding = 'utf-8'
+    elif encoding == 'utf-16':
+        encoding = 'utf-16-le' if raw.startswith(codecs.BOM_UTF16_LE) else 'utf-16-be'
+    newline = "\r\n" if "\r\n".encode(encoding) in raw else "\n"
+    ends_with_newline = raw.endswith(newline.encode(encoding))
+    text = newline.join(lines)
+    if raw and not ends_with_newline:
+        text = newline + text
+    if ends_with_newline:
+        text += newline
+    return text.encode(encoding)
+
+# Split parsed new rows into accepted ones and rejected keys: a key already in the file or earlier in the batch
+def split_new_lines(lines, rows, key_index):
+    keys = rows.iloc[:, key_index['position']].astype('string').str.strip().fillna("")
+    rejected = (keys.isin(key_index['keys']) | keys.duplicated()).to_numpy()
+    accepted = [line for line, reject in zip(lines, rejected) if not reject]
+    return accepted, rows[~rejected].reset_index(drop=True), list(keys[rejected]), set(keys[~rejected])
+
+def update_csv_file_remote(repo_owner, repo_name, file_path, new_data, reject_key=None):
+    import requests
+
+    # Get the current content of the file
+    url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/contents/{file_path}"
+
+    # Get the current file content
+    response = requests.get(url, headers=get_headers())
+    if response.status_code == 200:
+        file_info = response.json()
+
+        # Parse the new lines against the file's columns and types; malformed lines are dropped
+        try:
+            from github_csv.csv_io import file_bytes
+
+            raw = file_bytes(repo_owner, repo_name, file_path, file_info, get_headers())
+            parsed = parsed_file(repo_owner, repo_name, file_path, file_info, raw)
+        except Exception as e:
+            st.error(f"Failed to read the CSV file: {str(e)}")
+            return
+        accepted, rows, malformed = parse_new_rows(new_data, parsed)
+        if malformed:
+            st.warning(f"Rejected {len(malformed)} malformed line(s): "
+                       + "; ".join(f"line {number}: {reason}" for number, reason in malformed[:20]))
+
+        # Optionally drop lines whose key is already in the file
+        key_index, new_keys = None, set()
+        if reject_key is not None and accepted:
+            try:
+                key_index = existing_keys(repo_owner, repo_name, file_path, parsed, reject_key)
+            except Exception as e:
+                st.error(f"Failed to read keys: {str(e)}")
+                return
+            accepted, rows, rejected, new_keys = split_new_lines(accepted, rows, key_index)
+            if rejected:
+                st.warning(f"Rejected {len(rejected)} line(s) whose key already exists: {', '.join(rejected[:20])}")
+        if not accepted:
+            return
+        try:
+            new_bytes = encode_new_lines(raw, parsed['dialect']['encoding'], accepted)
+        except UnicodeEncodeError as e:
+            st.error(f"The new lines cannot be written in the file's encoding ({parsed['dialect']['encoding']}): {str(e)}")
+            return
+
+        # Prepare the data for the update
+        update_data = {
+            "message": "Update CSV file",
+            "content": base64.b64encode(raw + new_bytes).decode('utf-8'),
+            "sha": file_info['sha']  # Required to update the file
+        }
+        # Update the file
+        update_response = requests.put(url, headers=get_headers(), data=json.dumps(update_data))
+        if update_response.status_code == 200:
+            import pandas as pd
+
+            new_sha = update_response.json()['content']['sha']
+            if key_index is not None:
+                key_index['keys'].update(new_keys)
+                key_index['sha'] = new_sha
+            # The file is now the cached frame plus the new rows; no need to parse it again
+            get_parsed_files()[parsed_key(repo_owner, repo_name, file_path)] = dict(
+                parsed, sha=new_sha, frame=pd.concat([parsed['frame'], rows], ignore_index=True)
+            )
+            st.success("CSV file updated successfully! (remote)")
+        else:
+            st.error(f"Failed to update CSV file: {update_response.json()}")
+    else:
+        st.error(f"Failed to fetch file: {response.json()}")
+
+def update_csv_file_local(new_data):
+    try:
+        with open('test.csv', 'a') as f:
+            f.write('\n' + new_data)
+        st.success("CSV file updated successfully! (local)")
+    except Exception as e:
+        st.error(f"Failed to update local CSV file: {str(e)}")
+
+def update_csv_file(repo_owner, repo_name, file_path, new_data, reject_key=None):
+    if is_local():
+        update_csv_file_remote(repo_owner, repo_name, file_path, new_data, reject_key)
+        # update_csv_file_local(new_data)
+    else:
+        update_csv_file_remote(repo_owner, repo_name, file_path, new_data, reject_key)
+
+# Streamlit UI
+def render():
+    # GitHub repository details
+    repo_owner = get_env_variable('REPO_OWNER')  # Get owner from environment variable
+    repo_name = get_env_variable('REPO_NAME')  # Get repo name from environment variable
+    file_path = get_env_variable('FILE_PATH')  # Path to your CSV file in the repo
+
+    st.title("Update CSV File on GitHub")
+
+    # Input for new data
+    new_data = st.text_area("Enter new data to append to the CSV (comma-separated):")
+
+    # Optional duplicate-key guard
+    reject_existing = st.checkbox("Reject lines whose key already exists")
+    reject_key = None
+    if reject_existing:
+        reject_key = st.text_input("Key column (empty = first column):").strip()
+
+    if st.button("Update CSV"):
+        if new_data:
+            update_csv_file(repo_owner, repo_name, file_path, new_data, reject_key)
+        else:
+            st.error("Please enter some data.")
+
+    # Add button to read and display CSV
+    if st.button("Read and Display CSV"):
+        df = read_csv_file(repo_owner, repo_name, file_path)
+        if df is not None:
+            st.write("Current CSV Content:")
+            st.dataframe(df)
@@ -0,0 +1,298 @@
+# Bulk edits: vectorised operations over columns of the whole frame or of selected rows,
+# planned as one journal patch so a 50k-row change is a single undoable step
+import re
+import ast
+import operator
+import unicodedata
+import numpy as np
+import pandas as pd
+
+# Operations the bulk edit panel offers
+BULK_OPERATIONS = {
+    "replace": "Find and replace",
+    "formula": "Column formula",
+    "fill_down": "Fill down",
+    "cast": "Change type",
+    "normalise": "Normalise text"
+}
+
+# Types a column can be cast to
+CAST_TYPES = {
+    "number": "Number",
+    "integer": "Whole number",
+    "text": "Text",
+    "boolean": "True/false",
+    "date": "Date (YYYY-MM-DD)"
+}
+
+# Text normalisations, applied in this order
+NORMALISATIONS = {
+    "nfkc": "Full-width to half-width (Unicode NFKC)",
+    "strip": "Trim leading and trailing spaces",
+    "collapse": "Collapse repeated whitespace",
+    "lower": "Lower case",
+    "upper": "Upper case",
+    "title": "Title case"
+}
+
+# Row conditions for a selection
+SELECTION_OPERATORS = ["=", "≠", "<", "≤", ">", "≥", "contains", "matches regex", "is empty", "is not empty"]
+
+# Rows shown in a bulk edit preview
+BULK_PREVIEW_ROWS = 1000
+
+# Text spellings read as true or false when casting to boolean
+BOOLEAN_TEXT = {"true": True, "yes": True, "y": True, "1": True,
+                "false": False, "no": False, "n": False, "0": False}
+
+# Mask of the rows a condition selects; None as column selects every row
+# Comparisons are numeric when both the column and the value are numbers, otherwise textual.
+def select_rows(df, column=None, operator=None, value=""):
+    if column is None:
+        return np.ones(len(df), dtype=bool)
+    values = df[column]
+    if operator == "is empty":
+        mask = values.isna() | (values.astype('string').str.strip() == "")
+    elif operator == "is not empty":
+        mask = values.notna() & (values.astype('string').str.strip() != "")
+    elif operator == "contains":
+        mask = values.astype('string').str.contains(value, regex=False)
+    elif operator == "matches regex":
+        mask = values.astype('string').str.contains(check_regex(value), regex=True)
+    else:
+        number = pd.to_numeric(pd.Series([value]), errors='coerce')[0]
+        if pd.api.types.is_numeric_dtype(values) and not pd.isna(number):
+            left, right = values, number
+        else:
+            left, right = values.astype('string'), value
+        mask = {"=": left == right, "≠": left != right, "<": left < right,
+                "≤": left <= right, ">": left > right, "≥": left >= right}[operator]
+    return mask.fillna(False).to_numpy(dtype=bool)
+
+# A regular expression typed by the user, checked up front; raises ValueError when it is invalid
+def check_regex(pattern):
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        raise ValueError(f"Invalid regular expression {pattern!r}: {e}")
+    return pattern
+
+# Numbers from values or text, as plain float64/int64; anything else becomes NaN
+def to_number(value):
+    if isinstance(value, pd.Series):
+        return pd.to_numeric(value.astype(object), errors='coerce')
+    return pd.to_numeric(value, errors='coerce')
+
+# Apply a text function once per distinct value and spread the results back over the rows
+# Columns repeat a few values many times, so this is far cheaper than working on every row.
+def per_value(values, func):
+    codes, uniques = pd.factorize(values)
+    results = func(pd.Series(uniques, dtype='string'))
+    return pd.Series(results.to_numpy(dtype=object)[codes], index=values.index, dtype='string').where(codes >= 0)
+
+# Put text results back into a numeric column's type when every value still reads as a number
+def restore_type(new, old):
+    if pd.api.types.is_numeric_dtype(old) and not pd.api.types.is_bool_dtype(old):
+        numbers = to_number(new)
+        if not (numbers.isna() & new.notna()).any():
+            return numbers
+    return new.astype(object)
+
+# Find and replace in the text of each cell; literal or regex, optionally whole cells only
+def replace_values(values, find, replace, regex=False, whole_cell=False, case=True):
+    if regex:
+        check_regex(find)
+
+    def replace_text(text):
+        if not whole_cell:
+            return text.str.replace(find, replace, regex=regex, case=case)
+        if regex:
+            matched = text.str.fullmatch(find, case=case).fillna(False)
+            return text.where(~matched, text.str.replace(find, replace, regex=True, case=case))
+        matched = (text == find) if case else (text.str.lower() == find.lower())
+        return text.where(~matched.fillna(False), replace)
+
+    return restore_type(per_value(values, replace_text), values)
+
+# Arithmetic a formula may use; + joins text when either side is text
+FORMULA_OPERATORS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow
+}
+
+# Functions a formula may call, each over a whole column at once
+FORMULA_FUNCTIONS = {
+    "round": lambda x, digits=0: to_number(x).round(int(digits)),
+    "abs": lambda x: to_number(x).abs(),
+    "number": lambda x: to_number(x),
+    "text": lambda x: as_text(x),
+    "upper": lambda x: as_text(x).str.upper(),
+    "lower": lambda x: as_text(x).str.lower(),
+    "strip": lambda x: as_text(x).str.strip(),
+    "len": lambda x: as_text(x).str.len()
+}
+
+# Text view of a formula value; numbers read as they would in the CSV
+def as_text(value):
+    if isinstance(value, pd.Series):
+        return value.astype('string')
+    if isinstance(value, np.floating) and value.is_integer():
+        # Constants are float64, but 'A' + 1 should still read A1
+        return str(int(value))
+    return str(value)
+
+def is_text(value):
+    if isinstance(value, pd.Series):
+        return value.dtype == object or isinstance(value.dtype, pd.StringDtype)
+    return isinstance(value, str)
+
+# Evaluate a formula over the frame's columns, e.g. "B * 1.1", "A + ' ' + C" or "round(B / 3, 2)"
+# Columns are named bare or, when the name is not an identifier, in backticks. Only arithmetic,
+# constants and FORMULA_FUNCTIONS are allowed. Raises ValueError for anything else.
+# Numeric constants are float64, so 9 ** 9 ** 9 overflows to inf at once instead of building a
+# huge Python integer, which is reported as an error; text only joins with +, so 'x' * 10 ** 9
+# cannot allocate a huge string.
+def evaluate_formula(df, formula):
+    names = {}
+
+    def placeholder(match):
+        names[f"column_{len(names)}"] = match.group(1)
+        return f"column_{len(names) - 1}"
+
+    try:
+        tree = ast.parse(re.sub(r"`([^`]*)`", placeholder, formula).strip(), mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Formula could not be read: {e.msg}")
+
+    def evaluate(node):
+        if isinstance(node, ast.Expression):
+            return evaluate(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            try:
+                return np.float64(node.value)
+            except OverflowError:
+                raise ValueError(f"Number too large: {ast.unparse(node)}")
+        if isinstance(node, ast.Name):
+            column = names.get(node.id, node.id)
+            if column not in df.columns:
+                raise ValueError(f"Unknown column: {column}")
+            return df[column]
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            value = to_number(evaluate(node.operand))
+            return -value if isinstance(node.op, ast.USub) else value
+        if isinstance(node, ast.BinOp) and type(node.op) in FORMULA_OPERATORS:
+            left, right = evaluate(node.left), evaluate(node.right)
+            if isinstance(node.op, ast.Add) and (is_text(left) or is_text(right)):
+                return as_text(left) + as_text(right)
+            if isinstance(left, str) or isinstance(right, str):
+                raise ValueError(f"Text can only be joined with +; found {ast.unparse(node)!r}")
+            if is_text(left) and isinstance(left, pd.Series):
+                left = to_number(left)
+            if is_text(right) and isinstance(right, pd.Series):
+                right = to_number(right)
+            return FORMULA_OPERATORS[type(node.op)](left, right)
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FORMULA_FUNCTIONS
+                and not node.keywords):
+            return FORMULA_FUNCTIONS[node.func.id](*[evaluate(arg) for arg in node.args])
+        raise ValueError(f"Formulas may only use columns, numbers, text, arithmetic and "
+                         f"{', '.join(FORMULA_FUNCTIONS)}(); found {ast.unparse(node)!r}")
+
+    try:
+        with np.errstate(all='raise'):
+            result = evaluate(tree)
+    except (TypeError, ZeroDivisionError, OverflowError, FloatingPointError) as e:
+        raise ValueError(f"Formula could not be evaluated: {e}")
+    if not isinstance(result, pd.Series):
+        result = pd.Series([result] * len(df), index=df.index)
+    return result
+
+# Cast values to a type; values that do not convert become empty
+def cast_values(values, cast_type):
+    if cast_type in ("number", "integer"):
+        # Thousands separators and stray spaces are common in hand-edited numbers
+        numbers = to_number(per_value(values, lambda text: text.str.replace(",", "").str.strip()))
+        return numbers if cast_type == "number" else numbers.round().astype('Int64')
+    if cast_type == "text":
+        return values.astype('string').astype(object)
+    if cast_type == "boolean":
+        return per_value(values, lambda text: text.str.strip().str.lower()).map(BOOLEAN_TEXT).astype(object)
+    if cast_type == "date":
+        return pd.to_datetime(values, errors='coerce').dt.strftime('%Y-%m-%d').astype(object)
+    raise ValueError(f"Unknown type: {cast_type}")
+
+# Apply the chosen normalisations to text values, in NORMALISATIONS order
+def normalise_values(values, normalisations):
+    def normalise(text):
+        if "nfkc" in normalisations:
+            text = pd.Series([unicodedata.normalize('NFKC', value) for value in text], dtype='string')
+        if "strip" in normalisations:
+            text = text.str.strip()
+        if "collapse" in normalisations:
+            text = text.str.replace(r"\s+", " ", regex=True)
+        for case in ("lower", "upper", "title"):
+            if case in normalisations:
+                text = getattr(text.str, case)()
+        return text
+
+    return restore_type(per_value(values, normalise), values)
+
+# Plan a bulk edit of columns over the selected rows as one patch step
+# params holds the operation's settings. Returns the step, the changed cell and row counts and
+# a before/after preview of the changed rows. Raises ValueError for unusable settings.
+def plan_bulk(df, operation, columns, mask, params):
+    if not columns:
+        raise ValueError("Pick at least one column to change.")
+    selected = df[mask]
+    new = pd.DataFrame(index=selected.index)
+    for col in columns:
+        values = selected[col]
+        if operation == "replace":
+            if not params.get('find'):
+                raise ValueError("Enter the text to find.")
+            result = replace_values(values, params['find'], params.get('replace', ""), params.get('regex', False),
+                                    params.get('whole_cell', False), params.get('case', True))
+        elif operation == "formula":
+            result = evaluate_formula(selected, params.get('formula', ""))
+            if (pd.api.types.is_integer_dtype(values) and result.dtype.kind == 'f'
+                    and np.isfinite(result).all() and (result % 1 == 0).all()):
+                # Constants are float64; whole results keep an integer column's type
+                result = result.astype(values.dtype)
+        elif operation == "fill_down":
+            # Fill from the nearest non-empty cell above, which may lie outside the selection
+            filled = df[col].mask((df[col].astype('string').str.strip() == "").fillna(False)).ffill()
+            result = filled[mask]
+        elif operation == "cast":
+            result = cast_values(values, params['cast_type'])
+        elif operation == "normalise":
+            result = normalise_values(values, params.get('normalisations', []))
+        else:
+            raise ValueError(f"Unknown operation: {operation}")
+        if result.dtype == object or isinstance(result.dtype, pd.StringDtype):
+            # Text goes back as plain objects with NaN for missing, like a parsed CSV
+            result = result.astype(object).where(result.notna(), np.nan)
+        new[col] = result.set_axis(new.index)
+
+    old = selected[columns].astype(object)
+    compared = new.astype(object).where(new.notna(), np.nan)
+    changed_cells = ~((old == compared) | (old.isna() & compared.isna()))
+    rows = changed_cells.any(axis=1).to_numpy()
+    if operation == "cast" and mask.all():
+        # Casting a whole column changes its type even where the values compare equal (57.0 and 57),
+        # so the patch covers every row and the column is replaced as a whole
+        rows = np.ones(len(selected), dtype=bool)
+    step = []
+    if rows.any():
+        step.append({"op": "patch", "rows": list(old.index[rows]),
+                     "old": selected.loc[rows, columns], "new": new[rows]})
+
+    preview = pd.concat({"before": old[rows].head(BULK_PREVIEW_ROWS),
+                         "after": compared[rows].head(BULK_PREVIEW_ROWS)}, axis=1)
+    return {
+        "step": step,
+        "selected": int(mask.sum()),
+        "rows": int(rows.sum()),
+        "changed_cells": int(changed_cells.to_numpy().sum()),
+        "preview": preview
+    }
@@ -0,0 +1,319 @@
+# Shared core: environment, token handling and the GitHub checks every mode starts with
+# Only lightweight modules are imported here; requests and pandas are imported where used.
+import os
+import copy
+import time
+import hashlib
+import streamlit as st
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Get environment variables with proper error handling
+def get_env_variable(var_name, default_value=""):
+    value = os.getenv(var_name)
+    return value if value else default_value
+
+# How long token and repository checks are reused across sessions (seconds)
+VALIDATION_CACHE_TTL = int(get_env_variable('VALIDATION_CACHE_TTL', '600'))
+
+# GitHub REST API base URL; point it at GitHub Enterprise or a local stand-in
+GITHUB_API_URL = get_env_variable('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+
+# Backend for the setup checks: 'rest' (a call per step) or 'graphql' (repository and file
+# in one query); everything after the load uses REST either way
+GITHUB_BACKEND = get_env_variable('GITHUB_BACKEND', 'rest')
+
+# Session state shared by every mode
+BASE_SESSION_STATE = {
+    "token_checked": False,
+    "token_valid": False,
+    "repo_checked": False,
+    "repo_valid": False,
+    "file_checked": False,
+    "file_valid": False
+}
+
+# Initialize session state variables that are not set yet
+def init_session_state(defaults):
+    for key, value in defaults.items():
+        if key not in st.session_state:
+            st.session_state[key] = copy.deepcopy(value)
+
+# Get GitHub token - first try from environment, then from session state
+def get_github_token():
+    return get_env_variable('GITHUB_TOKEN') or st.session_state.get('github_token', '')
+
+# If token not available in env or session, ask user
+def prompt_for_token():
+    github_token = get_github_token()
+    if not github_token:
+        github_token = st.text_input("Enter your GitHub Personal Access Token:", type="password")
+        if github_token:
+            st.session_state.github_token = github_token
+    return github_token
+
+# Helper function to create headers
+def get_headers():
+    return {
+        "Authorization": f"token {get_github_token()}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+
+# Hash the token so cache keys never hold it in plain text
+def token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+# Validate a token once per TTL for the whole process
+# Failed checks raise requests.HTTPError, so they are never cached
+@st.cache_data(ttl=VALIDATION_CACHE_TTL, show_spinner=False)
+def fetch_token_info(token_key, _headers):
+    import requests
+
+    response = requests.get(f"{GITHUB_API_URL}/user", headers=_headers)
+    response.raise_for_status()
+
+    scopes = response.headers.get('X-OAuth-Scopes', '')
+    return {
+        "user_data": response.json(),
+        "scopes": [scope.strip() for scope in scopes.split(',') if scope.strip()],
+        "expires": response.headers.get('GitHub-Authentication-Token-Expiration'),
+        "checked_at": time.time()
+    }
+
+# Current rate limits, fetched on every check: they change with each call, and /rate_limit
+# itself does not count against them. None when the request fails.
+def fetch_rate_limit(headers):
+    import requests
+
+    try:
+        response = requests.get(f"{GITHUB_API_URL}/rate_limit", headers=headers)
+    except requests.RequestException:
+        return None
+    return response.json() if response.status_code == 200 else None
+
+# Check repository access once per TTL per token and owner/repo
+@st.cache_data(ttl=VALIDATION_CACHE_TTL, show_spinner=False)
+def fetch_repo_info(token_key, repo_owner, repo_name, _headers):
+    import requests
+
+    repo_url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}"
+    response = requests.get(repo_url, headers=_headers)
+    response.raise_for_status()
+    return response.json()
+
+# Fetch a file's Contents API entry, optionally from a branch
+# Takes explicit headers so it can run on worker threads. With an etag the request is
+# conditional: an unchanged file answers 304, which does not count against the rate limit.
+def fetch_file(repo_owner, repo_name, file_path, headers, branch=None, etag=None):
+    import requests
+
+    file_url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/contents/{file_path}"
+    params = {"ref": branch} if branch else None
+    if etag:
+        headers = dict(headers, **{"If-None-Match": etag})
+    return requests.get(file_url, headers=headers, params=params)
+
+# Download a file's bytes with the raw media type; the Contents JSON carries no content over 1 MB
+# stream=True leaves the body unread, for callers that copy it to disk
+def fetch_file_raw(repo_owner, repo_name, file_path, headers, branch=None, stream=False):
+    import requests
+
+    file_url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/contents/{file_path}"
+    params = {"ref": branch} if branch else None
+    return requests.get(file_url, headers=dict(headers, Accept="application/vnd.github.raw"), params=params,
+                        stream=stream)
+
+# Read a file's entry (name, size, sha) from its directory listing, without downloading it
+# Returns None if it is not listed
+def fetch_file_entry(repo_owner, repo_name, file_path, headers, branch=None):
+    import requests
+    import posixpath
+
+    directory, name = posixpath.split(file_path)
+    listing_url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/contents/{directory}"
+    response = requests.get(listing_url, headers=headers, params={"ref": branch} if branch else None)
+    if response.status_code != 200 or not isinstance(response.json(), list):
+        return None
+    return next((entry for entry in response.json() if entry.get('name') == name), None)
+
+# Read a file's size from its directory listing, without downloading it; None if it is not listed
+def fetch_file_size(repo_owner, repo_name, file_path, headers, branch=None):
+    entry = fetch_file_entry(repo_owner, repo_name, file_path, headers, branch)
+    return entry.get('size') if entry else None
+
+# Fetch only the first max_bytes of a file over the raw media type with an HTTP Range header
+# If the server ignores the range, the body is streamed and cut off after max_bytes.
+# Returns (status code, bytes, whether the file continues, total size if known, error text)
+def fetch_file_head(repo_owner, repo_name, file_path, headers, max_bytes, branch=None):
+    import requests
+
+    file_url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/contents/{file_path}"
+    params = {"ref": branch} if branch else None
+    raw_headers = dict(headers, Accept="application/vnd.github.raw", Range=f"bytes=0-{max_bytes - 1}")
+    with requests.get(file_url, headers=raw_headers, params=params, stream=True) as response:
+        if response.status_code not in (200, 206):
+            return response.status_code, b"", False, None, response.text
+
+        head = bytearray()
+        for chunk in response.iter_content(chunk_size=16 * 1024):
+            head.extend(chunk)
+            if len(head) >= max_bytes:
+                break
+
+        # Content-Range looks like "bytes 0-65535/123456789"
+        content_range = response.headers.get('Content-Range', '')
+        if '/' in content_range and content_range.rsplit('/', 1)[1].isdigit():
+            total_size = int(content_range.rsplit('/', 1)[1])
+        elif response.status_code == 200 and response.headers.get('Content-Length', '').isdigit():
+            total_size = int(response.headers['Content-Length'])
+        else:
+            total_size = None
+
+    truncated = len(head) >= max_bytes if total_size is None else total_size > max_bytes
+    return response.status_code, bytes(head[:max_bytes]), truncated, total_size, ""
+
+# Check token function
+# With the GraphQL backend the same call also checks the repository and fetches file_path.
+def check_token(file_path=None):
+    if GITHUB_BACKEND == "graphql":
+        from github_csv.graphql import check_setup
+        return check_setup(file_path)
+    validate_token()
+
+# Validate the token through the per-process cache and refresh the rate limits; both backends
+# use it. Returns whether the token is valid.
+def validate_token():
+    import requests
+
+    st.session_state.token_checked = True
+    try:
+        token_info = fetch_token_info(token_hash(get_github_token()), get_headers())
+    except requests.HTTPError as e:
+        st.session_state.token_valid = False
+        st.session_state.user_error = e.response.text
+        return False
+
+    st.session_state.token_valid = True
+    st.session_state.token_info = token_info
+    st.session_state.user_data = token_info['user_data']
+    rate_data = fetch_rate_limit(get_headers())
+    if rate_data:
+        st.session_state.rate_data = rate_data
+    return True
+
+# Check repository function
+def check_repository(repo_owner, repo_name):
+    import requests
+
+    st.session_state.repo_checked = True
+    try:
+        st.session_state.repo_data = fetch_repo_info(
+            token_hash(get_github_token()), repo_owner, repo_name, get_headers()
+        )
+        st.session_state.repo_valid = True
+    except requests.HTTPError as e:
+        st.session_state.repo_valid = False
+        st.session_state.repo_error = e.response.text
+
+# Reset function
+def reset_all():
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    st.rerun()  # Updated from st.experimental_rerun()
+
+# Display environment variable status
+def render_env_status():
+    with st.expander("Environment Variables Status"):
+        st.write("GitHub Token:", "Available ✅" if get_github_token() else "Not set ❌")
+        st.write("Repository Owner:", "Available ✅" if get_env_variable('REPO_OWNER') else "Not set ❌")
+        st.write("Repository Name:", "Available ✅" if get_env_variable('REPO_NAME') else "Not set ❌")
+        st.write("CSV File Path:", "Available ✅" if get_env_variable('FILE_PATH') else "Not set ❌")
+
+# Step 1: token test section
+# file_path is the file the mode will load, for backends that fetch it along with the token
+def render_token_step(details=False, file_path=None):
+    st.subheader("Step 1: Test Token Authorization")
+    if not st.session_state.token_checked:
+        if st.button("Test Token Authorization"):
+            with st.spinner("Checking token..."):
+                check_token(file_path)
+
+    if st.session_state.token_checked:
+        if st.session_state.token_valid:
+            st.success("✅ Token is valid and working!")
+            if details and st.session_state.get('rate_data'):
+                rate_data = st.session_state.rate_data
+                # The GraphQL backend reports its own quota instead of the REST core one
+                rate = rate_data['resources'].get('core') or rate_data['rate']
+                st.write(f"API Rate Limit: {rate['limit']}")
+                st.write(f"Remaining Calls: {rate['remaining']}")
+            if st.session_state.get('user_data'):
+                user_data = st.session_state.user_data
+                st.write(f"Authenticated as: {user_data['login']}")
+                if details:
+                    st.write(f"User ID: {user_data.get('id', 'N/A')}")
+                    if user_data.get('name'):
+                        st.write(f"Name: {user_data['name']}")
+            if st.session_state.get('token_info'):
+                token_info = st.session_state.token_info
+                st.write("Scopes:", ", ".join(token_info['scopes']) or "None reported")
+                if token_info['expires']:
+                    st.write("Token expires:", token_info['expires'])
+                st.caption(f"Checked {int(time.time() - token_info['checked_at'])}s ago (cached for {VALIDATION_CACHE_TTL}s)")
+        else:
+            st.error("❌ Token authorization failed!")
+            if st.session_state.get('user_error'):
+                st.text(st.session_state.user_error)
+
+# Step 2: repository test section; calls on_valid(owner, repo) right after a successful check
+def render_repo_step(details=False, on_valid=None):
+    st.subheader("Step 2: Test Repository Access")
+
+    # Get repo values from env or session state, then fallback to input
+    repo_owner_default = get_env_variable('REPO_OWNER')
+    repo_name_default = get_env_variable('REPO_NAME')
+
+    # Save repo details in session state
+    if 'repo_owner' not in st.session_state and repo_owner_default:
+        st.session_state.repo_owner = repo_owner_default
+    if 'repo_name' not in st.session_state and repo_name_default:
+        st.session_state.repo_name = repo_name_default
+
+    col1, col2 = st.columns(2)
+    with col1:
+        repo_owner = st.text_input(
+            "Repository Owner:",
+            value=st.session_state.get('repo_owner', repo_owner_default)
+        )
+        if repo_owner:
+            st.session_state.repo_owner = repo_owner
+
+    with col2:
+        repo_name = st.text_input(
+            "Repository Name:",
+            value=st.session_state.get('repo_name', repo_name_default)
+        )
+        if repo_name:
+            st.session_state.repo_name = repo_name
+
+    if repo_owner and repo_name and not st.session_state.repo_checked:
+        if st.button("Test Repository Access"):
+            with st.spinner("Checking repository access..."):
+                check_repository(repo_owner, repo_name)
+                if st.session_state.repo_valid and on_valid:
+                    on_valid(repo_owner, repo_name)
+
+    if st.session_state.repo_checked:
+        if st.session_state.repo_valid:
+            st.success(f"✅ Successfully accessed repository: {repo_owner}/{repo_name}")
+            if details and st.session_state.get('repo_data'):
+                st.write(f"Repository ID: {st.session_state.repo_data.get('id', 'N/A')}")
+                st.write(f"Default Branch: {st.session_state.repo_data.get('default_branch', 'N/A')}")
+        else:
+            st.error(f"❌ Failed to access repository: {repo_owner}/{repo_name}")
+            if st.session_state.get('repo_error'):
+                st.text(st.session_state.repo_error)
+
+    return repo_owner, repo_name
@@ -0,0 +1,377 @@
+# Reading and writing CSV payloads: dialect sniffing, parse engine choice and Contents API content
+# pandas is imported here, so callers import this module only once a CSV is actually parsed.
+import io
+import os
+import csv
+import json
+import time
+import base64
+import codecs
+import datetime
+import tempfile
+import pandas as pd
+from github_csv.core import get_env_variable, fetch_file, fetch_file_head, fetch_file_raw
+from github_csv.workers import offload
+
+# Bytes read to sniff a CSV's encoding and dialect
+SNIFF_BYTES = 16 * 1024
+
+# Bytes fetched for a head preview or a header read
+PREVIEW_BYTES = int(get_env_variable('PREVIEW_BYTES', str(64 * 1024)))
+
+# Rows serialised at a time when writing CSV, Parquet or Excel
+EXPORT_CHUNK_ROWS = int(get_env_variable('EXPORT_CHUNK_ROWS', '50000'))
+
+# Commit payloads larger than this are spooled to a temporary file instead of memory
+COMMIT_SPOOL_BYTES = int(get_env_variable('COMMIT_SPOOL_BYTES', str(8 * 1024 * 1024)))
+
+# Export formats: label and MIME type
+EXPORT_FORMATS = {
+    "csv": ("CSV", "text/csv"),
+    "parquet": ("Parquet", "application/vnd.apache.parquet"),
+    "xlsx": ("Excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+}
+
+# Excel sheets stop at 1,048,576 rows including the header
+EXCEL_MAX_ROWS = 1048575
+
+# Dialect used when a frame has no source file
+DEFAULT_DIALECT = {"encoding": "utf-8", "sep": ",", "quotechar": '"', "header": True}
+
+# Sniff encoding, delimiter and quote character from the first few KB of a CSV
+# The first row is taken as the header unless the caller says otherwise: the Sniffer's guess
+# calls any all-text file (or one with non-ASCII column names) header-less.
+def sniff_csv(raw, header=True):
+    sample = raw[:SNIFF_BYTES]
+
+    # BOMs are decisive; otherwise take the first encoding that decodes the sample
+    if sample.startswith(codecs.BOM_UTF8):
+        encoding = 'utf-8-sig'
+    elif sample.startswith(codecs.BOM_UTF16_LE) or sample.startswith(codecs.BOM_UTF16_BE):
+        encoding = 'utf-16'
+    else:
+        encoding = 'latin-1'
+        for candidate in ('utf-8', 'cp932', 'euc-jp'):
+            try:
+                # The sample may end mid-character, so decode it as an unfinished stream
+                codecs.getincrementaldecoder(candidate)().decode(sample, final=False)
+                encoding = candidate
+                break
+            except UnicodeDecodeError:
+                continue
+
+    text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample, final=False)
+    if len(raw) > SNIFF_BYTES and '\n' in text:
+        # Only sniff whole lines
+        text = text[:text.rindex('\n')]
+
+    dialect = {"encoding": encoding, "sep": ",", "quotechar": '"', "header": header}
+    try:
+        sniffed = csv.Sniffer().sniff(text, delimiters=',;\t|')
+        dialect['sep'] = sniffed.delimiter
+        dialect['quotechar'] = sniffed.quotechar or '"'
+    except csv.Error:
+        pass
+    return dialect
+
+# Parse engines usable here, fastest first; pyarrow parses on all cores
+def available_engines():
+    engines = ['c', 'python']
+    try:
+        import pyarrow  # noqa: F401
+        engines.insert(0, 'pyarrow')
+    except ImportError:
+        pass
+    return engines
+
+# Parse raw CSV bytes with a sniffed dialect, preferring CSV_ENGINE or the fastest engine
+# A projection {"columns": [...], "start": n, "nrows": n} limits parsing to part of the file;
+# projected rows keep their position in the file as index labels.
+def parse_csv(raw, dialect, engine=None, projection=None):
+    engine = engine or get_env_variable('CSV_ENGINE') or available_engines()[0]
+    kwargs = {
+        "sep": dialect['sep'],
+        "quotechar": dialect['quotechar'],
+        "encoding": dialect['encoding'],
+        "header": 0 if dialect['header'] else None
+    }
+
+    start = 0
+    if projection:
+        if projection.get('columns'):
+            # Without a header row, columns are addressed by position
+            kwargs['usecols'] = (projection['columns'] if dialect['header']
+                                 else [int(col) for col in projection['columns']])
+        start = projection.get('start') or 0
+        if start:
+            # Skip data rows but keep the header row
+            kwargs['skiprows'] = range(1, start + 1) if dialect['header'] else start
+        if projection.get('nrows'):
+            kwargs['nrows'] = projection['nrows']
+        if start or projection.get('nrows'):
+            # pyarrow cannot stop early or skip a row range
+            engine = 'c'
+
+    try:
+        df = pd.read_csv(io.BytesIO(raw), engine=engine, **kwargs)
+    except Exception:
+        if engine == 'c':
+            raise
+        # pyarrow rejects some inputs the C parser handles
+        df = pd.read_csv(io.BytesIO(raw), engine='c', **kwargs)
+    if engine != 'c':
+        df = reread_as_text(raw, kwargs, df)
+    if not dialect['header']:
+        # The data editor reports column names as strings
+        df.columns = [str(col) for col in df.columns]
+    if start:
+        df.index = pd.RangeIndex(start, start + len(df))
+    return df
+
+# pyarrow turns ISO dates and times into datetime values, which are written back in another
+# format; re-read those columns with the C parser so they stay the text they were
+def reread_as_text(raw, kwargs, df):
+    columns = [col for col in df.columns if df[col].dtype.kind in 'Mm' or is_date_column(df[col])]
+    if not columns:
+        return df
+    text = pd.read_csv(io.BytesIO(raw), engine='c', **dict(kwargs, usecols=columns))
+    for col in columns:
+        df[col] = text[col]
+    return df
+
+# An object column pyarrow filled with dates or times of day
+def is_date_column(values):
+    values = values.dropna()
+    return values.dtype == object and len(values) > 0 and isinstance(values.iloc[0], (datetime.date, datetime.time))
+
+# Cut a projection out of an already parsed frame
+def project_frame(df, projection):
+    start = projection.get('start') or 0
+    stop = start + projection['nrows'] if projection.get('nrows') else None
+    columns = [col for col in df.columns if col in projection['columns']] if projection.get('columns') else df.columns
+    return df.loc[:, columns].iloc[start:stop].copy()
+
+# Read only the header row, so picking columns costs almost nothing
+def read_csv_header(raw, dialect):
+    if not dialect['header']:
+        first_line = parse_csv(raw, dialect, engine='c', projection={"nrows": 1})
+        return list(first_line.columns)
+    header = pd.read_csv(io.BytesIO(raw), sep=dialect['sep'], quotechar=dialect['quotechar'],
+                         encoding=dialect['encoding'], nrows=0)
+    return list(header.columns)
+
+# Time every available engine on the same bytes
+def benchmark_engines(raw, dialect):
+    results = []
+    for engine in available_engines():
+        start = time.perf_counter()
+        try:
+            df = parse_csv(raw, dialect, engine=engine)
+            results.append({"engine": engine, "seconds": round(time.perf_counter() - start, 4),
+                            "rows": len(df), "columns": len(df.columns)})
+        except Exception as e:
+            results.append({"engine": engine, "seconds": None, "rows": None, "columns": None,
+                            "error": str(e)})
+    return results
+
+# Decode a Contents API entry into a DataFrame and the dialect it was written in
+# raw can be passed in when the entry had no inline content (files over 1 MB)
+# Large files are parsed in a worker process.
+def decode_csv(file_data, projection=None, raw=None, header=True):
+    raw = base64.b64decode(file_data['content']) if raw is None else raw
+    dialect = sniff_csv(raw, header)
+    if offload(size=len(raw)):
+        from github_csv.workers import run_parse
+        return run_parse(raw, dialect, projection), dialect
+    return parse_csv(raw, dialect, projection=projection), dialect
+
+# Bytes of a file from its Contents API entry, downloading them raw when the entry has none
+def file_bytes(repo_owner, repo_name, file_path, file_data, headers, branch=None):
+    if file_data.get('content') or not file_data.get('size'):
+        return base64.b64decode(file_data.get('content', ''))
+    response = fetch_file_raw(repo_owner, repo_name, file_path, headers, branch)
+    response.raise_for_status()
+    return response.content
+
+# Blocks of rows to write: slices of a DataFrame, or the frames of an iterator that already
+# yields blocks (an out-of-core mirror streams its rows this way)
+def frame_chunks(data, chunk_rows=None):
+    if not isinstance(data, pd.DataFrame):
+        yield from data
+        return
+    chunk_rows = chunk_rows or EXPORT_CHUNK_ROWS
+    for start in range(0, max(len(data), 1), chunk_rows):
+        yield data.iloc[start:start + chunk_rows]
+
+# Serialise a DataFrame (or an iterator of frames) as CSV bytes in a dialect, one block at a time
+# The incremental encoder writes a byte order mark (utf-8-sig) once, at the very start.
+def iter_csv_chunks(df, dialect=None, chunk_rows=None):
+    dialect = dialect or DEFAULT_DIALECT
+    encoder = codecs.getincrementalencoder(dialect['encoding'])()
+    for number, chunk in enumerate(frame_chunks(df, chunk_rows)):
+        text = chunk.to_csv(
+            index=False, sep=dialect['sep'], quotechar=dialect['quotechar'],
+            header=dialect['header'] and number == 0
+        )
+        yield encoder.encode(text)
+    tail = encoder.encode("", final=True)
+    if tail:
+        yield tail
+
+# Base64-encode a stream of byte chunks without joining them first
+def iter_base64_chunks(chunks):
+    leftover = b""
+    for chunk in chunks:
+        chunk = leftover + chunk
+        cut = len(chunk) - len(chunk) % 3
+        leftover = chunk[cut:]
+        if cut:
+            yield base64.b64encode(chunk[:cut])
+    if leftover:
+        yield base64.b64encode(leftover)
+
+# Build a Contents API PUT body for a DataFrame (or an iterator of frames) without holding the CSV, its base64 and the
+# JSON as three full strings: chunks are written straight into a spooled temporary file.
+# fields holds the other body fields (message, sha, branch). Returns the file, rewound.
+# Large frames are serialised in a worker process.
+def commit_payload(df, dialect, fields):
+    if isinstance(df, pd.DataFrame) and offload(rows=len(df)):
+        from github_csv.workers import run_payload
+        return run_payload(df, dialect, fields)
+    body = tempfile.SpooledTemporaryFile(max_size=COMMIT_SPOOL_BYTES)
+    body.write(json.dumps(fields)[:-1].encode() + b', "content": "')
+    for chunk in iter_base64_chunks(iter_csv_chunks(df, dialect)):
+        body.write(chunk)
+    body.write(b'"}')
+    body.seek(0)
+    return body
+
+# Export formats usable here; Parquet needs pyarrow and Excel needs openpyxl
+def available_export_formats():
+    formats = ['csv']
+    for name, module in (('parquet', 'pyarrow'), ('xlsx', 'openpyxl')):
+        try:
+            __import__(module)
+            formats.append(name)
+        except ImportError:
+            pass
+    return formats
+
+# Write a DataFrame as Parquet, one row group per chunk
+# Text columns are written as strings, so one schema fits every chunk
+def write_parquet(df, fileobj, chunk_rows=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    for chunk in frame_chunks(df, chunk_rows):
+        chunk = chunk.astype({col: 'string' for col in chunk.columns if chunk[col].dtype == object})
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(fileobj, table.schema)
+        else:
+            table = table.cast(writer.schema)
+        writer.write_table(table)
+    writer.close()
+
+# Write a DataFrame as an Excel sheet with openpyxl's write-only mode, which streams rows out
+def write_excel(df, fileobj, chunk_rows=None):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    rows = 0
+    for number, chunk in enumerate(frame_chunks(df, chunk_rows)):
+        if number == 0:
+            sheet.append([str(col) for col in chunk.columns])
+        rows += len(chunk)
+        if rows > EXCEL_MAX_ROWS:
+            raise ValueError(f"Excel sheets hold at most {EXCEL_MAX_ROWS:,} rows.")
+        chunk = chunk.astype(object)
+        for row in chunk.where(chunk.notna(), None).itertuples(index=False, name=None):
+            sheet.append(row)
+    workbook.save(fileobj)
+
+# Export a DataFrame (or an iterator of frames) to a temporary file in one of
+# available_export_formats(); returns its path. The caller deletes the file once it has been
+# handed to the browser. Large frames are exported in a worker process.
+def export_frame(df, export_format, dialect=None):
+    if export_format == 'xlsx' and isinstance(df, pd.DataFrame) and len(df) > EXCEL_MAX_ROWS:
+        raise ValueError(f"Excel sheets hold at most {EXCEL_MAX_ROWS:,} rows; this frame has {len(df):,}.")
+    if isinstance(df, pd.DataFrame) and offload(rows=len(df)):
+        from github_csv.workers import run_export
+        return run_export(df, export_format, dialect)
+    with tempfile.NamedTemporaryFile(suffix=f".{export_format}", delete=False) as f:
+        try:
+            if export_format == 'csv':
+                for chunk in iter_csv_chunks(df, dialect):
+                    f.write(chunk)
+            elif export_format == 'parquet':
+                write_parquet(df, f)
+            elif export_format == 'xlsx':
+                write_excel(df, f)
+            else:
+                raise ValueError(f"Unknown export format: {export_format}")
+        except Exception:
+            f.close()
+            os.remove(f.name)
+            raise
+        return f.name
+
+# Download and parse a CSV without touching session state, so it can run in the background
+def load_csv_file(repo_owner, repo_name, file_path, headers, projection=None, header=True):
+    response = fetch_file(repo_owner, repo_name, file_path, headers)
+    if response.status_code != 200:
+        return {"status_code": response.status_code, "error": response.text}
+
+    result = {"status_code": 200, "file_data": response.json(), "etag": response.headers.get('ETag')}
+    # Decode content and load as CSV if it's a csv file
+    if file_path.endswith('.csv'):
+        try:
+            raw = file_bytes(repo_owner, repo_name, file_path, result['file_data'], headers)
+            result['csv_data'], result['csv_dialect'] = decode_csv(result['file_data'], projection, raw, header)
+            if projection:
+                # At least as many as the file's rows, so labels of added rows stay clear of them
+                result['file_rows'] = raw.count(b"\n") + 1
+        except Exception as e:
+            result['error'] = f"Error parsing CSV: {str(e)}"
+    return result
+
+# Fetch the first PREVIEW_BYTES of a CSV and parse the complete rows in it
+def load_csv_head(repo_owner, repo_name, file_path, headers, max_bytes=None, header=True):
+    status_code, raw, truncated, total_size, error = fetch_file_head(
+        repo_owner, repo_name, file_path, headers, max_bytes or PREVIEW_BYTES
+    )
+    if status_code not in (200, 206):
+        return {"status_code": status_code, "error": error}
+
+    if truncated:
+        # Drop the partial last line
+        if b'\n' not in raw:
+            return {"status_code": status_code, "error": "The first line is longer than the preview window."}
+        raw = raw[:raw.rindex(b'\n') + 1]
+
+    dialect = sniff_csv(raw, header)
+    return {
+        "status_code": 200,
+        "csv_data": parse_csv(raw, dialect, engine='c'),
+        "csv_dialect": dialect,
+        "columns": read_csv_header(raw, dialect),
+        "truncated": truncated,
+        "total_size": total_size,
+        "bytes_read": len(raw)
+    }
+
+# One 64-bit fingerprint per row, for comparing rows without comparing every cell
+# Numbers are hashed as floats and everything else as text, so 57 and 57.0 match
+# Large frames are hashed in a worker process.
+def row_fingerprints(df):
+    if offload(rows=len(df)):
+        from github_csv.workers import run_fingerprints
+        return run_fingerprints(df)
+    normalised = pd.DataFrame({
+        col: (values.astype('float64') if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+              else values.astype('string'))
+        for col, values in df.items()
+    }, index=df.index)
+    return pd.util.hash_pandas_object(normalised, index=False)
@@ -0,0 +1,65 @@
+# Duplicate detection: hash rows (or key columns) after optional normalisation and group the matches
+import numpy as np
+import pandas as pd
+from github_csv.csv_io import row_fingerprints
+
+# Rows shown in the duplicate preview
+DEDUPE_PREVIEW_ROWS = 1000
+
+# A frame to compare rows on: text columns become integer codes, equal after collapsing whitespace
+# and/or folding case, so " Japanese" matches "Japanese". Only each column's distinct values are
+# normalised, with Arrow string kernels when pyarrow is available.
+def comparison_frame(df, whitespace=True, case=True):
+    try:
+        import pyarrow  # noqa: F401
+        text_dtype = "string[pyarrow]"
+    except ImportError:
+        text_dtype = "string"
+
+    compared = {}
+    for col, values in df.items():
+        if values.dtype == object or isinstance(values.dtype, pd.StringDtype):
+            codes, uniques = pd.factorize(values)
+            uniques = pd.Series(uniques).astype(text_dtype)
+            if whitespace:
+                uniques = uniques.str.replace(r"\s+", " ", regex=True).str.strip()
+            if case:
+                uniques = uniques.str.lower()
+            merged = pd.factorize(uniques)[0]
+            values = pd.Series(np.where(codes >= 0, merged[codes] if len(merged) else codes, -1), index=df.index)
+        compared[col] = values
+    return pd.DataFrame(compared, index=df.index)
+
+# Find duplicate rows, comparing all columns or only the given key columns
+# Returns a group number per row (-1 for rows without a duplicate) and a mask of the rows to
+# remove: every duplicate except the first (or last) of its group.
+def find_duplicates(df, columns=None, whitespace=True, case=True, keep='first'):
+    compared = comparison_frame(df[columns] if columns else df, whitespace, case)
+    fingerprints = row_fingerprints(compared).to_numpy()
+    groups, _ = pd.factorize(fingerprints)
+    counts = np.bincount(groups) if len(groups) else np.array([], dtype=np.int64)
+    duplicated = counts[groups] > 1 if len(groups) else np.zeros(0, dtype=bool)
+    group_ids = np.where(duplicated, groups, -1)
+    remove = pd.Series(fingerprints).duplicated(keep=keep).to_numpy()
+    return pd.Series(group_ids, index=df.index), remove
+
+# Plan removing duplicates as one journal step; returns the step, counts and a preview of the groups
+def plan_dedupe(df, columns=None, whitespace=True, case=True, keep='first'):
+    group_ids, remove = find_duplicates(df, columns, whitespace, case, keep)
+    in_groups = np.flatnonzero(group_ids.to_numpy() >= 0)
+    # Number groups 1, 2, ... in order of first appearance and show them together
+    numbers = pd.factorize(group_ids.to_numpy()[in_groups])[0] + 1
+    order = np.argsort(numbers, kind='stable')[:DEDUPE_PREVIEW_ROWS]
+    preview = df.iloc[in_groups[order]].assign(duplicate_group=numbers[order],
+                                               removed=remove[in_groups[order]])
+    step = []
+    if remove.any():
+        step.append({"op": "delete_rows", "rows": list(df.index[remove]),
+                     "pos": np.flatnonzero(remove), "values": df[remove]})
+    return {
+        "step": step,
+        "groups": int(numbers.max()) if len(numbers) else 0,
+        "duplicate_rows": len(in_groups),
+        "removed": int(remove.sum()),
+        "preview": preview
+    }
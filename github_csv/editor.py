@@ -0,0 +1,1403 @@
+# Editor mode: load a CSV from a repository, edit it and commit it back
+import os
+import streamlit as st
+from github_csv.core import (
+    BASE_SESSION_STATE, init_session_state, get_env_variable, prompt_for_token, get_headers,
+    get_github_token, token_hash, GITHUB_API_URL,
+    render_env_status, render_token_step, render_repo_step, reset_all
+)
+from github_csv.prefetch import start_prefetch, discard_prefetch, expire_prefetch, take_prefetch, remember_recent_file
+
+# Session state used by the editor
+EDITOR_SESSION_STATE = {
+    "csv_data": None,
+    "file_sha": None,
+    "working_data": None,
+    "edit_journal": {"done": [], "undone": [], "next_row": 0},
+    "editor_version": 0,
+    "save_conflict": False,
+    "csv_schema": None,
+    "validation_errors": None,
+    "csv_dialect": None,
+    "prefetch": None,
+    "csv_header": None,
+    "csv_header_row": True,
+    "csv_preview": None,
+    "load_plan": None,
+    "load_projection": None,
+    "csv_projection": None,
+    "file_history": None,
+    "history_diff": None,
+    "summary_spec": None,
+    "csv_summary": None,
+    "export_file": None,
+    "upsert_upload": None,
+    "upsert_plan": None,
+    "dedupe_plan": None,
+    "bulk_plan": None,
+    "file_etag": None,
+    "remote_checked_at": 0,
+    "remote_change": None,
+    "stored_journal": None,
+    "save_offline": False,
+    "sync_owner": None,
+    "csv_mirror": None,
+    "mirror_view": None,
+    "mirror_total": 0,
+    "csv_shards": None,
+    "shard_split": None
+}
+
+# Check file function and load CSV
+# restore=True looks for edits an earlier session left in the durable journal for this file
+def check_file(repo_owner, repo_name, file_path, restore=False):
+    from github_csv.shards import is_manifest
+
+    # Sharded tables are always loaded whole
+    projection = None if is_manifest(file_path) else st.session_state.load_projection
+    header = st.session_state.csv_header_row or is_manifest(file_path)
+    result = take_prefetch(repo_owner, repo_name, file_path)
+    if not header:
+        # The prefetch read the first row as column names
+        result = None
+    if result is None:
+        if is_manifest(file_path):
+            from github_csv.shards import load_sharded_table
+            result = load_sharded_table(repo_owner, repo_name, file_path, get_headers())
+        else:
+            from github_csv.csv_io import load_csv_file
+            result = load_csv_file(repo_owner, repo_name, file_path, get_headers(), projection, header)
+    elif projection and 'csv_data' in result:
+        # The prefetch parsed the whole file; cut the projection out of it
+        from github_csv.csv_io import project_frame
+        result['file_rows'] = len(result['csv_data'])
+        result['csv_data'] = project_frame(result['csv_data'], projection)
+
+    st.session_state.file_checked = True
+    st.session_state.file_valid = (result['status_code'] == 200)
+
+    if result['status_code'] == 200:
+        file_data = result['file_data']
+        st.session_state.file_data = file_data
+        st.session_state.file_sha = file_data['sha']
+        st.session_state.file_etag = result.get('etag')
+        st.session_state.remote_change = None
+
+        if file_path.endswith('.csv') or is_manifest(file_path):
+            from github_csv.journal import reset_journal
+            from github_csv.schema import load_schema
+
+            if 'csv_data' in result:
+                from github_csv.offline import find_stored_journal
+
+                st.session_state.csv_data = result['csv_data']
+                st.session_state.csv_dialect = result['csv_dialect']
+                st.session_state.csv_projection = projection and dict(projection, file_rows=result.get('file_rows', 0))
+                st.session_state.csv_shards = result.get('shards')
+                st.session_state.stored_journal = find_stored_journal() if restore else None
+                reset_journal()
+                remember_recent_file(repo_owner, repo_name, file_path)
+            else:
+                st.session_state.file_error = result['error']
+            st.session_state.csv_schema = load_schema(repo_owner, repo_name, file_path)
+            st.session_state.validation_errors = None
+            st.session_state.file_history = None
+            st.session_state.history_diff = None
+    else:
+        st.session_state.file_error = result['error']
+
+# Validate data against the file's schema before a save; returns the failure message, if any
+def check_schema(df):
+    from github_csv.schema import validate_dataframe
+
+    if not st.session_state.csv_schema:
+        return None
+    errors, messages = validate_dataframe(df, st.session_state.csv_schema)
+    if messages:
+        st.session_state.validation_errors = errors
+        return "Validation failed: " + "; ".join(messages)
+    st.session_state.validation_errors = None
+    return None
+
+# Function to save edited CSV back to GitHub
+def save_csv_to_github(repo_owner, repo_name, file_path, df):
+    import requests
+    from github_csv.csv_io import commit_payload
+
+    if not st.session_state.file_sha:
+        return False, "File SHA is missing. Cannot update file."
+
+    file_url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/contents/{file_path}"
+
+    # Refuse to save data that breaks the file's schema
+    message = check_schema(df)
+    if message:
+        return False, message
+
+    try:
+        # Stream the DataFrame into the request body as base64-encoded CSV
+        fields = {
+            "message": "Update CSV via Streamlit app",
+            "sha": st.session_state.file_sha
+        }
+        with commit_payload(df, st.session_state.csv_dialect, fields) as body:
+            # Update the file
+            response = requests.put(file_url, headers=dict(get_headers(), **{"Content-Type": "application/json"}),
+                                    data=body)
+
+        # GitHub answers 409 when the file changed since we loaded its SHA
+        st.session_state.save_conflict = (response.status_code == 409)
+        st.session_state.save_offline = (response.status_code >= 500)
+
+        if response.status_code == 200 or response.status_code == 201:
+            # Update the SHA for future updates
+            st.session_state.file_sha = response.json()['content']['sha']
+            return True, "File updated successfully!"
+        else:
+            return False, f"Error: {response.status_code} - {response.text}"
+
+    except Exception as e:
+        # Unreachable GitHub is worth retrying later; anything else is reported as it is
+        st.session_state.save_offline = isinstance(e, (requests.ConnectionError, requests.Timeout))
+        return False, f"Error: {str(e)}"
+
+# Save a sharded table: commit the shards of the partitions the journal touched, and the manifest
+# when shards were added or removed, in one commit. Shards changed on GitHub since the load count
+# as a conflict, like a SHA mismatch for a single file.
+def save_shards_to_github(repo_owner, repo_name, file_path, df):
+    import requests
+    from github_csv.shards import plan_shard_save, commit_files, shard_path, manifest_bytes
+
+    message = check_schema(df)
+    if message:
+        return False, message
+
+    state = st.session_state.csv_shards
+    files, deletions, manifest, ids, labels = plan_shard_save(
+        state, st.session_state.csv_data, df, st.session_state.edit_journal['done']
+    )
+    loaded = {shard_path(file_path, shard): state['shas'][shard['id']] for shard in state['manifest']['shards']}
+    # New shard paths must not exist yet
+    expected = {path: loaded.get(path) for path in list(files) + deletions}
+    if manifest:
+        files[file_path] = manifest_bytes(manifest)
+        expected[file_path] = state['manifest_sha']
+
+    try:
+        result = commit_files(
+            repo_owner, repo_name, (st.session_state.get('repo_data') or {}).get('default_branch') or "main",
+            files, deletions, "Update CSV shards via Streamlit app", expected, get_headers()
+        )
+    except requests.RequestException as e:
+        # No offline queue for sharded tables; the edits stay in the session
+        return False, f"Error: {str(e)}"
+
+    st.session_state.save_conflict = (result['status'] == "conflict")
+    if result['status'] == "conflict":
+        return False, "Shards changed on GitHub since they were loaded: " + ", ".join(result['paths'])
+
+    state['manifest'] = manifest or state['manifest']
+    for path, sha in result['shas'].items():
+        if path == file_path:
+            state['manifest_sha'] = sha
+        else:
+            state['shas'][ids[path]] = sha
+    state['shas'] = {shard['id']: state['shas'][shard['id']] for shard in state['manifest']['shards']}
+    st.session_state.file_sha = state['manifest_sha']
+    # Rows take the labels they have in the shards as saved, as a reload would give them
+    st.session_state.working_data = df.set_axis(labels)
+    shards = len(files) - bool(manifest)
+    return True, (f"Committed {shards} shard(s)" + (f", removed {len(deletions)}" if deletions else "")
+                  + (" and the manifest" if manifest else "") + " in one commit.")
+
+# Save only when the journal holds edits
+# When GitHub cannot be reached the edits stay in the durable journal and the save is queued
+# for the background sync instead of failing.
+def save_journal_to_github(repo_owner, repo_name, file_path):
+    import requests
+    from github_csv.offline import journal_key, read_sync_state, set_sync_state, queue_sync
+
+    if not st.session_state.edit_journal['done']:
+        return True, "No changes to save."
+    sync = read_sync_state()
+    if sync and sync['sync_state'] == 'syncing':
+        return False, "A queued save is being committed right now; try again in a moment."
+    if sync and sync['sync_state'] == 'queued' and st.session_state.sync_owner != journal_key():
+        return False, "Edits from an earlier session are queued for saving; restore or discard them first."
+    # Saving by hand replaces any queued save
+    set_sync_state(None)
+
+    st.session_state.save_offline = False
+    try:
+        success, message = commit_journal(repo_owner, repo_name, file_path)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        st.session_state.save_offline = True
+        success, message = False, f"Error: {str(e)}"
+    if not success and st.session_state.save_offline and journal_key() is not None:
+        queue_sync()
+        return False, ("GitHub could not be reached, so your edits are kept locally and the save is queued. "
+                       f"It will be retried in the background. ({message})")
+    return success, message
+
+# Commit the journal; on a SHA conflict, replay onto the latest version and retry once
+def commit_journal(repo_owner, repo_name, file_path):
+    from github_csv.journal import replay_journal, reset_journal
+    from github_csv.offline import persist_journal
+    from github_csv.summary import rebuild_session_summary
+
+    journal = st.session_state.edit_journal
+    if st.session_state.csv_projection:
+        return save_projection_to_github(repo_owner, repo_name, file_path)
+
+    save = save_shards_to_github if st.session_state.csv_shards else save_csv_to_github
+    success, message = save(repo_owner, repo_name, file_path, st.session_state.working_data)
+    if not success and st.session_state.save_conflict:
+        steps = journal['done']
+        check_file(repo_owner, repo_name, file_path)
+        if not st.session_state.file_valid or st.session_state.csv_data is None:
+            return False, "File changed remotely and could not be reloaded."
+        working, conflicts, replayed = replay_journal(st.session_state.csv_data, steps)
+        st.session_state.working_data = working
+        rebuild_session_summary()
+        # Undo works on the steps as they were replayed onto the reloaded base
+        st.session_state.edit_journal['done'], st.session_state.edit_journal['undone'] = replayed, []
+        persist_journal(rewrite=True)
+        st.session_state.edit_journal['next_row'] = max(st.session_state.edit_journal['next_row'],
+                                                        int(working.index.max()) + 1 if len(working) else 0)
+        if conflicts:
+            return False, "File changed remotely. Conflicting edits were skipped: " + "; ".join(conflicts)
+        success, message = save(repo_owner, repo_name, file_path, working)
+
+    if success:
+        # The saved frame becomes the new base and the journal starts over
+        # The summary already describes the saved rows, so it is kept rather than rebuilt
+        summary = st.session_state.csv_summary
+        working = st.session_state.working_data
+        st.session_state.csv_data = working if st.session_state.csv_shards else working.reset_index(drop=True)
+        reset_journal()
+        st.session_state.csv_summary = summary
+        st.session_state.remote_change = None
+    return success, message
+
+# Merge an edited projection back into the full file by replaying the journal onto its latest version
+def save_projection_to_github(repo_owner, repo_name, file_path):
+    from github_csv.csv_io import load_csv_file
+    from github_csv.journal import replay_journal
+
+    result = load_csv_file(repo_owner, repo_name, file_path, get_headers(),
+                           header=st.session_state.csv_dialect['header'])
+    if result['status_code'] != 200 or 'csv_data' not in result:
+        return False, f"Could not reload the full file: {result.get('error', '')}"
+
+    merged, conflicts, _ = replay_journal(result['csv_data'], st.session_state.edit_journal['done'])
+    if conflicts:
+        return False, "File changed remotely. Conflicting edits were not saved: " + "; ".join(conflicts)
+
+    st.session_state.file_sha = result['file_data']['sha']
+    success, message = save_csv_to_github(repo_owner, repo_name, file_path, merged)
+    if success:
+        # Re-read the projection so row labels match the saved file
+        check_file(repo_owner, repo_name, file_path)
+    return success, message
+
+# Read the header row from the file's head so the column picker is filled without a full download
+def check_header(repo_owner, repo_name, file_path):
+    from github_csv.csv_io import SNIFF_BYTES, load_csv_head
+
+    result = load_csv_head(repo_owner, repo_name, file_path, get_headers(), max_bytes=SNIFF_BYTES,
+                           header=st.session_state.csv_header_row)
+    if result['status_code'] == 200:
+        st.session_state.csv_header = {"file_path": file_path, "columns": result['columns']}
+    else:
+        st.session_state.file_error = result['error']
+
+# Preview the first rows of a file from a ranged download
+def check_preview(repo_owner, repo_name, file_path):
+    from github_csv.csv_io import load_csv_head
+
+    result = load_csv_head(repo_owner, repo_name, file_path, get_headers(), header=st.session_state.csv_header_row)
+    result['file_path'] = file_path
+    st.session_state.csv_preview = result
+    if result['status_code'] == 200:
+        st.session_state.csv_header = {"file_path": file_path, "columns": result['columns']}
+
+# Decide how to load a file from its size and the memory free on this replica
+# The size is read from the directory listing unless the caller already knows it.
+# Files that will not fit whole also get a head preview, whose row width sizes the pages.
+def check_load_plan(repo_owner, repo_name, file_path, size=None):
+    from github_csv.core import fetch_file_size
+    from github_csv.strategy import available_memory, choose_strategy, mirror_disk_free
+
+    if size is None:
+        size = fetch_file_size(repo_owner, repo_name, file_path, get_headers())
+    available, disk_free = available_memory(), mirror_disk_free()
+    plan = choose_strategy(size, available, disk_free=disk_free)
+    if plan['strategy'] == "refuse" and plan['budget'] and size <= plan['budget']:
+        check_preview(repo_owner, repo_name, file_path)
+        preview = st.session_state.csv_preview
+        if preview['status_code'] == 200 and len(preview['csv_data']):
+            plan = choose_strategy(size, available, preview['bytes_read'] / len(preview['csv_data']), disk_free)
+    plan['file_path'] = file_path
+    st.session_state.load_plan = plan
+
+# Stream the file into an out-of-core SQLite mirror and open its first page
+def check_mirror(repo_owner, repo_name, file_path):
+    from github_csv.core import fetch_file
+    from github_csv.mirror import build_mirror, mirror_path
+
+    st.session_state.file_checked = True
+    response = fetch_file(repo_owner, repo_name, file_path, get_headers())
+    st.session_state.file_valid = (response.status_code == 200)
+    if response.status_code != 200:
+        st.session_state.file_error = response.text
+        return
+
+    file_data = response.json()
+    path = mirror_path(token_hash(get_github_token()), repo_owner, repo_name, file_path)
+    try:
+        mirror = build_mirror(path, repo_owner, repo_name, file_path, get_headers(), file_data['sha'])
+    except Exception as e:
+        st.session_state.file_valid = False
+        st.session_state.file_error = f"Error building the local mirror: {str(e)}"
+        return
+
+    st.session_state.file_data = file_data
+    st.session_state.file_sha = mirror['sha']
+    st.session_state.csv_dialect = mirror['dialect']
+    st.session_state.csv_mirror = mirror
+    st.session_state.mirror_view = None
+    remember_recent_file(repo_owner, repo_name, file_path)
+
+# Write the current page's edits into the mirror; the page becomes the new base
+def flush_mirror_edits():
+    from github_csv.mirror import apply_steps
+    from github_csv.journal import reset_journal
+
+    journal = st.session_state.edit_journal
+    if journal['done']:
+        apply_steps(st.session_state.csv_mirror, journal['done'], journal['next_row'])
+        st.session_state.csv_data = st.session_state.working_data
+        reset_journal()
+        journal = st.session_state.edit_journal
+    journal['next_row'] = st.session_state.csv_mirror['next_row']
+
+# Open a page of the mirror (filters, sort and page number), keeping the current page's edits
+def load_mirror_page(view):
+    from github_csv.mirror import query_page
+    from github_csv.journal import reset_journal
+
+    flush_mirror_edits()
+    page, total = query_page(st.session_state.csv_mirror, view['filters'], view['sort'],
+                             view['descending'], view['page'])
+    st.session_state.csv_data = page
+    st.session_state.mirror_view = view
+    st.session_state.mirror_total = total
+    reset_journal()
+    st.session_state.edit_journal['next_row'] = st.session_state.csv_mirror['next_row']
+
+# Commit the mirror by streaming its rows into the commit payload
+def save_mirror_to_github(repo_owner, repo_name, file_path):
+    import requests
+    from github_csv.csv_io import commit_payload
+    from github_csv.mirror import iter_mirror_frames, set_mirror_sha
+
+    flush_mirror_edits()
+    mirror = st.session_state.csv_mirror
+    if not mirror['dirty']:
+        return True, "No changes to save."
+
+    file_url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/contents/{file_path}"
+    fields = {"message": "Update CSV via Streamlit app", "sha": mirror['sha']}
+    try:
+        with commit_payload(iter_mirror_frames(mirror), mirror['dialect'], fields) as body:
+            response = requests.put(file_url, headers=dict(get_headers(), **{"Content-Type": "application/json"}),
+                                    data=body)
+    except requests.RequestException as e:
+        return False, f"Error: {str(e)} Your edits are kept in the local mirror."
+
+    if response.status_code == 409:
+        return False, ("The file changed on GitHub since the mirror was built, so it was not overwritten. "
+                       "Export your edits, then discard the mirror to load the new version.")
+    if response.status_code not in (200, 201):
+        return False, f"Error: {response.status_code} - {response.text}"
+    set_mirror_sha(mirror, response.json()['content']['sha'])
+    st.session_state.file_sha = mirror['sha']
+    return True, "File updated successfully!"
+
+# Load another page of a paged file; edits on the current page must be saved first
+def load_page(repo_owner, repo_name, file_path, start):
+    st.session_state.load_projection = dict(st.session_state.csv_projection, start=max(int(start), 0))
+    check_file(repo_owner, repo_name, file_path)
+
+# Fetch the file as it was at a commit, projected like the loaded data
+# Versions are cached by blob sha, so commits with identical content are parsed once
+def load_version(repo_owner, repo_name, file_path, commit_sha):
+    import pandas as pd
+    from github_csv.csv_io import project_frame
+    from github_csv.history import fetch_blob_sha, load_blob_version
+
+    token_key = token_hash(get_github_token())
+    blob_sha = fetch_blob_sha(token_key, repo_owner, repo_name, file_path, commit_sha, get_headers())
+    if blob_sha is None:
+        return pd.DataFrame()
+    df = load_blob_version(token_key, repo_owner, repo_name, blob_sha, get_headers())
+    projection = st.session_state.csv_projection
+    return project_frame(df, projection) if projection else df
+
+# Apply the previewed upsert as one journal step
+def apply_upsert_plan():
+    from github_csv.journal import record_step
+
+    record_step(st.session_state.upsert_plan['step'])
+    st.session_state.upsert_plan = None
+
+# Remove the duplicates found by the last search as one journal step
+def apply_dedupe_plan():
+    from github_csv.journal import record_step
+
+    record_step(st.session_state.dedupe_plan['step'])
+    st.session_state.dedupe_plan = None
+
+# Apply the previewed bulk edit as one journal step
+def apply_bulk_plan():
+    from github_csv.journal import record_step
+
+    record_step(st.session_state.bulk_plan['step'])
+    st.session_state.bulk_plan = None
+
+# Remote watcher, run as a fragment on a timer so only it reruns between checks
+# Full-app reruns reuse the last check until the interval has passed.
+def render_remote_watch(repo_owner, repo_name, file_path):
+    import time
+    from github_csv.watch import WATCH_INTERVAL, check_remote
+    from github_csv.offline import sync_pending
+
+    # A queued save's commit would look like a remote change; let the sync finish first
+    if time.time() - st.session_state.remote_checked_at >= WATCH_INTERVAL and not sync_pending():
+        st.session_state.remote_checked_at = time.time()
+        version = st.session_state.editor_version
+        message = check_remote(repo_owner, repo_name, file_path)
+        if message:
+            st.session_state.remote_change = message
+            st.toast(message)
+            if st.session_state.editor_version != version:
+                # Rerun the whole app so the editor shows the rebased data
+                st.rerun()
+
+    if st.session_state.remote_change:
+        st.warning(st.session_state.remote_change)
+    st.caption(f"Last remote check: {time.strftime('%H:%M:%S', time.localtime(st.session_state.remote_checked_at))}")
+
+# Put back the edits an earlier session left in the durable journal, replayed onto the loaded data
+# A save still queued is queued again with the replayed steps, and this session takes it over.
+def restore_stored_journal():
+    from github_csv.journal import replay_journal
+    from github_csv.offline import set_sync_state, persist_journal, read_sync_state, cancel_queued_sync, queue_sync
+    from github_csv.summary import rebuild_session_summary
+
+    stored = st.session_state.stored_journal
+    if stored['pending']:
+        # Take the save off the queue while its steps are rewritten as replayed, then queue it again
+        if not cancel_queued_sync():
+            if (read_sync_state() or {}).get('sync_state') == 'syncing':
+                return ["The queued save is being committed right now; try again in a moment."]
+            st.session_state.stored_journal = None
+            return ["The queued save finished in the meantime; load the file again to see it."]
+    working, conflicts, replayed = replay_journal(st.session_state.csv_data, stored['steps'])
+    journal = st.session_state.edit_journal
+    journal['done'], journal['undone'] = replayed, []
+    journal['next_row'] = max(journal['next_row'], int(working.index.max()) + 1 if len(working) else 0)
+    st.session_state.working_data = working
+    st.session_state.editor_version += 1
+    rebuild_session_summary()
+    st.session_state.stored_journal = None
+    set_sync_state(None)
+    persist_journal(rewrite=True)
+    if stored['pending']:
+        queue_sync()
+    return conflicts
+
+# Drop the edits an earlier session left behind and start journaling this session's edits
+# A queued save can only be dropped before the sync thread picks it up; returns False otherwise.
+def discard_stored_journal():
+    from github_csv.offline import set_sync_state, persist_journal, cancel_queued_sync
+
+    if st.session_state.stored_journal['pending'] and not cancel_queued_sync():
+        return False
+    st.session_state.stored_journal = None
+    set_sync_state(None)
+    persist_journal(rewrite=True)
+    return True
+
+# Take over a save the background sync committed: the synced steps become part of the base and
+# only later edits stay in the journal. When the commit also merged other people's changes, the
+# base is rebased onto it like a remote change.
+def adopt_synced_journal(sync, repo_owner, repo_name, file_path):
+    from github_csv.journal import replay_journal
+    from github_csv.offline import set_sync_state, persist_journal
+    from github_csv.watch import check_remote
+
+    journal = st.session_state.edit_journal
+    synced = journal['done'][:sync['synced_steps']]
+    st.session_state.csv_data = replay_journal(st.session_state.csv_data, synced)[0]
+    journal['done'], journal['undone'] = journal['done'][sync['synced_steps']:], []
+    st.session_state.file_sha = sync['synced_sha']
+    st.session_state.editor_version += 1
+    set_sync_state(None)
+    persist_journal(rewrite=True)
+    message = f"✅ Your queued save was committed ({len(synced)} edit step(s))."
+    if sync['merged'] and not st.session_state.csv_projection:
+        check_remote(repo_owner, repo_name, file_path, force=True)
+        message += " It was merged with changes made remotely in the meantime."
+    return message
+
+# Show where a queued save stands; runs as a fragment while the save waits for GitHub
+def render_sync_status(repo_owner, repo_name, file_path):
+    from github_csv.offline import read_sync_state
+
+    sync = read_sync_state()
+    state = sync['sync_state'] if sync else None
+    if state in ('queued', 'syncing'):
+        st.info("⏳ A save is queued and will be committed once GitHub is reachable. "
+                "Your edits are kept locally meanwhile." + (f" Last error: {sync['sync_error']}" if sync['sync_error'] else ""))
+    elif state == 'synced':
+        st.session_state.remote_change = adopt_synced_journal(sync, repo_owner, repo_name, file_path)
+        st.rerun()
+    elif state == 'conflict':
+        st.error(f"The queued save could not be committed: {sync['sync_error']}. Review your edits and save again.")
+
+# Split the loaded file into a sharded table in one commit; existing files are never overwritten
+def split_into_shards(repo_owner, repo_name, file_path, manifest_path, partition, remove):
+    import requests
+    from github_csv.shards import plan_new_table, commit_files
+
+    files, manifest = plan_new_table(st.session_state.csv_data, st.session_state.csv_dialect, manifest_path, partition)
+    expected = dict.fromkeys(files)
+    if remove:
+        expected[file_path] = st.session_state.file_sha
+    try:
+        result = commit_files(
+            repo_owner, repo_name, (st.session_state.get('repo_data') or {}).get('default_branch') or "main",
+            files, [file_path] if remove else [], f"Split {file_path} into shards via Streamlit app",
+            expected, get_headers()
+        )
+    except requests.RequestException as e:
+        return {"success": False, "message": f"Error: {str(e)}"}
+    if result['status'] == "conflict":
+        return {"success": False, "message": "Not split; these files already exist or changed on GitHub: "
+                                             + ", ".join(result['paths'])}
+    return {"success": True, "manifest_path": manifest_path,
+            "message": f"✅ Committed {len(manifest['shards'])} shard(s) and the manifest {manifest_path}."}
+
+# Open another file from Step 3, as if its path had been typed in
+def open_file(file_path):
+    st.session_state.file_path = file_path
+    st.session_state.file_checked = False
+    st.session_state.shard_split = None
+
+# Start Over also cancels any background prefetch
+def start_over():
+    discard_prefetch()
+    reset_all()
+
+# Step 3: choose and load the CSV file
+def render_file_step(repo_owner, repo_name):
+    st.subheader("Step 3: Select CSV File")
+
+    # Get file path from env or session state, then fallback to input
+    file_path_default = get_env_variable('FILE_PATH')
+
+    # Save file path in session state
+    if 'file_path' not in st.session_state and file_path_default:
+        st.session_state.file_path = file_path_default
+
+    file_path = st.text_input(
+        "CSV File Path:",
+        value=st.session_state.get('file_path', file_path_default)
+    )
+    if file_path:
+        st.session_state.file_path = file_path
+
+    # A prefetch for a different path or past its TTL will not be used
+    expire_prefetch((repo_owner, repo_name, file_path))
+    prefetch = st.session_state.get('prefetch')
+    if prefetch and not st.session_state.file_checked:
+        st.caption("⚡ Prefetched in the background" if prefetch['future'].done()
+                   else "⏳ Prefetching in the background...")
+
+    # A shard manifest loads its shards whole, so the options below are for single files
+    from github_csv.shards import is_manifest
+    manifest = is_manifest(file_path)
+    if manifest and not st.session_state.file_checked:
+        st.info("Sharded table: the manifest and all of its shards are loaded as one table.")
+
+    # Size the file up before downloading it and pick a load strategy
+    strategy = "full"
+    if file_path and not manifest and not st.session_state.file_checked:
+        from github_csv.strategy import LOAD_STRATEGIES
+
+        plan = st.session_state.load_plan
+        if not plan or plan['file_path'] != file_path:
+            with st.spinner("Checking file size..."):
+                # The GraphQL backend already knows the size from the setup query
+                prefetch = st.session_state.get('prefetch')
+                size = prefetch.get('size') if prefetch and prefetch['key'][2] == file_path else None
+                check_load_plan(repo_owner, repo_name, file_path, size)
+            plan = st.session_state.load_plan
+        size = f"{plan['size'] / 1024 ** 2:,.1f} MB" if plan['size'] is not None else "unknown size"
+        (st.warning if plan['strategy'] == "refuse" else st.info)(
+            f"Load strategy: {LOAD_STRATEGIES[plan['strategy']]} ({size}). {plan['reason']}"
+        )
+        choices = ["auto"] + [name for name in LOAD_STRATEGIES if name != "refuse"]
+        choice = st.selectbox(
+            "Load as:", choices,
+            format_func=lambda name: f"Automatic ({LOAD_STRATEGIES[plan['strategy']]})" if name == "auto"
+            else LOAD_STRATEGIES[name]
+        )
+        strategy = plan['strategy'] if choice == "auto" else choice
+        if choice != "auto" and choice != plan['strategy']:
+            st.caption("Overriding the automatic choice; a load that does not fit in memory can stall the app for everyone.")
+
+    # Quick look at the first rows without downloading the whole file
+    if file_path and not manifest and not st.session_state.file_checked:
+        with st.expander("Preview", expanded=False):
+            if st.button("Preview First Rows"):
+                with st.spinner("Fetching the start of the file..."):
+                    check_preview(repo_owner, repo_name, file_path)
+            preview = st.session_state.csv_preview
+            if preview and preview['file_path'] == file_path:
+                if preview['status_code'] == 200:
+                    total = f"{preview['total_size']:,} bytes" if preview['total_size'] else "unknown size"
+                    st.caption(f"Read {preview['bytes_read']:,} bytes of {total}"
+                               + (" (partial)" if preview['truncated'] else " (whole file)"))
+                    sample = preview['csv_data']
+                    st.dataframe(
+                        sample.dtypes.astype(str).rename("type").rename_axis("column").reset_index(),
+                        hide_index=True
+                    )
+                    st.dataframe(sample.head(100), hide_index=True)
+                else:
+                    st.error(f"❌ Preview failed: {preview['error']}")
+
+    # Optional projection: load only some columns and a row range
+    if file_path and not manifest and not st.session_state.file_checked:
+        with st.expander("Load Options: Columns and Rows", expanded=False):
+            header_row = st.checkbox("First row holds column names", value=st.session_state.csv_header_row)
+            if header_row != st.session_state.csv_header_row:
+                # Column names read under the other setting no longer apply
+                st.session_state.csv_header_row = header_row
+                st.session_state.csv_header = None
+                st.session_state.csv_preview = None
+                st.rerun()
+            header = st.session_state.csv_header
+            if not header or header['file_path'] != file_path:
+                if st.button("Read Columns"):
+                    with st.spinner("Reading header..."):
+                        check_header(repo_owner, repo_name, file_path)
+                        st.rerun()
+                columns = None
+            else:
+                columns = st.multiselect("Columns to load:", header['columns'], default=header['columns'])
+            start = st.number_input("First row to load (0 = first data row):", min_value=0, value=0, step=1)
+            nrows = st.number_input("Number of rows (0 = all):", min_value=0, value=0, step=1)
+
+            all_columns = not columns or header is None or len(columns) == len(header['columns'])
+            if all_columns and not start and not nrows:
+                st.session_state.load_projection = None
+            else:
+                st.session_state.load_projection = {
+                    "columns": None if all_columns else columns,
+                    "start": int(start),
+                    "nrows": int(nrows) or None
+                }
+
+    if file_path and not st.session_state.file_checked:
+        if st.button("Load CSV File", disabled=(strategy == "refuse")):
+            if strategy == "projected" and not (st.session_state.load_projection or {}).get('nrows'):
+                from github_csv.strategy import MIN_PAGE_ROWS
+                # Page through the file unless a row window was already chosen
+                st.session_state.load_projection = dict(
+                    st.session_state.load_projection or {"columns": None, "start": 0},
+                    nrows=st.session_state.load_plan['page_rows'] or MIN_PAGE_ROWS
+                )
+            if strategy == "mirror":
+                with st.spinner("Copying the file into a local database..."):
+                    check_mirror(repo_owner, repo_name, file_path)
+            else:
+                from github_csv.workers import worker_progress
+                with st.spinner("Loading CSV file..."), worker_progress("Parsing in a worker process..."):
+                    check_file(repo_owner, repo_name, file_path, restore=True)
+
+    if st.session_state.file_checked:
+        if st.session_state.file_valid:
+            if st.session_state.csv_mirror:
+                st.success(f"✅ Successfully mirrored CSV file: {file_path}")
+                render_mirror_step(repo_owner, repo_name, file_path)
+            elif (file_path.endswith('.csv') or manifest) and st.session_state.csv_data is not None:
+                st.success(f"✅ Successfully loaded CSV file: {file_path}")
+                render_edit_step(repo_owner, repo_name, file_path)
+            else:
+                st.error("The selected file is not a valid CSV or could not be parsed.")
+        else:
+            st.error(f"❌ Failed to access file: {file_path}")
+            if st.session_state.get('file_error'):
+                st.text(st.session_state.file_error)
+
+# Step 4 for a mirrored file: filter, sort and page through the SQLite mirror and edit a page at a time
+def render_mirror_step(repo_owner, repo_name, file_path):
+    import json
+    from github_csv.csv_io import EXPORT_FORMATS, available_export_formats, export_frame
+    from github_csv.journal import capture_editor_changes, undo_edit, redo_edit
+    from github_csv.mirror import MIRROR_FILTERS, MIRROR_PAGE_ROWS, filter_value, update_indexes, iter_mirror_frames, discard_mirror
+
+    st.subheader("Step 4: Edit CSV Data (Local Mirror)")
+    mirror = st.session_state.csv_mirror
+    st.info(f"{mirror['rows']:,} rows in a local database ({os.path.getsize(mirror['path']) / 1024 ** 2:,.1f} MB on disk). "
+            "Only the page shown is held in memory; edits are written to the database as you change pages.")
+    if mirror['dirty'] and mirror['sha'] != st.session_state.file_data['sha']:
+        st.warning("The mirror holds unsaved edits made on an older version of the file. Saving will not "
+                   "overwrite the newer version; export the edits or discard the mirror to start from it.")
+        if st.button("Discard Mirror"):
+            discard_mirror(mirror)
+            st.session_state.csv_mirror = None
+            st.session_state.file_checked = False
+            st.rerun()
+
+    # Indexes make filters and sorts on a column use the database index
+    columns = mirror['columns']
+    with st.expander("Indexes", expanded=False):
+        indexed = st.multiselect("Indexed columns:", columns, default=mirror['indexes'])
+        if st.button("Update Indexes"):
+            with st.spinner("Building indexes..."):
+                update_indexes(mirror, indexed)
+
+    # Filter, sort and page; each view is one SQL query
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        filter_col = st.selectbox("Filter column:", [None] + columns, format_func=lambda col: col or "(no filter)")
+    with col2:
+        operator = st.selectbox("Condition:", list(MIRROR_FILTERS), disabled=filter_col is None)
+    with col3:
+        value = st.text_input("Value:", disabled=filter_col is None or operator == "is empty")
+    col1, col2 = st.columns(2)
+    with col1:
+        sort = st.selectbox("Sort by:", [None] + columns, format_func=lambda col: col or "(file order)")
+    with col2:
+        descending = st.checkbox("Descending", disabled=sort is None)
+    filters = [(filter_col, operator, filter_value(value))] if filter_col and (value or operator == "is empty") else []
+
+    # A new filter or sort starts again from the first page
+    view_key = json.dumps([filters, sort, descending], default=str)
+    page = st.number_input("Page:", min_value=1, value=1, step=1, key=f"mirror_page_{view_key}")
+    view = {"filters": filters, "sort": sort, "descending": descending, "page": int(page) - 1}
+    if view != st.session_state.mirror_view:
+        load_mirror_page(view)
+
+    start = view['page'] * MIRROR_PAGE_ROWS
+    pages = max(1, -(-st.session_state.mirror_total // MIRROR_PAGE_ROWS))
+    st.caption(f"Page {view['page'] + 1:,} of {pages:,}: rows {min(start + 1, st.session_state.mirror_total):,}-"
+               f"{start + len(st.session_state.csv_data):,} of {st.session_state.mirror_total:,} matching")
+    editor_key = f"csv_editor_{st.session_state.editor_version}"
+    st.data_editor(
+        st.session_state.working_data,
+        key=editor_key,
+        on_change=capture_editor_changes,
+        args=(editor_key,),
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True
+    )
+    journal = st.session_state.edit_journal
+    col1, col2 = st.columns(2)
+    with col1:
+        st.button(f"Undo ({len(journal['done'])})", on_click=undo_edit, disabled=not journal['done'])
+    with col2:
+        st.button(f"Redo ({len(journal['undone'])})", on_click=redo_edit, disabled=not journal['undone'])
+
+    # Export streams the database out block by block
+    with st.expander("Export Edited Data", expanded=st.session_state.export_file is not None):
+        export_format = st.selectbox("Format:", available_export_formats(),
+                                     format_func=lambda name: EXPORT_FORMATS[name][0])
+        if st.button("Prepare Export"):
+            with st.spinner("Writing export..."):
+                flush_mirror_edits()
+                try:
+                    export_path = export_frame(iter_mirror_frames(mirror), export_format, mirror['dialect'])
+                    with open(export_path, 'rb') as f:
+                        st.session_state.export_file = {
+                            "name": os.path.splitext(os.path.basename(file_path))[0] + f".{export_format}",
+                            "format": export_format,
+                            "data": f.read()
+                        }
+                    os.remove(export_path)
+                except ValueError as e:
+                    st.error(f"❌ {str(e)}")
+        export_file = st.session_state.export_file
+        if export_file:
+            st.download_button(
+                f"Download {export_file['name']} ({len(export_file['data']):,} bytes)",
+                data=export_file['data'], file_name=export_file['name'],
+                mime=EXPORT_FORMATS[export_file['format']][1],
+                on_click=lambda: st.session_state.update(export_file=None)
+            )
+
+    if st.button("Save Changes to GitHub"):
+        with st.spinner("Saving changes..."):
+            success, message = save_mirror_to_github(repo_owner, repo_name, file_path)
+            if success:
+                st.success(message)
+            else:
+                st.error(message)
+
+# Step 4: CSV editor section; only reached once a CSV is parsed, so pandas is already loaded
+def render_edit_step(repo_owner, repo_name, file_path):
+    import time
+    import requests
+    import pandas as pd
+    from github_csv.csv_io import (
+        EXPORT_FORMATS, available_engines, benchmark_engines, available_export_formats, export_frame,
+        sniff_csv, parse_csv, file_bytes
+    )
+    from github_csv.journal import capture_editor_changes, undo_edit, redo_edit
+    from github_csv.schema import validate_dataframe
+    from github_csv.history import fetch_file_commits, diff_versions
+    from github_csv.summary import SUMMARY_AGGS, rebuild_session_summary, summary_table
+    from github_csv.upsert import plan_upsert
+    from github_csv.dedupe import plan_dedupe
+    from github_csv.bulk import (
+        BULK_OPERATIONS, CAST_TYPES, NORMALISATIONS, SELECTION_OPERATORS, FORMULA_FUNCTIONS,
+        select_rows, plan_bulk
+    )
+    from github_csv.watch import WATCH_INTERVAL
+    from github_csv.workers import worker_progress
+    from github_csv.offline import SYNC_INTERVAL, journal_key, read_sync_state
+    from github_csv.shards import SHARD_MANIFEST_SUFFIX, SHARD_MAX_BYTES
+    from github_csv.fanout import (
+        FANOUT_RATE_RESERVE, parse_fanout_targets, is_current_target, new_rate_budget,
+        check_fanout_target, commit_fanout_target, run_fanout
+    )
+
+    st.subheader("Step 4: Edit CSV Data")
+
+    projection = st.session_state.csv_projection
+    shards = st.session_state.csv_shards
+    if shards:
+        partition = shards['manifest']['partition']
+        st.info(f"Sharded table: {len(shards['manifest']['shards'])} shard(s) partitioned by "
+                + (f"the value of {partition['column']}" if partition['by'] == "key" else "row range")
+                + ". Saving commits only the shards of the partitions you changed.")
+    if projection:
+        rows = st.session_state.csv_data.index
+        st.info(f"Editing rows {rows.min() if len(rows) else 0}-{rows.max() if len(rows) else 0} of "
+                f"{', '.join(projection['columns']) if projection['columns'] else 'all columns'}. "
+                "Saving merges these edits into the full file.")
+        if projection.get('nrows'):
+            # Paged editing: step through the file one window of rows at a time
+            pending = bool(st.session_state.edit_journal['done'])
+            previous_col, next_col = st.columns(2)
+            with previous_col:
+                if st.button("⬅️ Previous Page", disabled=pending or not projection['start']):
+                    load_page(repo_owner, repo_name, file_path, projection['start'] - projection['nrows'])
+                    st.rerun()
+            with next_col:
+                if st.button("Next Page ➡️", disabled=pending or len(st.session_state.csv_data) < projection['nrows']):
+                    load_page(repo_owner, repo_name, file_path, projection['start'] + projection['nrows'])
+                    st.rerun()
+            if pending:
+                st.caption("Save or undo this page's edits before moving to another page.")
+
+    # Show original data
+    with st.expander("View Original Data", expanded=False):
+        st.dataframe(st.session_state.csv_data)
+
+    # Sniffed dialect and parse engine benchmark
+    with st.expander("File Format and Parse Engines", expanded=False):
+        dialect = st.session_state.csv_dialect
+        st.write(f"Encoding: {dialect['encoding']} | Delimiter: {dialect['sep']!r} | "
+                 f"Quote: {dialect['quotechar']!r} | Header row: {'yes' if dialect['header'] else 'no'}")
+        st.write(f"Engines available: {', '.join(available_engines())} ({os.cpu_count()} CPU cores)")
+        if st.button("Benchmark Parse Engines", disabled=bool(shards)):
+            with st.spinner("Parsing with every engine..."):
+                raw = file_bytes(repo_owner, repo_name, file_path, st.session_state.file_data, get_headers())
+                st.session_state.engine_benchmark = benchmark_engines(raw, dialect)
+        if st.session_state.get('engine_benchmark'):
+            st.dataframe(pd.DataFrame(st.session_state.engine_benchmark), hide_index=True)
+
+    # Edits left by an earlier session, found in the durable journal when the file was loaded
+    stored = st.session_state.stored_journal
+    if stored:
+        st.warning(f"Found {len(stored['steps'])} " + ("edit step(s) queued for saving" if stored['pending'] else "unsaved edit step(s)")
+                   + f" from {time.strftime('%Y-%m-%d %H:%M', time.localtime(stored['updated_at']))}, made on version "
+                   f"{(stored['base_sha'] or '')[:7]}. "
+                   + ("Restore them to resume the queued save. " if stored['pending'] else "")
+                   + "New edits are not kept locally until you restore or discard them.")
+        restore_col, discard_col = st.columns(2)
+        with restore_col:
+            if st.button("Restore Edits"):
+                conflicts = restore_stored_journal()
+                if conflicts:
+                    st.session_state.remote_change = "Some restored edits conflicted and were skipped: " + "; ".join(conflicts)
+                st.rerun()
+        with discard_col:
+            if st.button("Discard Edits"):
+                if not discard_stored_journal():
+                    st.session_state.remote_change = "The queued save is being committed right now; try again in a moment."
+                st.rerun()
+
+    # Queued saves are committed by a background thread; poll for the outcome while one waits
+    # Only the session holding the queued steps takes the outcome over
+    sync = read_sync_state() if st.session_state.sync_owner == journal_key() else None
+    if sync and sync['sync_state'] in ('queued', 'syncing', 'synced'):
+        st.fragment(run_every=SYNC_INTERVAL)(render_sync_status)(repo_owner, repo_name, file_path)
+    elif sync and sync['sync_state'] == 'conflict':
+        render_sync_status(repo_owner, repo_name, file_path)
+
+    # Watch the file for remote commits; a sharded table's shards change without its manifest
+    if WATCH_INTERVAL > 0 and not shards:
+        if st.checkbox(f"Watch for remote changes (every {WATCH_INTERVAL}s)", value=True):
+            st.fragment(run_every=WATCH_INTERVAL)(render_remote_watch)(repo_owner, repo_name, file_path)
+
+    # Edit data; every change is captured into the edit journal
+    st.write("Make your changes below:")
+    editor_key = f"csv_editor_{st.session_state.editor_version}"
+    st.data_editor(
+        st.session_state.working_data,
+        key=editor_key,
+        on_change=capture_editor_changes,
+        args=(editor_key,),
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True
+    )
+
+    # Undo / redo over the edit journal
+    journal = st.session_state.edit_journal
+    col1, col2 = st.columns(2)
+    with col1:
+        st.button(f"Undo ({len(journal['done'])})", on_click=undo_edit,
+                  disabled=not journal['done'])
+    with col2:
+        st.button(f"Redo ({len(journal['undone'])})", on_click=redo_edit,
+                  disabled=not journal['undone'])
+
+    with st.expander("Edit Log", expanded=False):
+        for i, step in enumerate(journal['done'], start=1):
+            st.write(f"Step {i}: " + ", ".join(
+                f"{op['op']} {len(op['rows'])} rows" if 'rows' in op else
+                f"{op['op']} row {op['row']}" + (f" [{op['col']}]" if op['op'] == 'edit' else "")
+                for op in step
+            ))
+
+    # Change whole columns, or the rows matching a condition, in one undoable step
+    with st.expander("Bulk Edit", expanded=st.session_state.bulk_plan is not None):
+        df = st.session_state.working_data
+        columns = list(df.columns)
+        operation = st.selectbox("Operation:", list(BULK_OPERATIONS), format_func=BULK_OPERATIONS.get)
+        if operation == "formula":
+            target_columns = [st.selectbox("Column to write:", columns)]
+        else:
+            target_columns = st.multiselect("Columns to change:", columns)
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            where_column = st.selectbox("Only rows where:", [None] + columns,
+                                        format_func=lambda col: "(all rows)" if col is None else col)
+        with col2:
+            where_operator = st.selectbox("Condition:", SELECTION_OPERATORS, disabled=where_column is None)
+        with col3:
+            where_value = st.text_input("Value:", disabled=where_column is None or where_operator.startswith("is "))
+
+        params = {}
+        if operation == "replace":
+            col1, col2 = st.columns(2)
+            with col1:
+                params['find'] = st.text_input("Find:")
+            with col2:
+                params['replace'] = st.text_input("Replace with:")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                params['regex'] = st.checkbox("Regular expression")
+            with col2:
+                params['whole_cell'] = st.checkbox("Whole cell only")
+            with col3:
+                params['case'] = st.checkbox("Match case", value=True)
+        elif operation == "formula":
+            params['formula'] = st.text_input("Formula:", placeholder="B * 1.1")
+            st.caption("Use column names, numbers, 'text', + - * / // % ** and "
+                       f"{', '.join(f'{name}()' for name in FORMULA_FUNCTIONS)}. "
+                       "Put column names with spaces in backticks. + joins text.")
+        elif operation == "fill_down":
+            st.caption("Empty cells take the value of the nearest non-empty cell above them.")
+        elif operation == "cast":
+            params['cast_type'] = st.selectbox("New type:", list(CAST_TYPES), format_func=CAST_TYPES.get)
+            st.caption("Values that do not convert become empty.")
+        elif operation == "normalise":
+            params['normalisations'] = st.multiselect("Normalisations:", list(NORMALISATIONS),
+                                                      default=["nfkc", "strip"], format_func=NORMALISATIONS.get)
+
+        if st.button("Preview Bulk Edit"):
+            try:
+                mask = select_rows(df, where_column, where_operator, where_value)
+                plan = plan_bulk(df, operation, target_columns, mask, params)
+            except ValueError as e:
+                st.error(f"❌ {e}")
+                st.session_state.bulk_plan = None
+            else:
+                plan['editor_version'] = st.session_state.editor_version
+                st.session_state.bulk_plan = plan
+
+        plan = st.session_state.bulk_plan
+        if plan and plan['editor_version'] != st.session_state.editor_version:
+            # The data changed since the preview
+            st.session_state.bulk_plan = plan = None
+        if plan:
+            if plan['step']:
+                st.write(f"{plan['selected']:,} row(s) selected; {plan['changed_cells']:,} cell(s) in "
+                         f"{plan['rows']:,} row(s) would change")
+                st.dataframe(plan['preview'], use_container_width=True)
+                st.button("Apply Bulk Edit", on_click=apply_bulk_plan)
+            else:
+                st.success(f"✅ Nothing to change in the {plan['selected']:,} selected row(s)")
+
+    # Find duplicate rows and remove them in one undoable step
+    with st.expander("Find Duplicates", expanded=st.session_state.dedupe_plan is not None):
+        columns = list(st.session_state.working_data.columns)
+        key_columns = st.multiselect("Compare only these columns (empty = whole row):", columns)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            whitespace = st.checkbox("Ignore extra whitespace", value=True)
+        with col2:
+            case = st.checkbox("Ignore case", value=True)
+        with col3:
+            keep = st.selectbox("Keep:", ["first", "last"], format_func=lambda name: f"{name} of each group")
+
+        if st.button("Find Duplicates"):
+            plan = plan_dedupe(st.session_state.working_data, key_columns or None, whitespace, case, keep)
+            plan['editor_version'] = st.session_state.editor_version
+            st.session_state.dedupe_plan = plan
+
+        plan = st.session_state.dedupe_plan
+        if plan and plan['editor_version'] != st.session_state.editor_version:
+            # The data changed since the search
+            st.session_state.dedupe_plan = plan = None
+        if plan:
+            if plan['groups']:
+                st.write(f"{plan['groups']:,} group(s) covering {plan['duplicate_rows']:,} rows; "
+                         f"{plan['removed']:,} row(s) would be removed")
+                st.dataframe(plan['preview'], use_container_width=True)
+                st.button("Remove Duplicates", on_click=apply_dedupe_plan)
+            else:
+                st.success("✅ No duplicates found")
+
+    # Upload a CSV and merge it into the working data by key, as one undoable step
+    with st.expander("Upload and Merge by Key", expanded=st.session_state.upsert_plan is not None):
+        if projection:
+            st.info("Load the whole file to merge an upload; keys outside the loaded rows would be duplicated.")
+        else:
+            uploaded = st.file_uploader("CSV file to merge:", type=["csv"])
+            if uploaded is None:
+                st.session_state.upsert_upload = None
+                st.session_state.upsert_plan = None
+            elif (st.session_state.upsert_upload or {}).get('file_id') != uploaded.file_id:
+                try:
+                    raw = uploaded.getvalue()
+                    st.session_state.upsert_upload = {"file_id": uploaded.file_id,
+                                                      "data": parse_csv(raw, sniff_csv(raw))}
+                except Exception as e:
+                    st.session_state.upsert_upload = None
+                    st.error(f"❌ Error parsing upload: {str(e)}")
+                st.session_state.upsert_plan = None
+
+            upload = st.session_state.upsert_upload
+            if upload:
+                upload_df = upload['data']
+                st.write(f"Upload: {len(upload_df):,} rows, columns {', '.join(map(str, upload_df.columns))}")
+                shared = [col for col in st.session_state.working_data.columns if col in upload_df.columns]
+                col1, col2 = st.columns(2)
+                with col1:
+                    key = st.selectbox("Key column:", shared)
+                with col2:
+                    delete_missing = st.checkbox("Delete rows whose key is not in the upload")
+
+                if st.button("Preview Merge", disabled=not shared):
+                    try:
+                        plan = plan_upsert(st.session_state.working_data, upload_df, key,
+                                           journal['next_row'], delete_missing)
+                        plan['editor_version'] = st.session_state.editor_version
+                        st.session_state.upsert_plan = plan
+                    except ValueError as e:
+                        st.session_state.upsert_plan = None
+                        st.error(f"❌ {str(e)}")
+
+                plan = st.session_state.upsert_plan
+                if plan and plan['editor_version'] != st.session_state.editor_version:
+                    # The data changed since the preview
+                    st.session_state.upsert_plan = plan = None
+                if plan:
+                    col1, col2, col3, col4 = st.columns(4)
+                    col1.metric("Updated rows", f"{plan['updated']:,}", f"{plan['changed_cells']:,} cells",
+                                delta_color="off")
+                    col2.metric("Inserted rows", f"{plan['inserted']:,}")
+                    col3.metric("Deleted rows", f"{plan['deleted']:,}")
+                    col4.metric("Unchanged rows", f"{plan['unchanged']:,}")
+                    if plan['duplicate_keys']:
+                        st.warning(f"{plan['duplicate_keys']:,} duplicate key(s) in the upload; the last row wins.")
+                    if plan['ignored_columns']:
+                        st.warning("Columns not in the file are ignored: " + ", ".join(map(str, plan['ignored_columns'])))
+                    st.button("Apply Merge", disabled=not plan['step'],
+                              on_click=apply_upsert_plan)
+
+    # Group-by summary: built once, then carried across every edit step
+    with st.expander("Group-by Summary", expanded=st.session_state.summary_spec is not None):
+        columns = list(st.session_state.working_data.columns)
+        spec = st.session_state.summary_spec or {"by": [], "values": [], "aggs": ["sum", "mean"]}
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            by = st.multiselect("Group by:", columns, default=[c for c in spec['by'] if c in columns])
+        with col2:
+            values = st.multiselect("Aggregate columns:", [c for c in columns if c not in by],
+                                    default=[c for c in spec['values'] if c in columns and c not in by])
+        with col3:
+            aggs = st.multiselect("Aggregates:", SUMMARY_AGGS, default=spec['aggs'])
+
+        new_spec = {"by": by, "values": values, "aggs": aggs} if by else None
+        if new_spec is None:
+            st.session_state.summary_spec = None
+            st.session_state.csv_summary = None
+        elif st.session_state.summary_spec is None or (by, values) != (spec['by'], spec['values']):
+            st.session_state.summary_spec = new_spec
+            with st.spinner("Building summary..."):
+                rebuild_session_summary()
+        else:
+            st.session_state.summary_spec = new_spec
+
+        if st.session_state.csv_summary is not None:
+            st.dataframe(summary_table(st.session_state.csv_summary, new_spec, aggs), use_container_width=True)
+
+    # Schema validation
+    if st.session_state.csv_schema:
+        with st.expander("Schema Validation", expanded=st.session_state.validation_errors is not None):
+            st.json(st.session_state.csv_schema, expanded=False)
+            if st.button("Validate Data"):
+                errors, messages = validate_dataframe(
+                    st.session_state.working_data, st.session_state.csv_schema
+                )
+                st.session_state.validation_errors = errors if messages else None
+                if not messages:
+                    st.success("✅ Data matches the schema")
+            errors = st.session_state.validation_errors
+            if errors is not None:
+                errors = errors.reindex(st.session_state.working_data.index, fill_value=False)
+                bad_rows = errors.any(axis=1)
+                st.error(f"❌ {int(bad_rows.sum())} row(s) break the schema")
+                # Highlight offending cells, showing at most the first 500 rows
+                offending = st.session_state.working_data[bad_rows].head(500)
+                cell_errors = errors.loc[offending.index]
+                st.dataframe(offending.style.apply(
+                    lambda _: cell_errors.replace({True: 'background-color: #ffcccc', False: ''}),
+                    axis=None
+                ))
+
+    # Fan-out: apply the same edit set to the file in other repositories/branches
+    if not shards:
+        with st.expander("Fan-out to Other Repositories", expanded=False):
+            targets_text = st.text_area(
+                "Targets (one owner/repo or owner/repo@branch per line):",
+                value=st.session_state.get('fanout_targets', "")
+            )
+            st.session_state.fanout_targets = targets_text
+            targets = parse_fanout_targets(targets_text)
+            # The loaded file itself is saved normally, where its journal and sha are tracked
+            current = [target for target in targets if is_current_target(target, repo_owner, repo_name)]
+            if current:
+                st.warning(f"{repo_owner}/{repo_name} is the file you are editing; "
+                           "use \"Save Changes to GitHub\" for it. It was left out of the targets.")
+                targets = [target for target in targets if target not in current]
+            st.write(f"{len(targets)} target(s), {len(journal['done'])} edit step(s) to apply to {file_path}")
+
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("Check Targets", disabled=not targets):
+                    with st.spinner("Checking targets..."):
+                        st.session_state.fanout_results = pd.DataFrame(run_fanout(
+                            check_fanout_target, targets, file_path, get_headers(),
+                            new_rate_budget(FANOUT_RATE_RESERVE)
+                        )).drop(columns=['sha'])
+            with col2:
+                if st.button("Apply Edits to All Targets", disabled=not (targets and journal['done'])):
+                    with st.spinner("Committing to targets..."):
+                        st.session_state.fanout_results = pd.DataFrame(run_fanout(
+                            commit_fanout_target, targets, file_path, journal['done'],
+                            st.session_state.csv_schema, get_headers(),
+                            new_rate_budget(FANOUT_RATE_RESERVE), "Update CSV via Streamlit app (fan-out)"
+                        ))
+
+            if st.session_state.get('fanout_results') is not None:
+                st.dataframe(st.session_state.fanout_results, hide_index=True, use_container_width=True)
+
+    # Split the file into a sharded table, committed as a manifest plus its shards
+    if not shards and not projection:
+        with st.expander("Split into Shards", expanded=st.session_state.shard_split is not None):
+            manifest_path = st.text_input("Manifest path:",
+                                          value=os.path.splitext(file_path)[0] + SHARD_MANIFEST_SUFFIX)
+            by = st.selectbox("Partition by:", ["rows", "key"],
+                              format_func={"rows": "Row range", "key": "Value of a key column"}.get)
+            if by == "key":
+                partition = {"by": "key", "column": st.selectbox("Key column:", list(st.session_state.csv_data.columns))}
+            else:
+                partition = {"by": "rows", "rows": int(st.number_input(
+                    f"Rows per shard (0 = as many as fit in {SHARD_MAX_BYTES // 1024:,} KB):", min_value=0, value=0, step=1000
+                ))}
+            remove = st.checkbox(f"Delete {file_path} in the same commit")
+            st.caption("The saved version of the file is split; partitions too large for one shard are split further.")
+            if journal['done']:
+                st.caption("Save or undo your edits first.")
+            if not manifest_path.endswith(SHARD_MANIFEST_SUFFIX):
+                st.caption(f"The manifest path must end in {SHARD_MANIFEST_SUFFIX}.")
+            if st.button("Split into Shards",
+                         disabled=bool(journal['done']) or not manifest_path.endswith(SHARD_MANIFEST_SUFFIX)):
+                with st.spinner("Committing shards..."):
+                    st.session_state.shard_split = split_into_shards(
+                        repo_owner, repo_name, file_path, manifest_path, partition, remove
+                    )
+            split = st.session_state.shard_split
+            if split:
+                if split['success']:
+                    st.success(split['message'])
+                    st.button("Open Sharded Table", on_click=open_file, args=(split['manifest_path'],))
+                else:
+                    st.error(split['message'])
+
+    # Export the edited data to a file, written in chunks
+    with st.expander("Export Edited Data", expanded=st.session_state.export_file is not None):
+        export_format = st.selectbox("Format:", available_export_formats(),
+                                     format_func=lambda name: EXPORT_FORMATS[name][0])
+        if st.button("Prepare Export"):
+            with st.spinner("Writing export..."), worker_progress("Exporting in a worker process..."):
+                try:
+                    export_path = export_frame(st.session_state.working_data, export_format,
+                                               st.session_state.csv_dialect)
+                    with open(export_path, 'rb') as f:
+                        st.session_state.export_file = {
+                            "name": os.path.splitext(os.path.basename(file_path))[0] + f".{export_format}",
+                            "format": export_format,
+                            "data": f.read()
+                        }
+                    os.remove(export_path)
+                except ValueError as e:
+                    st.error(f"❌ {str(e)}")
+        export_file = st.session_state.export_file
+        if export_file:
+            st.download_button(
+                f"Download {export_file['name']} ({len(export_file['data']):,} bytes)",
+                data=export_file['data'], file_name=export_file['name'],
+                mime=EXPORT_FORMATS[export_file['format']][1],
+                on_click=lambda: st.session_state.update(export_file=None)
+            )
+
+    # Version history: load past versions and diff any two of them (single files only)
+    if not shards:
+        with st.expander("Version History", expanded=st.session_state.file_history is not None):
+            if st.button("Load History"):
+                with st.spinner("Listing commits..."):
+                    try:
+                        st.session_state.file_history = fetch_file_commits(
+                            token_hash(get_github_token()), repo_owner, repo_name, file_path,
+                            st.session_state.file_sha, get_headers()
+                        )
+                    except requests.RequestException as e:
+                        st.error(f"❌ Could not list commits: {str(e)}")
+
+            history = st.session_state.file_history
+            if history:
+                labels = {"working": "Working copy (unsaved edits)"}
+                labels.update({
+                    commit['sha']: f"{commit['date'][:10]} {commit['sha'][:7]} {commit['author']}: {commit['message']}"
+                    for commit in history
+                })
+                commit_shas = [commit['sha'] for commit in history]
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    older = st.selectbox("Older version:", commit_shas, index=min(1, len(commit_shas) - 1),
+                                         format_func=labels.get)
+                with col2:
+                    newer = st.selectbox("Newer version:", ["working"] + commit_shas, format_func=labels.get)
+                with col3:
+                    key = st.selectbox("Match rows by key column:",
+                                       ["(none)"] + list(st.session_state.working_data.columns))
+
+                if st.button("Compare Versions"):
+                    with st.spinner("Loading and comparing versions..."):
+                        try:
+                            old_df = load_version(repo_owner, repo_name, file_path, older)
+                            new_df = (st.session_state.working_data if newer == "working"
+                                      else load_version(repo_owner, repo_name, file_path, newer))
+                            st.session_state.history_diff = {
+                                "older": labels[older], "newer": labels[newer],
+                                **diff_versions(old_df, new_df, None if key == "(none)" else key)
+                            }
+                        except requests.RequestException as e:
+                            st.error(f"❌ Could not load version: {str(e)}")
+
+                diff = st.session_state.history_diff
+                if diff:
+                    st.write(f"**{diff['older']}** → **{diff['newer']}**")
+                    col1, col2, col3, col4 = st.columns(4)
+                    col1.metric("Added rows", len(diff['added']))
+                    col2.metric("Removed rows", len(diff['removed']))
+                    col3.metric("Changed cells", len(diff['changed']))
+                    col4.metric("Unchanged rows", diff['unchanged'])
+                    if diff['columns_added'] or diff['columns_removed']:
+                        st.write(f"Columns added: {', '.join(map(str, diff['columns_added'])) or 'none'} | "
+                                 f"removed: {', '.join(map(str, diff['columns_removed'])) or 'none'}")
+                    for label, frame in (("Changed cells", diff['changed']), ("Added rows", diff['added']),
+                                         ("Removed rows", diff['removed'])):
+                        if len(frame):
+                            st.write(f"{label}:")
+                            st.dataframe(frame.head(1000), hide_index=label == "Changed cells")
+
+                if st.checkbox("Show the older version"):
+                    st.dataframe(load_version(repo_owner, repo_name, file_path, older))
+            elif history == []:
+                st.info("No commits touch this file.")
+
+    # Save changes
+    if st.button("Save Changes to GitHub"):
+        with st.spinner("Saving changes..."), worker_progress("Writing the CSV in a worker process..."):
+            success, message = save_journal_to_github(
+                repo_owner, repo_name, file_path
+            )
+            if success:
+                st.success(message)
+            elif st.session_state.save_offline:
+                st.warning(message)
+            else:
+                st.error(message)
+
+# Main UI flow
+def render():
+    init_session_state(BASE_SESSION_STATE)
+    init_session_state(EDITOR_SESSION_STATE)
+
+    st.title("GitHub CSV Editor")
+    github_token = prompt_for_token()
+    render_env_status()
+
+    if github_token:
+        render_token_step(file_path=st.session_state.get('file_path') or get_env_variable('FILE_PATH'))
+
+        # Repository test section
+        if st.session_state.token_valid:
+            repo_owner, repo_name = render_repo_step(on_valid=start_prefetch)
+
+            # File test section
+            if st.session_state.repo_valid:
+                render_file_step(repo_owner, repo_name)
+
+        # Add a reset button at the bottom
+        if st.session_state.token_checked:
+            if st.button("Start Over"):
+                start_over()
+
+    else:
+        st.info("Please enter your GitHub Personal Access Token to check authorization.")
@@ -0,0 +1,166 @@
+# Fan-out: replay one edit set onto the same CSV in many repositories/branches
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import streamlit as st
+from github_csv.core import GITHUB_API_URL, get_env_variable
+from github_csv.csv_io import decode_csv, commit_payload, file_bytes
+from github_csv.journal import replay_journal
+from github_csv.schema import validate_dataframe
+
+# Fan-out settings: concurrent workers and API calls kept in reserve
+FANOUT_MAX_WORKERS = int(get_env_variable('FANOUT_MAX_WORKERS', '4'))
+FANOUT_RATE_RESERVE = int(get_env_variable('FANOUT_RATE_RESERVE', '100'))
+
+# Parse fan-out targets, one "owner/repo" or "owner/repo@branch" per line
+def parse_fanout_targets(text):
+    targets = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or '/' not in line:
+            continue
+        repo, _, branch = line.partition('@')
+        owner, _, name = repo.partition('/')
+        targets.append((owner.strip(), name.strip(), branch.strip() or None))
+    return targets
+
+# A target on the default branch of the repository being edited is the loaded file itself
+def is_current_target(target, repo_owner, repo_name):
+    owner, name, branch = target
+    return branch is None and (owner.lower(), name.lower()) == (repo_owner.lower(), repo_name.lower())
+
+# Shared rate-limit budget for fan-out workers, seeded from the last /rate_limit check
+def new_rate_budget(reserve):
+    rate_data = st.session_state.get('rate_data') or {}
+    remaining = rate_data.get('resources', {}).get('core', {}).get('remaining', 5000)
+    return {"lock": threading.Lock(), "remaining": remaining, "reserve": reserve}
+
+# Make one GitHub call within the shared budget
+# Secondary rate limits (403/429 with Retry-After) are retried once
+def budgeted_request(budget, method, url, headers, **kwargs):
+    with budget['lock']:
+        if budget['remaining'] <= budget['reserve']:
+            return None
+        budget['remaining'] -= 1
+
+    response = requests.request(method, url, headers=headers, **kwargs)
+    retry_after = response.headers.get('Retry-After')
+    if response.status_code in (403, 429) and retry_after and int(retry_after) <= 60:
+        time.sleep(int(retry_after))
+        if hasattr(kwargs.get('data'), 'seek'):
+            # A streamed body was consumed by the first attempt
+            kwargs['data'].seek(0)
+        response = requests.request(method, url, headers=headers, **kwargs)
+
+    remaining = response.headers.get('X-RateLimit-Remaining')
+    if remaining is not None:
+        with budget['lock']:
+            budget['remaining'] = min(budget['remaining'], int(remaining))
+    return response
+
+# Check repository and file access for one fan-out target
+# A failed request is reported in the target's row; it does not stop the other targets.
+def check_fanout_target(target, file_path, headers, budget):
+    repo_owner, repo_name, branch = target
+    result = {"target": f"{repo_owner}/{repo_name}" + (f"@{branch}" if branch else ""),
+              "repository": "", "file": "", "sha": None}
+
+    try:
+        response = budgeted_request(budget, "GET", f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}", headers)
+    except requests.RequestException as e:
+        result['repository'] = f"error: {e}"
+        return result
+    if response is None:
+        result['repository'] = "skipped: rate limit reserve reached"
+        return result
+    result['repository'] = "ok" if response.status_code == 200 else f"error {response.status_code}"
+    if response.status_code != 200:
+        return result
+
+    file_url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/contents/{file_path}"
+    try:
+        response = budgeted_request(budget, "GET", file_url, headers, params={"ref": branch} if branch else None)
+    except requests.RequestException as e:
+        result['file'] = f"error: {e}"
+        return result
+    if response is None:
+        result['file'] = "skipped: rate limit reserve reached"
+    elif response.status_code == 200:
+        result['file'] = "ok"
+        result['sha'] = response.json()['sha']
+    else:
+        result['file'] = f"error {response.status_code}"
+    return result
+
+# Replay the edit journal onto one fan-out target and commit it
+# Rows are matched by label, so the replay's guards keep another file's rows safe: edits and
+# deletes of rows that hold other values there are skipped and counted as conflicts.
+# Any failure is reported in the target's row; it does not stop the other targets.
+def commit_fanout_target(target, file_path, steps, schema, headers, budget, message):
+    repo_owner, repo_name, branch = target
+    result = {"target": f"{repo_owner}/{repo_name}" + (f"@{branch}" if branch else ""),
+              "status": "", "conflicts": 0, "detail": ""}
+
+    file_url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/contents/{file_path}"
+    try:
+        response = budgeted_request(budget, "GET", file_url, headers, params={"ref": branch} if branch else None)
+    except requests.RequestException as e:
+        result['status'] = "failed"
+        result['detail'] = f"Request failed: {e}"
+        return result
+    if response is None:
+        result['status'] = "skipped"
+        result['detail'] = "rate limit reserve reached"
+        return result
+    if response.status_code != 200:
+        result['status'] = "failed"
+        result['detail'] = f"{response.status_code} - {response.text[:200]}"
+        return result
+
+    try:
+        file_data = response.json()
+        # Files over 1 MB come without inline content and are downloaded raw
+        raw = file_bytes(repo_owner, repo_name, file_path, file_data, headers, branch)
+        base_df, dialect = decode_csv(file_data, raw=raw)
+        df, conflicts, _ = replay_journal(base_df, steps)
+    except Exception as e:
+        result['status'] = "failed"
+        result['detail'] = f"Error parsing CSV: {str(e)}"
+        return result
+    result['conflicts'] = len(conflicts)
+    if conflicts:
+        result['detail'] = "; ".join(conflicts[:3])
+
+    if schema:
+        _, messages = validate_dataframe(df, schema)
+        if messages:
+            result['status'] = "invalid"
+            result['detail'] = "; ".join(messages)
+            return result
+
+    fields = {"message": message, "sha": file_data['sha']}
+    if branch:
+        fields['branch'] = branch
+    try:
+        with commit_payload(df, dialect, fields) as body:
+            response = budgeted_request(budget, "PUT", file_url, dict(headers, **{"Content-Type": "application/json"}),
+                                        data=body)
+    except Exception as e:
+        result['status'] = "failed"
+        result['detail'] = f"Commit failed: {e}"
+        return result
+    if response is None:
+        result['status'] = "skipped"
+        result['detail'] = "rate limit reserve reached"
+    elif response.status_code in (200, 201):
+        result['status'] = "committed"
+    else:
+        result['status'] = "conflict" if response.status_code == 409 else "failed"
+        result['detail'] = f"{response.status_code} - {response.text[:200]}"
+    return result
+
+# Run one fan-out function over all targets on a bounded thread pool
+def run_fanout(worker, targets, *args):
+    with ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS) as executor:
+        return list(executor.map(lambda target: worker(target, *args), targets))
@@ -0,0 +1,124 @@
+# GraphQL backend for the setup checks: one query returns the repository and the file's blob,
+# and its answer fills the same session state as check_repository and check_file. The token is
+# validated the REST way, through the cached check. Saves and everything after the load still
+# use the REST API.
+import time
+import streamlit as st
+from github_csv.core import get_env_variable, get_headers, GITHUB_API_URL
+
+# GraphQL endpoint; GitHub Enterprise serves REST under /api/v3 and GraphQL under /api/graphql
+GITHUB_GRAPHQL_URL = get_env_variable(
+    'GITHUB_GRAPHQL_URL',
+    GITHUB_API_URL[:-len('/v3')] + '/graphql' if GITHUB_API_URL.endswith('/v3') else GITHUB_API_URL + '/graphql'
+)
+
+# What Steps 2-3 need, in one round trip; the blob is skipped without a file
+SETUP_QUERY = """
+query Setup($owner: String!, $name: String!, $expression: String!, $withFile: Boolean!) {
+  repository(owner: $owner, name: $name) {
+    databaseId
+    nameWithOwner
+    defaultBranchRef { name }
+    object(expression: $expression) @include(if: $withFile) {
+      ... on Blob { oid byteSize isBinary isTruncated text }
+    }
+  }
+}
+"""
+
+# Run the setup query; raises requests.HTTPError when GitHub rejects the request
+def fetch_setup(repo_owner, repo_name, file_path, headers):
+    import requests
+
+    variables = {"owner": repo_owner, "name": repo_name, "expression": f"HEAD:{file_path or ''}",
+                 "withFile": bool(file_path)}
+    response = requests.post(GITHUB_GRAPHQL_URL, headers=headers, json={"query": SETUP_QUERY, "variables": variables})
+    response.raise_for_status()
+    return response
+
+# Error messages the query returned for one top-level field
+def field_errors(body, field):
+    return "; ".join(error.get('message', '') for error in body.get('errors') or []
+                     if (error.get('path') or [None])[0] == field)
+
+# A Contents API entry for a blob the query returned, or None when its text is not the file's bytes
+# GraphQL gives no text for binary or large blobs, and decodes text as UTF-8, so the length check
+# sends files in other encodings back to the REST download.
+def blob_file_data(blob, file_path):
+    import base64
+    import posixpath
+
+    if not blob or blob.get('isBinary') or blob.get('isTruncated') or blob.get('text') is None:
+        return None
+    raw = blob['text'].encode('utf-8')
+    if len(raw) != blob['byteSize']:
+        return None
+    return {"type": "file", "name": posixpath.basename(file_path), "path": file_path, "sha": blob['oid'],
+            "size": blob['byteSize'], "content": base64.b64encode(raw).decode(), "encoding": "base64"}
+
+# Parse a blob the query returned, on the prefetch pool; the result matches load_csv_file's
+def parse_blob(file_data):
+    from github_csv.csv_io import decode_csv
+
+    result = {"status_code": 200, "file_data": file_data, "etag": None}
+    try:
+        result['csv_data'], result['csv_dialect'] = decode_csv(file_data)
+    except Exception as e:
+        result['error'] = f"Error parsing CSV: {str(e)}"
+    return result
+
+# Hand the file the query returned to check_file through the prefetch slot
+# The size is kept even when the text was unusable, so sizing the load needs no extra call.
+def stash_blob(repo_owner, repo_name, file_path, blob):
+    from concurrent.futures import Future
+    from github_csv.prefetch import get_prefetch_executor, discard_prefetch, start_prefetch
+
+    file_data = blob_file_data(blob, file_path)
+    if file_data is None:
+        start_prefetch(repo_owner, repo_name)
+        future = (st.session_state.get('prefetch') or {}).get('future')
+        if future is None:
+            future = Future()
+            future.set_result(None)
+    else:
+        discard_prefetch()
+        future = get_prefetch_executor().submit(parse_blob, file_data)
+    st.session_state.prefetch = {"key": (repo_owner, repo_name, file_path), "future": future,
+                                 "started": time.time(), "size": blob.get('byteSize') if blob else None}
+
+# Steps 1-3: validate the token, then fill the repository and (for file_path) file state in one query
+# The repository comes from the session or .env; without one only the token is checked.
+def check_setup(file_path=None):
+    import requests
+    from github_csv.core import validate_token
+
+    if not validate_token():
+        return
+    repo_owner = st.session_state.get('repo_owner') or get_env_variable('REPO_OWNER')
+    repo_name = st.session_state.get('repo_name') or get_env_variable('REPO_NAME')
+    if not (repo_owner and repo_name):
+        return
+    st.session_state.repo_owner = repo_owner
+    st.session_state.repo_name = repo_name
+    st.session_state.repo_checked = True
+    try:
+        response = fetch_setup(repo_owner, repo_name, file_path, get_headers())
+    except requests.HTTPError as e:
+        st.session_state.repo_valid = False
+        st.session_state.repo_error = e.response.text
+        return
+
+    body = response.json()
+    data = body.get('data') or {}
+    repository = data.get('repository')
+    if not repository:
+        st.session_state.repo_valid = False
+        st.session_state.repo_error = field_errors(body, 'repository') or "Repository not found"
+        return
+    st.session_state.repo_valid = True
+    st.session_state.repo_data = {
+        "id": repository.get('databaseId'), "full_name": repository['nameWithOwner'],
+        "default_branch": (repository.get('defaultBranchRef') or {}).get('name')
+    }
+    if file_path and file_path.endswith('.csv'):
+        stash_blob(repo_owner, repo_name, file_path, repository.get('object'))
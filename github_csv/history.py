@@ -0,0 +1,96 @@
+# Version history of a CSV: commits touching it, past versions cached by blob sha, and row diffs
+import base64
+import posixpath
+import requests
+import pandas as pd
+import streamlit as st
+from github_csv.core import GITHUB_API_URL, VALIDATION_CACHE_TTL, get_env_variable
+from github_csv.csv_io import sniff_csv, parse_csv, row_fingerprints
+
+# How many commits the history panel lists, and how many parsed versions stay cached
+HISTORY_LIMIT = int(get_env_variable('HISTORY_LIMIT', '30'))
+HISTORY_CACHE_ENTRIES = int(get_env_variable('HISTORY_CACHE_ENTRIES', '20'))
+
+# List the commits touching a file, newest first
+# file_sha is only part of the cache key: a commit to the file changes it, so the list is
+# fetched again after a save or a remote change instead of lagging for the TTL.
+@st.cache_data(ttl=VALIDATION_CACHE_TTL, show_spinner=False)
+def fetch_file_commits(token_key, repo_owner, repo_name, file_path, file_sha, _headers, limit=HISTORY_LIMIT):
+    commits_url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/commits"
+    response = requests.get(commits_url, headers=_headers, params={"path": file_path, "per_page": limit})
+    response.raise_for_status()
+    return [{
+        "sha": commit['sha'],
+        "date": commit['commit']['committer']['date'],
+        "author": commit['commit']['author']['name'],
+        "message": commit['commit']['message'].splitlines()[0] if commit['commit']['message'] else ""
+    } for commit in response.json()]
+
+# Blob sha of a file at a commit, read from its directory listing so no content is downloaded
+# Commits never change, so there is no TTL; None means the file did not exist at that commit
+@st.cache_data(show_spinner=False, max_entries=1000)
+def fetch_blob_sha(token_key, repo_owner, repo_name, file_path, commit_sha, _headers):
+    directory, name = posixpath.split(file_path)
+    listing_url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/contents/{directory}"
+    response = requests.get(listing_url, headers=_headers, params={"ref": commit_sha})
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return next((entry['sha'] for entry in response.json() if entry['name'] == name), None)
+
+# Download and parse one blob; commits sharing the same content share this entry
+@st.cache_data(show_spinner=False, max_entries=HISTORY_CACHE_ENTRIES)
+def load_blob_version(token_key, repo_owner, repo_name, blob_sha, _headers):
+    blob_url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/git/blobs/{blob_sha}"
+    response = requests.get(blob_url, headers=_headers)
+    response.raise_for_status()
+    raw = base64.b64decode(response.json()['content'])
+    return parse_csv(raw, sniff_csv(raw))
+
+# Compare two versions row by row using fingerprints
+# Rows are matched as a multiset, so reordering is not a change and duplicates are counted.
+# With a key column, a removed and an added row sharing a key are reported as cell changes.
+def diff_versions(old_df, new_df, key=None):
+    columns = list(old_df.columns) + [col for col in new_df.columns if col not in old_df.columns]
+    old_rows = old_df.reindex(columns=columns)
+    new_rows = new_df.reindex(columns=columns)
+
+    old_keys = occurrence_keys(row_fingerprints(old_rows))
+    new_keys = occurrence_keys(row_fingerprints(new_rows))
+    removed = old_rows[~old_keys.isin(new_keys)]
+    added = new_rows[~new_keys.isin(old_keys)]
+
+    changed = pd.DataFrame(columns=[key or "key", "column", "old", "new"])
+    if key and key in old_df.columns and key in new_df.columns:
+        paired = removed.drop_duplicates(key, keep=False).merge(
+            added.drop_duplicates(key, keep=False), on=key, suffixes=("_old", "_new")
+        )
+        if len(paired):
+            cells = []
+            for col in columns:
+                if col == key:
+                    continue
+                before, after = paired[f"{col}_old"], paired[f"{col}_new"]
+                differs = (before != after) & ~(before.isna() & after.isna())
+                if differs.any():
+                    cells.append(pd.DataFrame({key: paired.loc[differs, key], "column": col,
+                                               "old": before[differs], "new": after[differs]}))
+            if cells:
+                changed = pd.concat(cells, ignore_index=True).sort_values(key, kind="stable")
+            removed = removed[~removed[key].isin(paired[key])]
+            added = added[~added[key].isin(paired[key])]
+
+    return {
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+        "columns_added": [col for col in new_df.columns if col not in old_df.columns],
+        "columns_removed": [col for col in old_df.columns if col not in new_df.columns],
+        "unchanged": int(old_keys.isin(new_keys).sum())
+    }
+
+# Pair each fingerprint with its occurrence number, so duplicate rows are matched one for one
+def occurrence_keys(fingerprints):
+    return pd.MultiIndex.from_arrays([
+        fingerprints.to_numpy(), fingerprints.groupby(fingerprints.to_numpy()).cumcount().to_numpy()
+    ])
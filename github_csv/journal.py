@@ -0,0 +1,260 @@
+# Edit journal: the data editor's deltas recorded as undoable steps over the loaded CSV
+# Bulk operations (uploads, dedupe) use frame-valued ops so a 100k-row change is still one step:
+#   {"op": "patch", "rows": labels, "old": frame, "new": frame}  cells of existing rows
+#   {"op": "add_rows", "rows": labels, "values": frame}            rows appended at the end
+#   {"op": "delete_rows", "rows": labels, "pos": positions, "values": frame}
+import warnings
+import numpy as np
+import pandas as pd
+import streamlit as st
+from github_csv.summary import rebuild_session_summary, update_session_summary
+from github_csv.offline import persist_journal
+
+# Start a fresh edit journal on top of the loaded CSV
+# Added rows are labelled from next_row, past every row of the file: a projection holds only
+# some of them, so it counts from the file's row count instead of its own last label.
+def reset_journal():
+    base = st.session_state.csv_data
+    projection = st.session_state.get('csv_projection') or {}
+    st.session_state.working_data = base.copy() if base is not None else None
+    st.session_state.edit_journal = {
+        "done": [],
+        "undone": [],
+        "next_row": max(int(base.index.max()) + 1 if base is not None and len(base) else 0,
+                        projection.get('file_rows', 0))
+    }
+    st.session_state.editor_version += 1
+    rebuild_session_summary()
+    persist_journal(rewrite=True)
+
+# Write a block of cells by label, widening a column to object when the values do not fit its dtype
+# A block covering every row in order replaces its columns outright, dtype included, so a
+# whole-column cast and its undo both change the column's type.
+def set_cells(df, rows, values):
+    if len(rows) == len(df) and df.index.equals(pd.Index(rows)):
+        for col in values.columns:
+            df[col] = values[col].to_numpy() if values[col].dtype == object else values[col].set_axis(df.index)
+        return
+    for col in values.columns:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', FutureWarning)
+            try:
+                df.loc[rows, col] = values[col].to_numpy()
+                continue
+            except (FutureWarning, ValueError, TypeError):
+                pass
+        df[col] = df[col].astype(object)
+        df.loc[rows, col] = values[col].to_numpy()
+
+# Put deleted rows back at their old positions (ascending positions in the frame before the delete)
+def insert_rows(df, positions, values):
+    total = len(df) + len(values)
+    order = np.empty(total, dtype=np.int64)
+    restored = np.zeros(total, dtype=bool)
+    restored[positions] = True
+    order[restored] = np.arange(len(df), total)
+    order[~restored] = np.arange(len(df))
+    return pd.concat([df, values]).iloc[order]
+
+# Apply one journal step (a list of operations) to a DataFrame
+def apply_step(df, step):
+    for op in step:
+        if op['op'] == 'edit':
+            df.loc[op['row'], op['col']] = op['new']
+        elif op['op'] == 'delete':
+            df = df.drop(index=op['row'])
+        elif op['op'] == 'add':
+            df.loc[op['row']] = pd.Series(op['values'], dtype=object)
+        elif op['op'] == 'patch':
+            set_cells(df, op['rows'], op['new'])
+        elif op['op'] == 'delete_rows':
+            df = df.drop(index=op['rows'])
+        elif op['op'] == 'add_rows':
+            df = pd.concat([df, op['values']])
+    return df
+
+# Undo one journal step on a DataFrame
+def revert_step(df, step):
+    for op in reversed(step):
+        if op['op'] == 'edit':
+            df.loc[op['row'], op['col']] = op['old']
+        elif op['op'] == 'delete':
+            row = pd.DataFrame([op['values']], index=[op['row']])
+            df = pd.concat([df.iloc[:op['pos']], row, df.iloc[op['pos']:]])
+        elif op['op'] == 'add':
+            df = df.drop(index=op['row'])
+        elif op['op'] == 'patch':
+            set_cells(df, op['rows'], op['old'])
+        elif op['op'] == 'delete_rows':
+            df = insert_rows(df, op['pos'], op['values'])
+        elif op['op'] == 'add_rows':
+            df = df.drop(index=op['rows'])
+    return df
+
+# Record a finished step: apply it to the working data and make it the newest undoable step
+def record_step(step):
+    journal = st.session_state.edit_journal
+    st.session_state.working_data = apply_step(st.session_state.working_data, step)
+    update_session_summary(step, st.session_state.working_data)
+    journal['done'].append(step)
+    journal['undone'] = []
+    added = [label for op in step if op['op'] == 'add_rows' for label in op['rows']]
+    if added:
+        journal['next_row'] = max(journal['next_row'], int(max(added)) + 1)
+    st.session_state.editor_version += 1
+    persist_journal()
+
+# Turn the data editor's delta (edited, deleted and added rows) into one journal step
+def capture_editor_changes(editor_key):
+    changes = st.session_state[editor_key]
+    df = st.session_state.working_data
+    journal = st.session_state.edit_journal
+    step = []
+
+    # Edited and deleted rows are addressed by position in the frame shown to the editor
+    for pos, values in changes.get('edited_rows', {}).items():
+        label = df.index[int(pos)]
+        for col, new_value in values.items():
+            step.append({"op": "edit", "row": label, "col": col,
+                         "old": df.at[label, col], "new": new_value})
+
+    # Deletions are recorded from the bottom up so positions stay valid on undo
+    for pos in sorted(changes.get('deleted_rows', []), reverse=True):
+        label = df.index[pos]
+        step.append({"op": "delete", "row": label, "pos": pos,
+                     "values": df.loc[label].to_dict()})
+
+    for values in changes.get('added_rows', []):
+        step.append({"op": "add", "row": journal['next_row'], "values": values})
+        journal['next_row'] += 1
+
+    if step:
+        record_step(step)
+
+    # A new key gives the editor a clean delta on top of the updated frame
+    st.session_state.editor_version += 1
+
+# Undo the last edit step
+def undo_edit():
+    journal = st.session_state.edit_journal
+    if journal['done']:
+        step = journal['done'].pop()
+        update_session_summary(step, st.session_state.working_data, undo=True)
+        st.session_state.working_data = revert_step(st.session_state.working_data, step)
+        journal['undone'].append(step)
+        st.session_state.editor_version += 1
+        persist_journal()
+
+# Redo the last undone edit step
+def redo_edit():
+    journal = st.session_state.edit_journal
+    if journal['undone']:
+        step = journal['undone'].pop()
+        st.session_state.working_data = apply_step(st.session_state.working_data, step)
+        update_session_summary(step, st.session_state.working_data)
+        journal['done'].append(step)
+        st.session_state.editor_version += 1
+        persist_journal()
+
+# Labels an op refers to, mapped through moved (added rows relabelled during a replay)
+def relabel_op(op, moved):
+    if not moved:
+        return op
+    if 'row' in op:
+        return dict(op, row=moved.get(op['row'], op['row']))
+    rows = [moved.get(row, row) for row in op['rows']]
+    if rows == list(op['rows']):
+        return op
+    op = dict(op, rows=rows)
+    for name in ('old', 'new', 'values'):
+        if name in op:
+            op[name] = op[name].set_axis(rows)
+    return op
+
+# Replay the journal onto a freshly fetched base, skipping cells that changed remotely
+# Rows the journal added take new labels when the base already uses theirs (rows added remotely);
+# later ops on those rows follow them to the new labels. Returns the frame, the conflicts and the
+# steps as replayed: skipped ops left out, labels moved, and old values and positions read from
+# the new base, so undoing them restores that base. Ops are applied one at a time for that.
+def replay_journal(base_df, steps):
+    df = base_df.copy()
+    conflicts = []
+    moved = {}
+    replayed = []
+    for step in steps:
+        clean_step = []
+        for op in step:
+            op = relabel_op(op, moved)
+            if op['op'] == 'edit':
+                if op['row'] not in df.index:
+                    conflicts.append(f"Row {op['row']} was deleted remotely; edit of {op['col']} skipped")
+                    continue
+                current = df.at[op['row'], op['col']]
+                if not (pd.isna(current) and pd.isna(op['old'])) and current != op['old'] and current != op['new']:
+                    conflicts.append(f"Row {op['row']}, column {op['col']} changed remotely to {current!r}")
+                    continue
+                op = dict(op, old=current)
+            elif op['op'] == 'delete':
+                if op['row'] not in df.index:
+                    continue
+                # The label may now hold another record (rows inserted remotely); only delete the row it was
+                current = df.loc[op['row']]
+                if not all((pd.isna(current[col]) and pd.isna(value)) or current[col] == value
+                           for col, value in op['values'].items() if col in df.columns):
+                    conflicts.append(f"Row {op['row']} changed remotely; its delete was skipped")
+                    continue
+                op = dict(op, pos=int(df.index.get_loc(op['row'])), values=current.to_dict())
+            elif op['op'] == 'add':
+                if op['row'] in df.index:
+                    moved[op['row']] = int(df.index.max()) + 1
+                    op = dict(op, row=moved[op['row']])
+            elif op['op'] == 'patch':
+                op = replay_patch(df, op, conflicts)
+            elif op['op'] == 'delete_rows':
+                op = replay_delete_rows(df, op, conflicts)
+            elif op['op'] == 'add_rows':
+                collide = op['values'].index.isin(df.index)
+                if collide.any():
+                    # Past the op's own labels too, so a new label cannot repeat one it keeps
+                    start = max(int(df.index.max()), int(max(op['values'].index))) + 1
+                    labels = np.asarray(op['values'].index, dtype=object)
+                    labels[collide] = range(start, start + int(collide.sum()))
+                    moved.update(zip(op['values'].index[collide], labels[collide]))
+                    op = dict(op, rows=list(labels), values=op['values'].set_axis(labels))
+            clean_step.append(op)
+            df = apply_step(df, [op])
+        if clean_step:
+            replayed.append(clean_step)
+    return df, conflicts, replayed
+
+# Replay a bulk delete: rows deleted remotely are already gone, and rows whose cells no longer
+# match the deleted values hold another record now (or were edited remotely) and are kept
+def replay_delete_rows(df, op, conflicts):
+    rows = [row for row in op['rows'] if row in df.index]
+    values = op['values'].loc[rows]
+    columns = [col for col in values.columns if col in df.columns]
+    current = df.loc[rows, columns]
+    same = ((current == values[columns]) | (current.isna() & values[columns].isna())).all(axis=1).to_numpy()
+    if not same.all():
+        conflicts.append(f"{int((~same).sum())} deleted row(s) changed remotely and were kept")
+        rows = [row for row, keep in zip(rows, same) if keep]
+    positions = df.index.get_indexer(rows)
+    order = np.argsort(positions)
+    rows = [rows[i] for i in order]
+    return dict(op, rows=rows, pos=positions[order], values=df.loc[rows])
+
+# Replay a bulk patch: cells whose current value matches neither the old nor the new value
+# changed remotely and keep their remote value; rows deleted remotely are dropped
+def replay_patch(df, op, conflicts):
+    rows = [row for row in op['rows'] if row in df.index]
+    if len(rows) < len(op['rows']):
+        conflicts.append(f"{len(op['rows']) - len(rows)} patched row(s) were deleted remotely")
+    old, new = op['old'].loc[rows], op['new'].loc[rows]
+    current = df.loc[rows, new.columns]
+    same_old = (current == old) | (current.isna() & old.isna())
+    same_new = (current == new) | (current.isna() & new.isna())
+    changed = ~(same_old | same_new)
+    if changed.to_numpy().any():
+        conflicts.append(f"{int(changed.to_numpy().sum())} patched cell(s) changed remotely and were skipped")
+        new = new.mask(changed, current)
+    return dict(op, rows=rows, old=current, new=new)
@@ -0,0 +1,252 @@
+# Out-of-core mirror: a CSV streamed into a local SQLite table, then paged, filtered and sorted
+# with SQL so memory stays flat however large the file is. Edits are written back to the table
+# and a save streams the table out as the commit payload.
+import os
+import json
+import sqlite3
+import hashlib
+import tempfile
+import contextlib
+import pandas as pd
+from github_csv.core import get_env_variable, fetch_file_raw
+from github_csv.csv_io import SNIFF_BYTES, sniff_csv
+from github_csv.strategy import MIRROR_DIR
+
+# Rows parsed and inserted at a time while building a mirror, and rows read back per export block
+MIRROR_CHUNK_ROWS = int(get_env_variable('MIRROR_CHUNK_ROWS', '50000'))
+
+# Rows shown per page in the mirror editor
+MIRROR_PAGE_ROWS = int(get_env_variable('MIRROR_PAGE_ROWS', '500'))
+
+# Column holding each row's label (its position in the file when the mirror was built)
+ROW_ID = "__row"
+
+# Filter operators offered in the mirror view, as SQL; the value is always a bound parameter
+MIRROR_FILTERS = {
+    "=": "= ?", "≠": "!= ?", "<": "< ?", "≤": "<= ?", ">": "> ?", "≥": ">= ?",
+    "contains": "LIKE ?", "is empty": "IS NULL"
+}
+
+# Quote a column name as an SQL identifier
+def quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+# A value sqlite3 can bind: numpy scalars become Python numbers and missing values NULL
+def sql_value(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+# The database file for a file in a repository; the token hash keeps users' mirrors apart
+def mirror_path(token_key, repo_owner, repo_name, file_path):
+    name = hashlib.sha256(f"{token_key}:{repo_owner}/{repo_name}/{file_path}".encode()).hexdigest()[:32]
+    return os.path.join(MIRROR_DIR, f"{name}.sqlite3")
+
+# A connection to a SQLite file: committed when the block succeeds, rolled back when it fails
+# and closed either way (sqlite3's own context manager only commits)
+@contextlib.contextmanager
+def open_db(path):
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+# A connection to a mirror's database
+def connect(mirror):
+    return open_db(mirror['path'])
+
+# SQLite column types fixed from the first block of rows, so later blocks are stored the same way:
+# numbers become INTEGER or REAL, everything else TEXT; columns empty in the first block stay untyped
+def column_types(first):
+    types = {}
+    for col in first.columns:
+        kind = first[col].dtype.kind
+        if first[col].isna().all():
+            types[col] = ""
+        else:
+            types[col] = "INTEGER" if kind in 'iub' else "REAL" if kind == 'f' else "TEXT"
+    return types
+
+# Read a mirror's description (columns, dialect, sha, rows, next label, indexes) from its meta table
+def read_mirror(path):
+    if not os.path.exists(path):
+        return None
+    with open_db(path) as conn:
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        except sqlite3.Error:
+            return None
+    if 'complete' not in meta:
+        return None
+    mirror = {key: json.loads(value) for key, value in meta.items()}
+    mirror['path'] = path
+    return mirror
+
+# Store fields of a mirror's description
+def write_meta(conn, **fields):
+    conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                     [(key, json.dumps(value)) for key, value in fields.items()])
+
+# Stream a file from the repository into a SQLite mirror, or reuse the mirror of the same version
+# The download goes to disk in blocks and is parsed MIRROR_CHUNK_ROWS rows at a time, so neither
+# the file nor the table is ever held in memory. A mirror holding unsaved edits is kept even if
+# the file moved on, so the edits are not thrown away. Returns the mirror's description.
+def build_mirror(path, repo_owner, repo_name, file_path, headers, sha, indexes=()):
+    mirror = read_mirror(path)
+    if mirror and (mirror['sha'] == sha or mirror['dirty']):
+        return update_indexes(mirror, indexes)
+
+    os.makedirs(MIRROR_DIR, exist_ok=True)
+    response = fetch_file_raw(repo_owner, repo_name, file_path, headers, stream=True)
+    response.raise_for_status()
+    with tempfile.NamedTemporaryFile(dir=MIRROR_DIR, suffix=".csv", delete=False) as download:
+        for block in response.iter_content(chunk_size=1024 * 1024):
+            download.write(block)
+
+    building = path + ".building"
+    try:
+        with open(download.name, 'rb') as f:
+            dialect = sniff_csv(f.read(SNIFF_BYTES + 1))
+        if os.path.exists(building):
+            os.remove(building)
+        options = dict(sep=dialect['sep'], quotechar=dialect['quotechar'], encoding=dialect['encoding'],
+                       header=0 if dialect['header'] else None)
+        # Types come from the first block; text columns are then read as text in every block,
+        # so a later block of digits is not stored as numbers
+        first = pd.read_csv(download.name, nrows=MIRROR_CHUNK_ROWS, **options)
+        first.columns = [str(col) for col in first.columns]
+        types = column_types(first)
+        text = [position for position, col in enumerate(first.columns) if types[col] == "TEXT"]
+        del first
+        with open_db(building) as conn:
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            rows, columns = 0, None
+            reader = pd.read_csv(download.name, dtype={position: str for position in text},
+                                 chunksize=MIRROR_CHUNK_ROWS, **options)
+            for chunk in reader:
+                chunk.columns = [str(col) for col in chunk.columns]
+                if columns is None:
+                    columns = list(chunk.columns)
+                    # Each column's type affinity makes SQLite store every block's values alike;
+                    # the row label is the rowid
+                    conn.execute(f"CREATE TABLE data ({quote(ROW_ID)} INTEGER PRIMARY KEY, "
+                                 + ", ".join(f"{quote(col)} {types[col]}".rstrip() for col in columns) + ")")
+                chunk.index = pd.RangeIndex(rows, rows + len(chunk))
+                chunk.to_sql("data", conn, if_exists="append", index=True, index_label=ROW_ID)
+                rows += len(chunk)
+            write_meta(conn, columns=columns or [], dialect=dialect, sha=sha, rows=rows,
+                       next_row=rows, indexes=[], dirty=False, complete=True)
+        os.replace(building, path)
+    finally:
+        os.remove(download.name)
+        if os.path.exists(building):
+            os.remove(building)
+    return update_indexes(read_mirror(path), indexes)
+
+# Create indexes on the chosen columns and drop the ones no longer chosen
+def update_indexes(mirror, indexes):
+    indexes = [col for col in indexes if col in mirror['columns']]
+    with connect(mirror) as conn:
+        for col in set(mirror['indexes']) - set(indexes):
+            conn.execute(f"DROP INDEX IF EXISTS {quote('index ' + col)}")
+        for col in indexes:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {quote('index ' + col)} ON data ({quote(col)})")
+        write_meta(conn, indexes=indexes)
+    mirror['indexes'] = indexes
+    return mirror
+
+# WHERE clause and parameters for a list of (column, operator, value) filters
+def where_clause(filters):
+    conditions, params = [], []
+    for col, operator, value in filters:
+        conditions.append(f"{quote(col)} {MIRROR_FILTERS[operator]}")
+        if operator == "contains":
+            params.append(f"%{value}%")
+        elif operator != "is empty":
+            params.append(value)
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+# Filter values are typed text; compare them as numbers when they look like numbers
+def filter_value(text):
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+    if number != number or number in (float('inf'), float('-inf')):
+        return text
+    return int(number) if number.is_integer() and "." not in text else number
+
+# One page of the mirror with filters and a sort applied; returns the page and the matching row count
+# Rows keep their label as index, so edits made on the page can be written back by label.
+def query_page(mirror, filters=(), sort=None, descending=False, page=0, page_rows=None):
+    page_rows = page_rows or MIRROR_PAGE_ROWS
+    where, params = where_clause(filters)
+    order = f"{quote(sort)} {'DESC' if descending else 'ASC'}, " if sort else ""
+    with connect(mirror) as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM data{where}", params).fetchone()[0]
+        df = pd.read_sql_query(
+            f"SELECT * FROM data{where} ORDER BY {order}{quote(ROW_ID)} LIMIT ? OFFSET ?",
+            conn, params=params + [page_rows, page * page_rows], index_col=ROW_ID
+        )
+    df.index.name = None
+    return df, total
+
+# Write journal steps to the mirror's table; labels are row ids, so ops map to single-row SQL
+def apply_steps(mirror, steps, next_row):
+    row_id = quote(ROW_ID)
+    with connect(mirror) as conn:
+        for step in steps:
+            for op in step:
+                if op['op'] == 'edit':
+                    conn.execute(f"UPDATE data SET {quote(op['col'])} = ? WHERE {row_id} = ?",
+                                 (sql_value(op['new']), sql_value(op['row'])))
+                elif op['op'] == 'delete':
+                    conn.execute(f"DELETE FROM data WHERE {row_id} = ?", (sql_value(op['row']),))
+                elif op['op'] == 'add':
+                    columns = [col for col in op['values'] if col in mirror['columns']]
+                    conn.execute(
+                        f"INSERT INTO data ({row_id}{''.join(', ' + quote(col) for col in columns)}) "
+                        f"VALUES ({', '.join('?' * (len(columns) + 1))})",
+                        [sql_value(op['row'])] + [sql_value(op['values'][col]) for col in columns]
+                    )
+                elif op['op'] == 'patch':
+                    for col in op['new'].columns:
+                        conn.executemany(f"UPDATE data SET {quote(col)} = ? WHERE {row_id} = ?",
+                                         [(sql_value(value), sql_value(row))
+                                          for row, value in op['new'][col].items()])
+                elif op['op'] == 'delete_rows':
+                    conn.executemany(f"DELETE FROM data WHERE {row_id} = ?", [(sql_value(row),) for row in op['rows']])
+                elif op['op'] == 'add_rows':
+                    op['values'].to_sql("data", conn, if_exists="append", index=True, index_label=ROW_ID)
+        rows = conn.execute("SELECT COUNT(*) FROM data").fetchone()[0]
+        write_meta(conn, rows=rows, next_row=next_row, dirty=True)
+    mirror.update(rows=rows, next_row=next_row, dirty=True)
+
+# Stream the mirror's rows in file order as frames, for a commit payload or an export
+# An empty mirror still yields one empty frame so the header row is written.
+def iter_mirror_frames(mirror, chunk_rows=None):
+    chunk_rows = chunk_rows or MIRROR_CHUNK_ROWS
+    with connect(mirror) as conn:
+        chunks = pd.read_sql_query(
+            f"SELECT {', '.join(quote(col) for col in mirror['columns'])} FROM data ORDER BY {quote(ROW_ID)}",
+            conn, chunksize=chunk_rows
+        )
+        empty = True
+        for chunk in chunks:
+            empty = False
+            yield chunk
+        if empty:
+            yield pd.DataFrame(columns=mirror['columns'])
+
+# Record the commit a save produced as the mirror's version; its edits are now saved
+def set_mirror_sha(mirror, sha):
+    with connect(mirror) as conn:
+        write_meta(conn, sha=sha, dirty=False)
+    mirror.update(sha=sha, dirty=False)
+
+# Delete a mirror's database
+def discard_mirror(mirror):
+    if os.path.exists(mirror['path']):
+        os.remove(mirror['path'])
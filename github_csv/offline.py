@@ -0,0 +1,316 @@
+# Durable edit journal: every journal change is mirrored into a local SQLite database keyed by
+# token hash, repository and file, so a refresh or crash does not lose edits. Saves that fail
+# because GitHub is unreachable are queued there and synced by a background thread.
+# Tokens are never written to disk; the sync thread only syncs files whose token it holds in memory.
+import os
+import io
+import json
+import time
+import base64
+import sqlite3
+import threading
+import streamlit as st
+from github_csv.core import get_env_variable, get_github_token, token_hash, GITHUB_API_URL
+
+# Where the journal database lives
+JOURNAL_DB_PATH = get_env_variable(
+    'JOURNAL_DB_PATH', os.path.join(os.path.expanduser('~'), '.st_change_csv', 'journal.sqlite3')
+)
+
+# Seconds between background attempts to sync queued saves
+SYNC_INTERVAL = int(get_env_variable('SYNC_INTERVAL', '15'))
+
+# One row per file a session is editing, plus its steps in order. sync_state is NULL, 'queued',
+# 'syncing', 'synced' (the first synced_steps steps are in commit synced_sha) or 'conflict'.
+# The projection, the dialect and each step are JSON; see encode_step for the frames in a step.
+JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS journals (
+    token_hash TEXT, repo_owner TEXT, repo_name TEXT, file_path TEXT,
+    base_sha TEXT, projection TEXT, dialect TEXT, updated_at REAL,
+    sync_state TEXT, sync_error TEXT, synced_steps INTEGER, synced_sha TEXT, merged INTEGER,
+    PRIMARY KEY (token_hash, repo_owner, repo_name, file_path)
+);
+CREATE TABLE IF NOT EXISTS journal_steps (
+    token_hash TEXT, repo_owner TEXT, repo_name TEXT, file_path TEXT, seq INTEGER, step TEXT,
+    PRIMARY KEY (token_hash, repo_owner, repo_name, file_path, seq)
+);
+"""
+
+# Bumped when stored journals can no longer be read; version 0 pickled its steps
+JOURNAL_SCHEMA_VERSION = 1
+
+KEY_WHERE = "token_hash = ? AND repo_owner = ? AND repo_name = ? AND file_path = ?"
+
+# Create the database and its tables once per process
+# A sync cut short by a restart is queued again.
+@st.cache_resource
+def init_journal_db():
+    os.makedirs(os.path.dirname(JOURNAL_DB_PATH) or '.', exist_ok=True)
+    with sqlite3.connect(JOURNAL_DB_PATH) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] < JOURNAL_SCHEMA_VERSION:
+            # Older journals are pickles, which are never loaded: anyone who can write the file could run code
+            conn.executescript("DROP TABLE IF EXISTS journals; DROP TABLE IF EXISTS journal_steps;")
+            conn.execute(f"PRAGMA user_version = {JOURNAL_SCHEMA_VERSION}")
+        conn.executescript(JOURNAL_SCHEMA)
+        conn.execute("UPDATE journals SET sync_state = 'queued' WHERE sync_state = 'syncing'")
+    return JOURNAL_DB_PATH
+
+# A connection for the calling thread; sqlite3 connections are not shared between threads
+def connect():
+    return sqlite3.connect(init_journal_db(), timeout=30)
+
+# Tokens of sessions that queued a save, by token hash; held in memory only
+@st.cache_resource
+def get_sync_tokens():
+    return {}
+
+# The journal key of the file this session has open, or None before a file is loaded
+def journal_key():
+    file_path = st.session_state.get('file_path')
+    if not file_path or st.session_state.get('csv_data') is None:
+        return None
+    if st.session_state.get('csv_mirror'):
+        # A mirror's edits are written to its own database
+        return None
+    if st.session_state.get('csv_shards'):
+        # Queued saves replay onto a single file; a sharded table's edits stay in the session
+        return None
+    return (token_hash(get_github_token()), st.session_state.repo_owner, st.session_state.repo_name, file_path)
+
+# JSON for the values a journal holds: numpy scalars and arrays become plain numbers and lists,
+# missing values null, and a frame (the rows of a bulk op) an Arrow IPC stream in base64
+def encode_value(value):
+    import numpy as np
+    import pandas as pd
+    if isinstance(value, pd.DataFrame):
+        return {"__frame__": encode_frame(value)}
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    if value is pd.NA or value is pd.NaT:
+        return None
+    raise TypeError(f"Cannot store a {type(value).__name__} in the journal")
+
+def decode_value(obj):
+    return decode_frame(obj['__frame__']) if '__frame__' in obj else obj
+
+# A frame as an Arrow IPC stream, index included
+# Arrow columns hold one type and would coerce the rest, so an object column that is not all
+# text (a widened column) is stored as the JSON of each cell and listed in the stream's metadata.
+def encode_frame(df):
+    import pandas as pd
+    import pyarrow as pa
+    mixed = [col for col in df.columns[df.dtypes == object]
+             if pd.api.types.infer_dtype(df[col], skipna=True) not in ('string', 'empty')]
+    if mixed:
+        df = df.assign(**{col: [json.dumps(value, default=encode_value) for value in df[col]] for col in mixed})
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    table = table.replace_schema_metadata(dict(table.schema.metadata, mixed_columns=json.dumps(mixed)))
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return base64.b64encode(sink.getvalue()).decode('ascii')
+
+def decode_frame(data):
+    import pandas as pd
+    import pyarrow as pa
+    table = pa.ipc.open_stream(base64.b64decode(data)).read_all()
+    df = table.to_pandas()
+    for col in json.loads(table.schema.metadata[b'mixed_columns']):
+        df[col] = pd.Series([json.loads(value, object_hook=decode_value) for value in df[col]],
+                            index=df.index, dtype=object)
+    return df
+
+# A journal step (a list of ops) as JSON text, and back
+def encode_step(step):
+    return json.dumps(step, default=encode_value)
+
+def decode_step(text):
+    return json.loads(text, object_hook=decode_value)
+
+# Mirror the session's journal into the database
+# Steps only change at the end of the journal, so only the difference is written; rewrite=True
+# replaces them all after the journal was rebuilt (replayed or restored).
+# A queued or syncing journal belongs to the sync: only the session that queued (or resumed) it
+# adds to it, and a rebuilt journal, a reload of the file, never overwrites it.
+def persist_journal(rewrite=False):
+    key = journal_key()
+    if key is None or st.session_state.get('stored_journal'):
+        # An earlier journal is waiting for the user to restore or discard it
+        return
+    done = st.session_state.edit_journal['done']
+    with connect() as conn:
+        row = conn.execute(f"SELECT sync_state FROM journals WHERE {KEY_WHERE}", key).fetchone()
+        if row and row[0] in ('queued', 'syncing'):
+            if rewrite:
+                # The session's journal no longer holds the queued steps
+                st.session_state.sync_owner = None
+            if rewrite or st.session_state.get('sync_owner') != key:
+                return
+        conn.execute(
+            "INSERT INTO journals (token_hash, repo_owner, repo_name, file_path, base_sha, projection, dialect, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT DO UPDATE SET base_sha = excluded.base_sha, "
+            "projection = excluded.projection, dialect = excluded.dialect, updated_at = excluded.updated_at",
+            key + (st.session_state.file_sha, json.dumps(st.session_state.csv_projection, default=encode_value),
+                   json.dumps(st.session_state.csv_dialect, default=encode_value), time.time())
+        )
+        stored = 0 if rewrite else conn.execute(f"SELECT COUNT(*) FROM journal_steps WHERE {KEY_WHERE}", key).fetchone()[0]
+        conn.execute(f"DELETE FROM journal_steps WHERE {KEY_WHERE} AND seq >= ?", key + (min(stored, len(done)),))
+        conn.executemany(
+            "INSERT INTO journal_steps VALUES (?, ?, ?, ?, ?, ?)",
+            [key + (seq, encode_step(done[seq])) for seq in range(stored, len(done))]
+        )
+
+# Read the journal stored for a key: base sha, steps and sync state; None when there is none
+def read_stored_journal(key):
+    with connect() as conn:
+        row = conn.execute(
+            f"SELECT base_sha, projection, dialect, updated_at, sync_state, sync_error, synced_steps, synced_sha, merged "
+            f"FROM journals WHERE {KEY_WHERE}", key
+        ).fetchone()
+        if row is None:
+            return None
+        steps = [decode_step(step) for (step,) in conn.execute(
+            f"SELECT step FROM journal_steps WHERE {KEY_WHERE} ORDER BY seq", key
+        )]
+    return {
+        "base_sha": row[0], "projection": json.loads(row[1]), "dialect": json.loads(row[2]),
+        "updated_at": row[3], "sync_state": row[4], "sync_error": row[5], "synced_steps": row[6] or 0,
+        "synced_sha": row[7], "merged": bool(row[8]), "steps": steps
+    }
+
+# Look for edits left behind by an earlier session before the fresh load overwrites them
+# Steps a background sync already committed are dropped, and what is left is keyed to that commit.
+# A save still queued is offered as "pending": restoring it resumes its sync with this session's token.
+def find_stored_journal():
+    key = journal_key()
+    stored = read_stored_journal(key) if key else None
+    if not stored:
+        return None
+    stored['pending'] = stored['sync_state'] in ('queued', 'syncing')
+    if stored['pending']:
+        return stored
+    if stored['sync_state'] == 'synced':
+        stored['steps'] = stored['steps'][stored['synced_steps']:]
+        stored['base_sha'] = stored['synced_sha']
+    return stored if stored['steps'] else None
+
+# Set a journal's sync state and any of its other sync columns
+def update_sync_state(key, state, **fields):
+    columns = dict(fields, sync_state=state)
+    with connect() as conn:
+        conn.execute(f"UPDATE journals SET {', '.join(f'{name} = ?' for name in columns)} WHERE {KEY_WHERE}",
+                     tuple(columns.values()) + key)
+
+# Set or clear the sync state of the open file's journal
+def set_sync_state(state, **fields):
+    key = journal_key()
+    if key is not None:
+        update_sync_state(key, state, **fields)
+
+# The open file's sync state, as the background thread last left it
+def read_sync_state():
+    key = journal_key()
+    if key is None:
+        return None
+    with connect() as conn:
+        row = conn.execute(f"SELECT sync_state, sync_error, synced_steps, synced_sha, merged FROM journals WHERE {KEY_WHERE}",
+                           key).fetchone()
+    if row is None:
+        return None
+    return {"sync_state": row[0], "sync_error": row[1], "synced_steps": row[2] or 0,
+            "synced_sha": row[3], "merged": bool(row[4])}
+
+# Whether a queued save for the open file has not been taken over by the session yet
+def sync_pending():
+    sync = read_sync_state()
+    return bool(sync) and sync['sync_state'] in ('queued', 'syncing', 'synced')
+
+# Drop a queued save that the sync thread has not picked up; False when it is already syncing
+def cancel_queued_sync():
+    with connect() as conn:
+        return conn.execute(f"UPDATE journals SET sync_state = NULL, sync_error = NULL WHERE {KEY_WHERE} "
+                            "AND sync_state = 'queued'", journal_key()).rowcount > 0
+
+# Make this session the owner of the open file's queued save and hand the sync thread its token,
+# which a restart of the process forgets
+def resume_sync():
+    st.session_state.sync_owner = journal_key()
+    get_sync_tokens()[token_hash(get_github_token())] = get_github_token()
+    get_sync_worker().set()
+
+# Queue the open file's journal for a background save and wake the sync thread
+def queue_sync():
+    persist_journal()
+    set_sync_state('queued', sync_error=None)
+    resume_sync()
+
+# Commit one queued journal: replay its steps onto the latest version of the file and PUT it
+# Network errors and SHA races leave it queued for the next attempt; conflicts and other
+# failures stop it until the user saves again.
+def sync_journal(key, token):
+    import requests
+    from github_csv.csv_io import load_csv_file, commit_payload
+    from github_csv.journal import replay_journal
+
+    repo_owner, repo_name, file_path = key[1:]
+    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
+    stored = read_stored_journal(key)
+    steps = stored['steps']
+
+    try:
+        # Read the file the way the session did: a header-less file parses differently
+        dialect = stored['dialect'] or {}
+        result = load_csv_file(repo_owner, repo_name, file_path, headers, header=dialect.get('header', True))
+        if result['status_code'] != 200 or 'csv_data' not in result:
+            state = 'queued' if result['status_code'] >= 500 else 'conflict'
+            return update_sync_state(key, state, sync_error=f"Could not read the file: {result.get('error', '')}")
+        merged, conflicts, _ = replay_journal(result['csv_data'], steps)
+        if conflicts:
+            return update_sync_state(key, 'conflict', sync_error="; ".join(conflicts))
+
+        remote_sha = result['file_data']['sha']
+        fields = {"message": "Update CSV via Streamlit app", "sha": remote_sha}
+        with commit_payload(merged, dict(result['csv_dialect'], **dialect), fields) as body:
+            response = requests.put(
+                f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/contents/{file_path}",
+                headers=dict(headers, **{"Content-Type": "application/json"}), data=body
+            )
+        if response.status_code in (200, 201):
+            return update_sync_state(key, 'synced', sync_error=None, synced_steps=len(steps),
+                                     synced_sha=response.json()['content']['sha'],
+                                     merged=int(remote_sha != stored['base_sha']))
+        # 409: the file moved on between the read and the write, so the next attempt replays again
+        state = 'queued' if response.status_code == 409 or response.status_code >= 500 else 'conflict'
+        update_sync_state(key, state, sync_error=f"{response.status_code} - {response.text[:200]}")
+    except requests.RequestException as e:
+        update_sync_state(key, 'queued', sync_error=str(e))
+    except Exception as e:
+        update_sync_state(key, 'conflict', sync_error=f"Sync failed: {e}")
+
+# Background loop: sync every queued journal whose token is known, then wait for the next round
+def sync_loop(wake):
+    while True:
+        wake.wait(SYNC_INTERVAL)
+        wake.clear()
+        tokens = get_sync_tokens()
+        with connect() as conn:
+            queued = conn.execute(
+                "SELECT token_hash, repo_owner, repo_name, file_path FROM journals WHERE sync_state = 'queued'"
+            ).fetchall()
+        for key in queued:
+            token = tokens.get(key[0])
+            if token is None:
+                continue
+            with connect() as conn:
+                claimed = conn.execute(f"UPDATE journals SET sync_state = 'syncing' WHERE {KEY_WHERE} AND sync_state = 'queued'",
+                                       key).rowcount
+            if claimed:
+                sync_journal(key, token)
+
+# The process-wide sync thread, started on first use; returns the event that wakes it
+@st.cache_resource
+def get_sync_worker():
+    wake = threading.Event()
+    threading.Thread(target=sync_loop, args=(wake,), daemon=True, name="journal-sync").start()
+    return wake
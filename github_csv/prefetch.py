@@ -0,0 +1,76 @@
+# Background prefetch of the likely CSV once the repository is validated
+import time
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from github_csv.core import get_env_variable, get_github_token, get_headers, token_hash
+
+# Background prefetch settings: worker threads and how long an unused result is kept (seconds)
+PREFETCH_MAX_WORKERS = int(get_env_variable('PREFETCH_MAX_WORKERS', '4'))
+PREFETCH_TTL = int(get_env_variable('PREFETCH_TTL', '300'))
+
+# Process-wide pool for background prefetches
+@st.cache_resource
+def get_prefetch_executor():
+    return ThreadPoolExecutor(max_workers=PREFETCH_MAX_WORKERS, thread_name_prefix="csv-prefetch")
+
+# Most recently loaded file per token and repository, shared by all sessions
+@st.cache_resource
+def get_recent_files():
+    return {}
+
+# Remember the file a session loaded so the next prefetch for that repository picks it
+def remember_recent_file(repo_owner, repo_name, file_path):
+    get_recent_files()[(token_hash(get_github_token()), repo_owner, repo_name)] = file_path
+
+# Runs on the pool; importing the CSV module here keeps pandas off the script thread's cold path
+# Files too large to load whole are not prefetched; the user picks how to open them first
+def prefetch_csv_file(repo_owner, repo_name, file_path, headers):
+    from github_csv.core import fetch_file_size
+    from github_csv.strategy import available_memory, choose_strategy
+
+    if choose_strategy(fetch_file_size(repo_owner, repo_name, file_path, headers), available_memory())['strategy'] != "full":
+        return None
+    from github_csv.csv_io import load_csv_file
+    return load_csv_file(repo_owner, repo_name, file_path, headers)
+
+# Start fetching and parsing the likely CSV as soon as the repository is validated
+def start_prefetch(repo_owner, repo_name):
+    expire_prefetch()
+    recent_key = (token_hash(get_github_token()), repo_owner, repo_name)
+    file_path = (st.session_state.get('file_path') or get_env_variable('FILE_PATH')
+                 or get_recent_files().get(recent_key))
+    if not file_path or not file_path.endswith('.csv'):
+        return
+
+    discard_prefetch()
+    future = get_prefetch_executor().submit(prefetch_csv_file, repo_owner, repo_name, file_path, get_headers())
+    st.session_state.prefetch = {"key": (repo_owner, repo_name, file_path), "future": future,
+                                 "started": time.time()}
+
+# Drop a prefetch that will not be used; a queued download is cancelled outright
+def discard_prefetch():
+    prefetch = st.session_state.get('prefetch')
+    if prefetch:
+        prefetch['future'].cancel()
+        st.session_state.prefetch = None
+
+# Drop a prefetch older than PREFETCH_TTL, or one for another file than key, so its parsed frame
+# is not held by the session until a load that will never use it
+def expire_prefetch(key=None):
+    prefetch = st.session_state.get('prefetch')
+    if prefetch and (time.time() - prefetch['started'] > PREFETCH_TTL or (key and prefetch['key'] != key)):
+        discard_prefetch()
+
+# Hand over a prefetched result if it matches the requested file and is still fresh
+def take_prefetch(repo_owner, repo_name, file_path):
+    expire_prefetch((repo_owner, repo_name, file_path))
+    prefetch = st.session_state.get('prefetch')
+    if not prefetch:
+        return None
+
+    st.session_state.prefetch = None
+    try:
+        return prefetch['future'].result()
+    except Exception:
+        # Fall back to a normal load if the background fetch failed
+        return None
@@ -0,0 +1,174 @@
+# On-demand profiling: wrap the next reruns of the app in cProfile and tracemalloc and keep the
+# top functions, allocation sites and a .pstats dump of each. Only GitHub logins listed in
+# PROFILE_ADMINS see the panel, and nothing is traced unless one of them asks for it.
+# A login proves who is visiting only when the visitor entered the token themselves, so with a
+# shared GITHUB_TOKEN in .env nobody gets the panel.
+import time
+import threading
+import streamlit as st
+from github_csv.core import get_env_variable, init_session_state
+
+# GitHub logins allowed to profile, comma separated; empty turns profiling off
+PROFILE_ADMINS = [login.strip() for login in get_env_variable('PROFILE_ADMINS').split(',') if login.strip()]
+
+# Functions and allocation sites kept per rerun
+PROFILE_TOP = int(get_env_variable('PROFILE_TOP', '30'))
+
+# Reruns kept per session; older ones are dropped with their .pstats dump
+PROFILE_KEEP_RUNS = int(get_env_variable('PROFILE_KEEP_RUNS', '10'))
+
+# Stack frames tracemalloc records per allocation
+PROFILE_TRACE_FRAMES = int(get_env_variable('PROFILE_TRACE_FRAMES', '10'))
+
+# Functions whose cost the panel totals per rerun, by name
+PROFILE_FOCUS = {
+    "read_csv": "CSV parse (read_csv)",
+    "to_csv": "CSV write (to_csv)",
+    "b64encode": "base64 encode",
+    "b64decode": "base64 decode",
+    "data_editor": "st.data_editor",
+    "convert_pandas_df_to_arrow_bytes": "Arrow serialisation"
+}
+
+PROFILING_SESSION_STATE = {
+    "profile_remaining": 0,
+    "profile_runs": []
+}
+
+# tracemalloc is process-wide, so concurrent captures share it; the last one to finish stops it
+TRACE_LOCK = threading.Lock()
+TRACE_USERS = [0]
+
+# Whether the signed-in user may profile: an admin login from a token this session entered
+def profiling_allowed():
+    if not PROFILE_ADMINS or get_env_variable('GITHUB_TOKEN') or not st.session_state.get('github_token'):
+        return False
+    user_data = st.session_state.get('user_data') or {}
+    return user_data.get('login') in PROFILE_ADMINS
+
+# Start tracing allocations for one capture; returns the snapshot the rerun is compared to
+def start_tracing():
+    import tracemalloc
+
+    with TRACE_LOCK:
+        if TRACE_USERS[0] == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILE_TRACE_FRAMES)
+        TRACE_USERS[0] += 1
+        tracemalloc.reset_peak()
+        return tracemalloc.take_snapshot()
+
+# End one capture: allocation growth by line since the snapshot, and the peak traced memory
+def stop_tracing(before):
+    import tracemalloc
+
+    with TRACE_LOCK:
+        after = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        TRACE_USERS[0] -= 1
+        if TRACE_USERS[0] == 0:
+            tracemalloc.stop()
+    return after.compare_to(before, 'lineno'), peak
+
+# Top functions of a profile by cumulative time, plus the time spent in each PROFILE_FOCUS name
+def summarise_profile(profile):
+    import pstats
+
+    stats = pstats.Stats(profile)
+    stats.sort_stats('cumulative')
+    functions = []
+    for func in stats.fcn_list[:PROFILE_TOP]:
+        calls, total_calls, own, cumulative, _ = stats.stats[func]
+        functions.append({"function": pstats.func_std_string(func), "calls": total_calls,
+                          "own_s": round(own, 4), "cumulative_s": round(cumulative, 4)})
+
+    # Nested functions of the same name (DataFrame.to_csv calling the formatter's to_csv) count once
+    focus = {}
+    for (_, _, name), (_, _, _, cumulative, _) in stats.stats.items():
+        if name in PROFILE_FOCUS:
+            focus[PROFILE_FOCUS[name]] = max(focus.get(PROFILE_FOCUS[name], 0), round(cumulative, 4))
+    return functions, focus
+
+# Run one rerun of the app under cProfile and tracemalloc when the session asked for it
+# Streamlit ends a rerun early by raising (st.rerun, st.stop), so the capture is kept either way.
+# Widget callbacks run before the script and fragment reruns skip it, so neither is captured.
+def run_profiled(render):
+    if not profiling_allowed():
+        return render()
+    init_session_state(PROFILING_SESSION_STATE)
+    if st.session_state.profile_remaining <= 0:
+        return render()
+
+    import marshal
+    import cProfile
+
+    st.session_state.profile_remaining -= 1
+    snapshot = start_tracing()
+    profile = cProfile.Profile()
+    started = time.time()
+    profile.enable()
+    try:
+        return render()
+    finally:
+        profile.disable()
+        seconds = time.time() - started
+        allocations, peak = stop_tracing(snapshot)
+        profile.create_stats()
+        # The bytes Profile.dump_stats writes, so pstats and snakeviz can open the download;
+        # taken first because pstats.Stats empties the profile it reads
+        dump = marshal.dumps(profile.stats)
+        functions, focus = summarise_profile(profile)
+        # Start Over clears the session while the rerun is running
+        runs = st.session_state.setdefault('profile_runs', [])
+        runs.append({
+            "started_at": started,
+            "seconds": round(seconds, 3),
+            "peak_bytes": peak,
+            "functions": functions,
+            "focus": focus,
+            "allocations": [{"site": str(stat.traceback[0]), "size_diff_kb": round(stat.size_diff / 1024, 1),
+                             "count_diff": stat.count_diff} for stat in allocations[:PROFILE_TOP]],
+            "pstats": dump
+        })
+        del runs[:-PROFILE_KEEP_RUNS]
+
+# Sidebar panel to request captures and read them back
+def render_profiling_panel():
+    if not profiling_allowed():
+        return
+    # The token check that signs the admin in may have run after run_profiled looked
+    init_session_state(PROFILING_SESSION_STATE)
+
+    with st.sidebar.expander("Profiling", expanded=bool(st.session_state.profile_runs)):
+        reruns = st.number_input("Reruns to profile:", min_value=1, max_value=50, value=3)
+        if st.session_state.profile_remaining:
+            st.caption(f"Profiling the next {st.session_state.profile_remaining} rerun(s).")
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Start Profiling"):
+                st.session_state.profile_remaining = int(reruns)
+        with col2:
+            if st.button("Clear Profiles"):
+                st.session_state.profile_remaining = 0
+                st.session_state.profile_runs = []
+
+        runs = st.session_state.profile_runs
+        if not runs:
+            return
+        index = st.selectbox(
+            "Rerun:", range(len(runs) - 1, -1, -1),
+            format_func=lambda i: f"{time.strftime('%H:%M:%S', time.localtime(runs[i]['started_at']))} - "
+                                  f"{runs[i]['seconds']}s"
+        )
+        run = runs[index]
+        st.write(f"{run['seconds']}s, peak traced memory {run['peak_bytes'] / 1024 ** 2:,.1f} MB")
+        if run['focus']:
+            st.dataframe([{"step": name, "seconds": seconds} for name, seconds in run['focus'].items()],
+                         hide_index=True)
+        st.write("Top functions (cumulative time):")
+        st.dataframe(run['functions'], hide_index=True)
+        st.write("Top allocation sites (growth during the rerun):")
+        st.dataframe(run['allocations'], hide_index=True)
+        st.download_button(
+            "Download .pstats", run['pstats'], mime="application/octet-stream",
+            file_name=f"rerun-{time.strftime('%Y%m%d-%H%M%S', time.localtime(run['started_at']))}.pstats"
+        )
@@ -0,0 +1,84 @@
+# Per-file schema: loading and vectorised validation
+import json
+import base64
+import requests
+import pandas as pd
+import streamlit as st
+from github_csv.core import GITHUB_API_URL, get_env_variable, get_headers
+
+# Load the validation schema for a CSV: CSV_SCHEMA in .env wins, otherwise <name>.schema.json next to the file
+def load_schema(repo_owner, repo_name, file_path):
+    schema_text = get_env_variable('CSV_SCHEMA')
+    if not schema_text:
+        schema_path = file_path[:-len('.csv')] + '.schema.json' if file_path.endswith('.csv') else file_path + '.schema.json'
+        schema_url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/contents/{schema_path}"
+        response = requests.get(schema_url, headers=get_headers())
+        if response.status_code != 200:
+            return None
+        schema_text = base64.b64decode(response.json()['content']).decode('utf-8')
+    try:
+        return json.loads(schema_text)
+    except ValueError as e:
+        st.session_state.file_error = f"Error parsing schema: {str(e)}"
+        return None
+
+# Validate a DataFrame against a schema with column-wise vectorised checks
+# Returns a boolean frame marking offending cells and a list of messages
+def validate_dataframe(df, schema):
+    errors = pd.DataFrame(False, index=df.index, columns=df.columns)
+    messages = []
+
+    for col, rules in schema.get('columns', {}).items():
+        if col not in df.columns:
+            if rules.get('required'):
+                messages.append(f"{col}: column is missing")
+            continue
+
+        values = df[col]
+        missing = values.isna()
+        checks = {}
+
+        if rules.get('required'):
+            # Whitespace-only text counts as blank for required columns
+            if values.dtype == object:
+                # Object columns may hold no strings at all (only None, numbers or dates), so cast first
+                missing |= values.astype('string').str.strip().eq('').fillna(False).astype(bool)
+            checks['is blank'] = missing
+
+        col_type = rules.get('type')
+        numbers = None
+        if col_type in ('number', 'integer'):
+            numbers = pd.to_numeric(values, errors='coerce')
+            checks['is not a number'] = numbers.isna() & ~missing
+            if col_type == 'integer':
+                checks['is not an integer'] = numbers.notna() & (numbers % 1 != 0)
+        elif col_type == 'boolean':
+            checks['is not a boolean'] = ~values.astype(str).str.lower().isin(['true', 'false', '1', '0', 'yes', 'no']) & ~missing
+        elif col_type == 'date':
+            dates = pd.to_datetime(values, errors='coerce', format=rules.get('format'))
+            checks['is not a date'] = dates.isna() & ~missing
+
+        if 'min' in rules or 'max' in rules:
+            if numbers is None:
+                numbers = pd.to_numeric(values, errors='coerce')
+            if 'min' in rules:
+                checks[f"is below {rules['min']}"] = numbers < rules['min']
+            if 'max' in rules:
+                checks[f"is above {rules['max']}"] = numbers > rules['max']
+
+        if 'enum' in rules:
+            checks['is not an allowed value'] = ~values.isin(rules['enum']) & ~missing
+
+        if 'pattern' in rules:
+            checks['does not match the pattern'] = ~values.astype(str).str.fullmatch(rules['pattern']) & ~missing
+
+        if rules.get('unique'):
+            checks['is duplicated'] = values.duplicated(keep=False) & ~missing
+
+        for problem, mask in checks.items():
+            count = int(mask.sum())
+            if count:
+                errors[col] |= mask
+                messages.append(f"{col}: {count} row(s) {problem}")
+
+    return errors, messages
@@ -0,0 +1,307 @@
+# Sharded tables: a manifest plus CSV shards, partitioned by row range or by a key column, shown
+# as one table. A save rewrites only the partitions the edit journal touched, each split to stay
+# under the Contents API's 1 MB inline limit, and commits them together through the Git Data API.
+#
+# Manifest (<name>.shards.json), shard paths relative to the manifest's directory:
+#   {"format": "st_change_csv.shards", "version": 1, "partition": {"by": "rows"} or
+#    {"by": "key", "column": "C"}, "dialect": {...}, "columns": [...], "next_id": 3,
+#    "shards": [{"id": 0, "path": "table/part-00000.csv", "key": "Japanese"}, ...]}
+import json
+import base64
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from github_csv.core import get_env_variable, fetch_file, GITHUB_API_URL
+
+# File name ending that marks a shard manifest
+SHARD_MANIFEST_SUFFIX = ".shards.json"
+
+MANIFEST_FORMAT = "st_change_csv.shards"
+
+# Largest shard written; below the 1 MB the Contents API returns inline, with room for the header
+SHARD_MAX_BYTES = int(get_env_variable('SHARD_MAX_BYTES', str(900 * 1024)))
+
+# Shards fetched or uploaded at the same time
+SHARD_MAX_WORKERS = int(get_env_variable('SHARD_MAX_WORKERS', '8'))
+
+# Row labels are shard id * SHARD_LABEL_STRIDE + position in the shard, so a row keeps its label
+# when other shards change and a journal can be replayed onto a reloaded table
+SHARD_LABEL_STRIDE = 10 ** 9
+
+# Whether a path names a shard manifest
+def is_manifest(file_path):
+    return bool(file_path) and file_path.endswith(SHARD_MANIFEST_SUFFIX)
+
+# Repository path of a shard
+def shard_path(manifest_path, shard):
+    return posixpath.normpath(posixpath.join(posixpath.dirname(manifest_path), shard['path']))
+
+# Shard file name for a new shard id, next to the manifest in a folder named after it
+def new_shard_path(manifest_path, shard_id):
+    stem = posixpath.basename(manifest_path)[:-len(SHARD_MANIFEST_SUFFIX)]
+    return f"{stem}/part-{shard_id:05d}.csv"
+
+# Partition key of values as text; missing values share the empty key
+def key_text(values):
+    return values.astype('string').fillna("")
+
+# CSV bytes of one shard; every shard carries the header so it reads on its own
+def shard_bytes(df, dialect):
+    from github_csv.csv_io import iter_csv_chunks
+
+    return b"".join(iter_csv_chunks(df, dialect))
+
+# Split a partition's rows into consecutive parts of at most SHARD_MAX_BYTES each
+# Returns (frame, bytes) pairs; no rows gives no parts. A single row over the limit is its own part.
+def split_parts(df, dialect):
+    import numpy as np
+
+    if not len(df):
+        return []
+    data = shard_bytes(df, dialect)
+    count = -(-len(data) // SHARD_MAX_BYTES)
+    while True:
+        parts = [df.iloc[rows] for rows in np.array_split(np.arange(len(df)), min(count, len(df)))]
+        encoded = [shard_bytes(part, dialect) for part in parts]
+        if count >= len(df) or all(len(data) <= SHARD_MAX_BYTES for data in encoded):
+            return list(zip(parts, encoded))
+        count += 1
+
+# Download a manifest and its shards and put them together as one table
+# Returns the load_csv_file result shape, plus "shards": the manifest, its sha and each shard's sha,
+# which a save needs to find what changed.
+def load_sharded_table(repo_owner, repo_name, manifest_path, headers):
+    import pandas as pd
+    from github_csv.csv_io import parse_csv, file_bytes
+
+    response = fetch_file(repo_owner, repo_name, manifest_path, headers)
+    if response.status_code != 200:
+        return {"status_code": response.status_code, "error": response.text}
+    result = {"status_code": 200, "file_data": response.json(), "etag": response.headers.get('ETag')}
+    try:
+        manifest = json.loads(base64.b64decode(result['file_data']['content']))
+        if manifest.get('format') != MANIFEST_FORMAT:
+            raise ValueError(f"format is not {MANIFEST_FORMAT}")
+    except (ValueError, KeyError) as e:
+        result['error'] = f"Not a shard manifest: {e}"
+        return result
+
+    dialect = manifest['dialect']
+
+    def read_shard(shard):
+        path = shard_path(manifest_path, shard)
+        response = fetch_file(repo_owner, repo_name, path, headers)
+        response.raise_for_status()
+        file_data = response.json()
+        df = parse_csv(file_bytes(repo_owner, repo_name, path, file_data, headers), dialect)
+        if list(df.columns) != manifest['columns']:
+            raise ValueError(f"{path} has columns {list(df.columns)}, the manifest lists {manifest['columns']}")
+        df.index = pd.RangeIndex(shard['id'] * SHARD_LABEL_STRIDE, shard['id'] * SHARD_LABEL_STRIDE + len(df))
+        return df, file_data['sha']
+
+    try:
+        with ThreadPoolExecutor(max_workers=SHARD_MAX_WORKERS) as pool:
+            shards = list(pool.map(read_shard, manifest['shards']))
+    except Exception as e:
+        result['error'] = f"Error reading shards: {str(e)}"
+        return result
+
+    frames = [df for df, _ in shards]
+    result['csv_data'] = pd.concat(frames) if frames else pd.DataFrame(columns=manifest['columns'])
+    result['csv_dialect'] = dialect
+    result['shards'] = {
+        "manifest_path": manifest_path,
+        "manifest": manifest,
+        "manifest_sha": result['file_data']['sha'],
+        "shas": {shard['id']: sha for shard, (_, sha) in zip(manifest['shards'], shards)}
+    }
+    return result
+
+# Labels of every row a journal touched, including deleted ones
+def touched_labels(steps):
+    import pandas as pd
+
+    labels = []
+    for step in steps:
+        for op in step:
+            if 'row' in op:
+                labels.append(op['row'])
+            else:
+                labels.extend(op['rows'])
+    return pd.Index(labels)
+
+# The partition each working row belongs to now: a shard id (rows) or a key (key)
+# Rows keep their shard's partition unless an edit moved them: new rows go to the last shard (rows)
+# and rows whose key changed go to the partition of their new key (key).
+def current_groups(state, base, working):
+    import numpy as np
+    import pandas as pd
+
+    manifest = state['manifest']
+    shards = {shard['id']: shard for shard in manifest['shards']}
+    labels = working.index.to_numpy()
+    is_base = working.index.isin(base.index)
+    origin = np.where(is_base, labels // SHARD_LABEL_STRIDE, manifest['shards'][-1]['id'])
+    if manifest['partition']['by'] == "rows":
+        return pd.Series(origin, index=working.index, dtype=object)
+
+    column = manifest['partition']['column']
+    groups = pd.Series([shards[shard_id].get('key', "") for shard_id in origin], index=working.index, dtype=object)
+    old = base[column].reindex(working.index)
+    new = working[column]
+    moved = ~is_base | ~((old == new) | (old.isna() & new.isna())).to_numpy()
+    groups[moved] = key_text(new[moved]).to_numpy()
+    return groups
+
+# Partitions a journal changed: where touched rows were when loaded, and where they are now
+def dirty_groups(state, base, working, groups, steps):
+    manifest = state['manifest']
+    shards = {shard['id']: shard for shard in manifest['shards']}
+    touched = touched_labels(steps)
+    dirty = set(groups.loc[groups.index.intersection(touched)])
+    for label in touched.intersection(base.index):
+        shard = shards[label // SHARD_LABEL_STRIDE]
+        dirty.add(shard['id'] if manifest['partition']['by'] == "rows" else shard.get('key', ""))
+    return dirty
+
+# Plan the files a save writes: each dirty partition re-split into shards that reuse its existing
+# shard ids first. Returns the files {path: bytes}, the shard paths to delete, the new manifest (None
+# when the shard list did not change), the shard ids per path and the working rows' new labels.
+def plan_shard_save(state, base, working, steps):
+    import numpy as np
+    import pandas as pd
+
+    manifest = state['manifest']
+    manifest_path = state['manifest_path']
+    by_key = manifest['partition']['by'] == "key"
+    groups = current_groups(state, base, working)
+    dirty = dirty_groups(state, base, working, groups, steps)
+
+    shards = [dict(shard) for shard in manifest['shards']]
+    next_id = manifest['next_id']
+    files, deletions, ids = {}, [], {}
+    labels = working.index.to_numpy().copy()
+    for group in dirty:
+        members = [shard for shard in shards if (shard.get('key', "") if by_key else shard['id']) == group]
+        rows = np.flatnonzero((groups == group).to_numpy())
+        parts = split_parts(working.iloc[rows], manifest['dialect'])
+        if not parts and len(shards) == len(members):
+            # The table keeps one shard, so its columns are still known
+            parts = [(working.iloc[rows], shard_bytes(working.iloc[rows], manifest['dialect']))]
+
+        position = shards.index(members[-1]) + 1 if members else len(shards)
+        offset = 0
+        for number, (part, data) in enumerate(parts):
+            if number < len(members):
+                shard = members[number]
+            else:
+                shard = {"id": next_id, "path": new_shard_path(manifest_path, next_id)}
+                if by_key:
+                    shard['key'] = group
+                next_id += 1
+                shards.insert(position, shard)
+                position += 1
+            path = shard_path(manifest_path, shard)
+            files[path] = data
+            ids[path] = shard['id']
+            labels[rows[offset:offset + len(part)]] = shard['id'] * SHARD_LABEL_STRIDE + np.arange(len(part))
+            offset += len(part)
+        for shard in members[len(parts):]:
+            deletions.append(shard_path(manifest_path, shard))
+            shards.remove(shard)
+
+    new_manifest = None
+    if [shard['id'] for shard in shards] != [shard['id'] for shard in manifest['shards']]:
+        new_manifest = dict(manifest, shards=shards, next_id=next_id)
+    return files, deletions, new_manifest, ids, pd.Index(labels)
+
+# Plan a new sharded table from a frame: files {path: bytes} including the manifest
+# partition is {"by": "rows", "rows": n} (0 = as many rows as fit) or {"by": "key", "column": col}.
+def plan_new_table(df, dialect, manifest_path, partition):
+    if partition['by'] == "key":
+        keys = key_text(df[partition['column']])
+        groups = [(key, df[(keys == key).to_numpy()]) for key in keys.unique()]
+    elif partition.get('rows'):
+        groups = [(None, df.iloc[start:start + partition['rows']]) for start in range(0, len(df), partition['rows'])]
+    else:
+        groups = [(None, df)]
+
+    files, shards = {}, []
+    for key, rows in groups or [(None, df)]:
+        parts = split_parts(rows, dialect) or [(rows, shard_bytes(rows, dialect))]
+        for _, data in parts:
+            shard = {"id": len(shards), "path": new_shard_path(manifest_path, len(shards))}
+            if key is not None:
+                shard['key'] = key
+            shards.append(shard)
+            files[shard_path(manifest_path, shard)] = data
+    manifest = {
+        "format": MANIFEST_FORMAT, "version": 1,
+        "partition": {"by": "key", "column": partition['column']} if partition['by'] == "key" else {"by": "rows"},
+        "dialect": dialect, "columns": [str(col) for col in df.columns], "next_id": len(shards), "shards": shards
+    }
+    files[manifest_path] = manifest_bytes(manifest)
+    return files, manifest
+
+def manifest_bytes(manifest):
+    return json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8') + b"\n"
+
+# Blob shas of paths at a commit, read from their directories' listings; missing paths map to None
+def current_shas(repo_owner, repo_name, paths, ref, headers):
+    import requests
+
+    shas = {}
+    for directory in sorted({posixpath.dirname(path) for path in paths}):
+        response = requests.get(f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/contents/{directory}",
+                                headers=headers, params={"ref": ref})
+        if response.status_code == 404:
+            continue
+        response.raise_for_status()
+        shas.update({posixpath.join(directory, entry['name']): entry['sha'] for entry in response.json()
+                     if entry.get('type', 'file') == 'file'})
+    return {path: shas.get(path) for path in paths}
+
+# Commit several files at once through the Git Data API: blobs, one tree, one commit, then move
+# the branch. expected maps paths to the blob sha they must still have at the branch head; a
+# mismatch returns a conflict instead of committing. A branch that moves between the read and the
+# update is retried. Returns {"status": "ok", "commit", "shas"} or {"status": "conflict", "paths"}.
+def commit_files(repo_owner, repo_name, branch, files, deletions, message, expected, headers, attempts=3):
+    import requests
+
+    api = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/git"
+
+    def post(url, body):
+        response = requests.post(url, headers=headers, json=body)
+        response.raise_for_status()
+        return response.json()
+
+    # Blobs do not depend on the head, so they are uploaded once, side by side
+    with ThreadPoolExecutor(max_workers=SHARD_MAX_WORKERS) as pool:
+        blob_shas = dict(zip(files, pool.map(
+            lambda data: post(f"{api}/blobs", {"content": base64.b64encode(data).decode(), "encoding": "base64"})['sha'],
+            files.values()
+        )))
+
+    for attempt in range(attempts):
+        response = requests.get(f"{api}/ref/heads/{branch}", headers=headers)
+        response.raise_for_status()
+        head = response.json()['object']['sha']
+        response = requests.get(f"{api}/commits/{head}", headers=headers)
+        response.raise_for_status()
+        base_tree = response.json()['tree']['sha']
+
+        current = current_shas(repo_owner, repo_name, list(expected), head, headers)
+        changed = [path for path, sha in expected.items() if current[path] != sha]
+        if changed:
+            return {"status": "conflict", "paths": changed}
+
+        tree = post(f"{api}/trees", {"base_tree": base_tree, "tree": [
+            {"path": path, "mode": "100644", "type": "blob", "sha": sha} for path, sha in blob_shas.items()
+        ] + [{"path": path, "mode": "100644", "type": "blob", "sha": None} for path in deletions]})
+        commit = post(f"{api}/commits", {"message": message, "tree": tree['sha'], "parents": [head]})
+        response = requests.patch(f"{api}/refs/heads/{branch}", headers=headers,
+                                  json={"sha": commit['sha'], "force": False})
+        if response.status_code == 200:
+            return {"status": "ok", "commit": commit['sha'], "shas": blob_shas}
+        if response.status_code != 422 or attempt == attempts - 1:
+            response.raise_for_status()
+    return {"status": "conflict", "paths": []}
@@ -0,0 +1,123 @@
+# Load strategy: choose how to open a file from its size and the memory this replica has free
+import os
+import tempfile
+from github_csv.core import get_env_variable
+
+# Memory a loaded file takes per CSV byte: the parsed frame, the working copy and journal headroom
+LOAD_MEMORY_FACTOR = float(get_env_variable('LOAD_MEMORY_FACTOR', '6'))
+
+# Share of the available memory one load may use; the rest is left to other sessions
+LOAD_MEMORY_SHARE = float(get_env_variable('LOAD_MEMORY_SHARE', '0.5'))
+
+# The Contents API does not serve files larger than this, even with the raw media type
+CONTENTS_MAX_BYTES = 100 * 1024 * 1024
+
+# Where out-of-core mirror databases are kept, one per file
+MIRROR_DIR = get_env_variable('MIRROR_DIR', os.path.join(tempfile.gettempdir(), 'st_change_csv_mirrors'))
+
+# Free disk a mirror needs per CSV byte: the downloaded file plus the database and its indexes
+MIRROR_DISK_FACTOR = 4
+
+# Strategies the loader can pick, with the label shown for each
+LOAD_STRATEGIES = {
+    "full": "Full in-memory editing",
+    "projected": "Paged editing (a window of rows)",
+    "mirror": "Out-of-core mirror (SQLite on local disk)",
+    "refuse": "Do not load"
+}
+
+# Pages smaller than this are not worth editing; below it the loader refuses
+MIN_PAGE_ROWS = 1000
+
+# Read a number of bytes from a cgroup or proc file; None when missing or unlimited
+def read_bytes(path, scale=1):
+    try:
+        with open(path) as f:
+            value = f.read().split()[0]
+    except (OSError, IndexError):
+        return None
+    if not value.isdigit():
+        return None
+    value = int(value) * scale
+    # cgroup v1 reports "no limit" as a huge page-aligned number
+    return value if value < 1 << 60 else None
+
+# Memory this replica can still use, in bytes: the lowest of the host's available memory and
+# the room left under a cgroup v2 or v1 limit. None when none of them can be read.
+def available_memory():
+    candidates = []
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    candidates.append(int(line.split()[1]) * 1024)
+    except OSError:
+        pass
+
+    for limit_path, usage_path in (('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory.current'),
+                                   ('/sys/fs/cgroup/memory/memory.limit_in_bytes',
+                                    '/sys/fs/cgroup/memory/memory.usage_in_bytes')):
+        limit, usage = read_bytes(limit_path), read_bytes(usage_path)
+        if limit is not None and usage is not None:
+            candidates.append(max(limit - usage, 0))
+    return min(candidates) if candidates else None
+
+# Free disk space where mirrors are built, in bytes; None when it cannot be read
+def mirror_disk_free():
+    import shutil
+
+    try:
+        os.makedirs(MIRROR_DIR, exist_ok=True)
+        return shutil.disk_usage(MIRROR_DIR).free
+    except OSError:
+        return None
+
+# Pick a load strategy for a file of size bytes with available bytes of memory
+# A file that does not fit goes to an out-of-core mirror when disk_free allows, otherwise to
+# paged editing, where bytes_per_row (from a head preview) turns the memory left over into a
+# page size. Returns the strategy, the memory estimate and budget, the page size and the reason.
+def choose_strategy(size, available, bytes_per_row=None, disk_free=None):
+    plan = {"strategy": "full", "size": size, "available": available, "estimate": None,
+            "budget": None, "page_rows": None, "reason": ""}
+    if size is None:
+        plan['reason'] = "The file size is unknown, so the whole file will be loaded."
+        return plan
+    if size > CONTENTS_MAX_BYTES:
+        plan['strategy'] = "refuse"
+        plan['reason'] = (f"The file is {size / 1024 ** 2:,.0f} MB; GitHub serves files up to "
+                          f"{CONTENTS_MAX_BYTES / 1024 ** 2:,.0f} MB through the Contents API. "
+                          "Split it into smaller files or edit it from a local clone.")
+        return plan
+
+    plan['estimate'] = int(size * LOAD_MEMORY_FACTOR)
+    if available is None:
+        plan['reason'] = "Available memory is unknown, so the whole file will be loaded."
+        return plan
+    plan['budget'] = int(available * LOAD_MEMORY_SHARE)
+    if plan['estimate'] <= plan['budget']:
+        plan['reason'] = (f"About {plan['estimate'] / 1024 ** 2:,.0f} MB needed of "
+                          f"{plan['budget'] / 1024 ** 2:,.0f} MB available to this session.")
+        return plan
+
+    if disk_free is not None and disk_free >= size * MIRROR_DISK_FACTOR:
+        plan['strategy'] = "mirror"
+        plan['reason'] = (f"Loading all of it needs about {plan['estimate'] / 1024 ** 2:,.0f} MB but only "
+                          f"{plan['budget'] / 1024 ** 2:,.0f} MB is available, so it will be copied into a "
+                          "local database and edited a page at a time.")
+        return plan
+
+    # A page still downloads the whole file; whatever is left after that holds the page's rows
+    page_budget = plan['budget'] - size
+    page_rows = int(page_budget / (bytes_per_row * LOAD_MEMORY_FACTOR)) if bytes_per_row and page_budget > 0 else 0
+    if page_rows >= MIN_PAGE_ROWS:
+        plan['strategy'] = "projected"
+        plan['page_rows'] = page_rows
+        plan['reason'] = (f"Loading all of it needs about {plan['estimate'] / 1024 ** 2:,.0f} MB but only "
+                          f"{plan['budget'] / 1024 ** 2:,.0f} MB is available, so it will be edited "
+                          f"{page_rows:,} rows at a time.")
+    else:
+        plan['strategy'] = "refuse"
+        plan['reason'] = (f"Loading it needs about {plan['estimate'] / 1024 ** 2:,.0f} MB but only "
+                          f"{plan['budget'] / 1024 ** 2:,.0f} MB is available. Load fewer columns, "
+                          "try again when the server is less busy or edit it from a local clone.")
+    return plan
@@ -0,0 +1,102 @@
+# Group-by summaries of the working data, built once and then kept up to date from journal steps
+import pandas as pd
+import streamlit as st
+
+# Aggregates the summary panel offers; mean is derived from sum and count
+SUMMARY_AGGS = ["sum", "count", "mean"]
+
+# Per-group row count, sum and non-null count of each value column
+# Values that are not numbers count as missing; rows with a missing key form their own group
+def aggregate_rows(df, by, values):
+    frame = df.reindex(columns=list(dict.fromkeys(by + values)))
+    numbers = frame[values].apply(pd.to_numeric, errors='coerce')
+    grouped = numbers.groupby([frame[col] for col in by], dropna=False)
+    return pd.concat([
+        grouped.size().rename("rows"),
+        grouped.sum().add_suffix(" sum"),
+        grouped.count().add_suffix(" count")
+    ], axis=1)
+
+# Full group-by over a frame; done once per load or when the summary settings change
+def build_summary(df, spec):
+    return aggregate_rows(df, spec['by'], spec['values'])
+
+# The rows a journal step touched, as they were before it and as they are after it
+# applied_df is the frame with the step applied. Deletes carry the full row, edits only the
+# old cell values, so an edited row's "before" is its current row with the old cells put back.
+def step_rows(step, applied_df):
+    before, after, old_cells = {}, {}, {}
+    added, deleted = set(), set()
+    before_frames, after_labels = [], []
+    for op in step:
+        if op['op'] == 'add':
+            added.add(op['row'])
+        elif op['op'] == 'delete':
+            deleted.add(op['row'])
+            before[op['row']] = op['values']
+        elif op['op'] == 'edit':
+            old_cells.setdefault(op['row'], {}).setdefault(op['col'], op['old'])
+        elif op['op'] == 'patch':
+            patched = applied_df.loc[op['rows']].copy()
+            for col in op['old'].columns:
+                patched[col] = op['old'][col].to_numpy()
+            before_frames.append(patched)
+            after_labels.extend(op['rows'])
+        elif op['op'] == 'add_rows':
+            after_labels.extend(op['rows'])
+        elif op['op'] == 'delete_rows':
+            before_frames.append(op['values'])
+
+    for row, cells in old_cells.items():
+        if row not in deleted and row not in added and row in applied_df.index:
+            before[row] = dict(applied_df.loc[row].to_dict(), **cells)
+    for row in (set(old_cells) | added) - deleted:
+        if row in applied_df.index:
+            after[row] = applied_df.loc[row].to_dict()
+
+    before_df = pd.DataFrame.from_dict(before, orient='index')
+    after_df = pd.DataFrame.from_dict(after, orient='index')
+    if before_frames:
+        before_df = pd.concat([before_df] + before_frames) if before else pd.concat(before_frames)
+    if after_labels:
+        bulk_after = applied_df.loc[applied_df.index.intersection(after_labels)]
+        after_df = pd.concat([after_df, bulk_after]) if after else bulk_after
+    return before_df, after_df
+
+# Move a summary across one journal step: take out the touched rows' old contributions and
+# add their new ones. With undo=True the step is being reverted, so the roles swap.
+def update_summary(summary, spec, step, applied_df, undo=False):
+    before, after = step_rows(step, applied_df)
+    if undo:
+        before, after = after, before
+    combined = pd.concat([
+        summary,
+        aggregate_rows(after, spec['by'], spec['values']),
+        -aggregate_rows(before, spec['by'], spec['values'])
+    ])
+    summary = combined.groupby(level=list(range(combined.index.nlevels)), dropna=False, sort=False).sum()
+    return summary[summary['rows'] > 0]
+
+# Summary as shown: the chosen aggregates per value column, with mean computed from sum and count
+def summary_table(summary, spec, aggs):
+    table = pd.DataFrame({"rows": summary['rows'].astype('int64')}, index=summary.index)
+    for col in spec['values']:
+        if "sum" in aggs:
+            table[f"{col} sum"] = summary[f"{col} sum"]
+        if "count" in aggs:
+            table[f"{col} count"] = summary[f"{col} count"].astype('int64')
+        if "mean" in aggs:
+            table[f"{col} mean"] = summary[f"{col} sum"] / summary[f"{col} count"].where(summary[f"{col} count"] > 0)
+    return table.sort_index()
+
+# Rebuild the session's summary from the working data, if a summary is configured
+def rebuild_session_summary():
+    spec = st.session_state.get('summary_spec')
+    df = st.session_state.get('working_data')
+    st.session_state.csv_summary = build_summary(df, spec) if spec and df is not None else None
+
+# Carry the session's summary across a journal step instead of recomputing it
+def update_session_summary(step, applied_df, undo=False):
+    spec = st.session_state.get('summary_spec')
+    if spec and st.session_state.get('csv_summary') is not None:
+        st.session_state.csv_summary = update_summary(st.session_state.csv_summary, spec, step, applied_df, undo)
@@ -0,0 +1,67 @@
+# Token checker mode: check a token, a repository and a file step by step
+import streamlit as st
+from github_csv.core import (
+    BASE_SESSION_STATE, init_session_state, get_env_variable, prompt_for_token, get_headers,
+    fetch_file, render_env_status, render_token_step, render_repo_step, reset_all
+)
+
+# Check file function
+def check_file_access(repo_owner, repo_name, file_path):
+    response = fetch_file(repo_owner, repo_name, file_path, get_headers())
+
+    st.session_state.file_checked = True
+    st.session_state.file_valid = (response.status_code == 200)
+
+    if response.status_code == 200:
+        st.session_state.file_data = response.json()
+    else:
+        st.session_state.file_error = response.text
+
+# Step 3: file test section
+def render_file_step(repo_owner, repo_name):
+    st.subheader("Step 3: Test File Access")
+
+    file_path = st.text_input("File Path:", value=get_env_variable('FILE_PATH'))
+
+    if file_path and not st.session_state.file_checked:
+        if st.button("Test File Access"):
+            with st.spinner("Checking file access..."):
+                check_file_access(repo_owner, repo_name, file_path)
+
+    if st.session_state.file_checked:
+        if st.session_state.file_valid:
+            st.success(f"✅ Successfully accessed file: {file_path}")
+            if st.session_state.get('file_data'):
+                st.write(f"File Size: {st.session_state.file_data.get('size', 'N/A')} bytes")
+                st.write(f"File Type: {st.session_state.file_data.get('type', 'N/A')}")
+        else:
+            st.error(f"❌ Failed to access file: {file_path}")
+            if st.session_state.get('file_error'):
+                st.text(st.session_state.file_error)
+
+# Main UI flow
+def render():
+    init_session_state(BASE_SESSION_STATE)
+
+    st.title("GitHub Token Authorization Checker")
+    github_token = prompt_for_token()
+    render_env_status()
+
+    if github_token:
+        render_token_step(details=True)
+
+        # Repository test section
+        if st.session_state.token_valid:
+            repo_owner, repo_name = render_repo_step(details=True)
+
+            # File test section
+            if st.session_state.repo_valid:
+                render_file_step(repo_owner, repo_name)
+
+        # Add a reset button at the bottom
+        if st.session_state.token_checked:
+            if st.button("Start Over"):
+                reset_all()
+
+    else:
+        st.info("Please enter your GitHub Personal Access Token to check authorization.")
@@ -0,0 +1,68 @@
+# Bulk upsert: merge an uploaded CSV into the working data by a key column as one journal step
+import numpy as np
+import pandas as pd
+from github_csv.csv_io import row_fingerprints
+
+# Plan an upsert of upload into df, matching rows on key with a hash join
+# Keys found in df update their row, new keys are appended with labels from next_row, and with
+# delete_missing rows whose key is not in the upload are deleted. Returns the journal step and
+# the counts shown before it is applied. Raises ValueError when the key cannot be used.
+def plan_upsert(df, upload, key, next_row, delete_missing=False):
+    if key not in df.columns or key not in upload.columns:
+        raise ValueError(f"Key column {key!r} must exist in both the loaded data and the upload.")
+    if df[key].duplicated().any():
+        raise ValueError(f"Key column {key!r} has duplicate values in the loaded data; remove them first.")
+
+    duplicate_keys = int(upload[key].duplicated(keep='last').sum())
+    upload = upload.drop_duplicates(key, keep='last')
+    columns = [col for col in upload.columns if col in df.columns and col != key]
+    ignored_columns = [col for col in upload.columns if col not in df.columns]
+
+    # Read the upload with the loaded data's types where they fit, so 1 matches 1.0
+    upload = upload.reindex(columns=list(df.columns))
+    for col in [key] + columns:
+        try:
+            upload[col] = upload[col].astype(df[col].dtype)
+        except (ValueError, TypeError):
+            pass
+
+    positions = pd.Index(df[key]).get_indexer(upload[key])
+    matched = positions >= 0
+    step = []
+
+    # Updates: only rows whose uploaded values differ from the current ones
+    labels = df.index[positions[matched]]
+    new = upload.loc[matched, columns].set_axis(labels)
+    old = df.loc[labels, columns]
+    changed = (row_fingerprints(old) != row_fingerprints(new)).to_numpy()
+    changed_cells = 0
+    if changed.any():
+        old, new = old[changed], new[changed]
+        changed_cells = int((~((old == new) | (old.isna() & new.isna()))).to_numpy().sum())
+        step.append({"op": "patch", "rows": list(old.index), "old": old, "new": new})
+
+    # Deletes: rows whose key the upload does not mention
+    deleted = 0
+    if delete_missing:
+        missing = ~df[key].isin(upload[key]).to_numpy()
+        deleted = int(missing.sum())
+        if deleted:
+            step.append({"op": "delete_rows", "rows": list(df.index[missing]),
+                         "pos": np.flatnonzero(missing), "values": df[missing]})
+
+    # Inserts: new keys become rows at the end
+    inserts = upload[~matched]
+    if len(inserts):
+        new_labels = list(range(next_row, next_row + len(inserts)))
+        step.append({"op": "add_rows", "rows": new_labels, "values": inserts.set_axis(new_labels)})
+
+    return {
+        "step": step,
+        "updated": int(changed.sum()),
+        "changed_cells": changed_cells,
+        "unchanged": int(matched.sum() - changed.sum()),
+        "inserted": len(inserts),
+        "deleted": deleted,
+        "duplicate_keys": duplicate_keys,
+        "ignored_columns": ignored_columns
+    }
@@ -0,0 +1,141 @@
+# Remote watcher: poll the open file with conditional requests and rebase local edits onto changes
+import numpy as np
+import pandas as pd
+import streamlit as st
+from github_csv.core import get_env_variable, get_headers, fetch_file
+from github_csv.csv_io import decode_csv, file_bytes, row_fingerprints
+from github_csv.history import occurrence_keys
+
+# Seconds between remote checks; 0 turns the watcher off
+WATCH_INTERVAL = int(get_env_variable('WATCH_INTERVAL', '30'))
+
+# Relabel a remote version of the file so it lines up with the loaded base
+# Rows are matched by fingerprint and keep their base label. Unmatched rows are then paired in
+# order within the same gap between matched rows (rows edited in place keep their label), and
+# any other remote rows get new labels from next_row. Returns the relabelled remote frame and
+# counts of changed, added and removed rows.
+def rebase_remote(base, remote, next_row):
+    base_keys = occurrence_keys(row_fingerprints(base))
+    remote_keys = occurrence_keys(row_fingerprints(remote))
+    base_positions = base_keys.get_indexer(remote_keys)
+    matched = base_positions >= 0
+
+    labels = np.empty(len(remote), dtype=object)
+    labels[matched] = base.index[base_positions[matched]]
+
+    # Each unmatched row's gap is the base position of the nearest matched row above it
+    used = np.zeros(len(base), dtype=bool)
+    used[base_positions[matched]] = True
+    remote_gap = pd.Series(np.where(matched, base_positions, np.nan)).ffill().fillna(-1).to_numpy()
+    base_gap = pd.Series(np.where(used, np.arange(len(base)), np.nan)).ffill().fillna(-1).to_numpy()
+    unmatched = pd.DataFrame({"gap": remote_gap[~matched], "position": np.flatnonzero(~matched)})
+    free = pd.DataFrame({"gap": base_gap[~used], "label": base.index[~used]})
+    unmatched['rank'] = unmatched.groupby('gap').cumcount()
+    free['rank'] = free.groupby('gap').cumcount()
+    pairs = unmatched.merge(free, on=['gap', 'rank'])
+    labels[pairs['position'].to_numpy()] = pairs['label'].to_numpy()
+
+    added = np.setdiff1d(unmatched['position'].to_numpy(), pairs['position'].to_numpy())
+    labels[added] = np.arange(next_row, next_row + len(added))
+
+    counts = {"changed": len(pairs), "added": len(added), "removed": len(free) - len(pairs)}
+    return remote.set_axis(pd.Index(list(labels))), counts
+
+# Cells, rows and labels that differ between the base and a rebased remote frame
+# Returns a mask of changed cells (only rows and columns with a change), the labels removed
+# remotely and the labels added remotely, in the remote's order.
+def remote_changes(base, remote):
+    common = base.index.intersection(remote.index, sort=False)
+    old, new = base.loc[common], remote.loc[common]
+    changed = ~((old == new) | (old.isna() & new.isna()))
+    cells = changed.loc[changed.any(axis=1), changed.any(axis=0)]
+    return cells, base.index.difference(remote.index, sort=False), remote.index.difference(base.index, sort=False)
+
+# The remote changes as one journal step against a frame (the base, or the working data):
+# a patch of the changed cells, a delete of the removed rows and an add of the new ones.
+# Rows the frame no longer has are left out; its other cells keep their values.
+def remote_step(df, remote, cells, removed, added):
+    step = []
+    rows = cells.index.intersection(df.index, sort=False)
+    if len(rows):
+        old = df.loc[rows, cells.columns]
+        step.append({"op": "patch", "rows": list(rows), "old": old,
+                     "new": old.mask(cells.loc[rows], remote.loc[rows, cells.columns])})
+    positions = np.sort(df.index.get_indexer(removed.intersection(df.index)))
+    if len(positions):
+        gone = df.index[positions]
+        step.append({"op": "delete_rows", "rows": list(gone), "pos": positions, "values": df.loc[gone]})
+    if len(added):
+        step.append({"op": "add_rows", "rows": list(added), "values": remote.loc[added]})
+    return step
+
+# Replay the journal onto the patched base: the working data in the remote's order, the local
+# edits the remote changes override, and the steps as they now apply, so undo restores the new base
+def rebase_journal(base, steps, order):
+    from github_csv.journal import replay_journal
+    working, conflicts, replayed = replay_journal(base, steps)
+    return follow_order(working, order), conflicts, replayed
+
+# Put rows in the remote's order; rows only the frame has (added locally) stay after the row
+# they followed. Frames already in order are returned as they are.
+def follow_order(df, order):
+    key = pd.Series(np.arange(len(order)), index=order).reindex(df.index).ffill().fillna(-1)
+    if key.is_monotonic_increasing:
+        return df
+    return df.iloc[np.argsort(key.to_numpy(), kind='stable')]
+
+# Check the open file once; on a remote change, patch the base with the rows that changed,
+# leaving every other row as it is, and rebase the edit journal onto it
+# Returns a message for the user, or None when nothing changed. force rebases even when the
+# sha is unchanged, for a base that is known to lag the commit it names.
+def check_remote(repo_owner, repo_name, file_path, force=False):
+    from github_csv.journal import apply_step
+    from github_csv.offline import persist_journal
+    from github_csv.summary import rebuild_session_summary
+
+    response = fetch_file(repo_owner, repo_name, file_path, get_headers(),
+                          etag=None if force else st.session_state.get('file_etag'))
+    if response.status_code == 304:
+        return None
+    if response.status_code != 200:
+        return f"Remote check failed: {response.status_code}"
+
+    file_data = response.json()
+    st.session_state.file_etag = response.headers.get('ETag')
+    if file_data['sha'] == st.session_state.file_sha and not force:
+        return None
+
+    if st.session_state.csv_projection:
+        # Projected edits are merged into the latest full file on save anyway
+        st.session_state.file_sha = file_data['sha']
+        return "The file changed remotely; your edits will be merged into the new version on save."
+
+    raw = file_bytes(repo_owner, repo_name, file_path, file_data, get_headers())
+    remote, dialect = decode_csv(file_data, raw=raw, header=st.session_state.csv_dialect['header'])
+    base = st.session_state.csv_data
+    if list(remote.columns) != list(base.columns):
+        return "The file's columns changed remotely. Start over to load the new version."
+
+    journal = st.session_state.edit_journal
+    rebased, counts = rebase_remote(base, remote, journal['next_row'])
+    cells, removed, added = remote_changes(base, rebased)
+
+    # Only the base is patched from the remote's changes; the journal is replayed on top of it
+    base = follow_order(apply_step(base, remote_step(base, rebased, cells, removed, added)), rebased.index)
+    working, conflicts, journal['done'] = rebase_journal(base, journal['done'], rebased.index)
+    journal['undone'] = []
+    st.session_state.csv_data = base
+    st.session_state.working_data = working
+    st.session_state.file_data = file_data
+    st.session_state.file_sha = file_data['sha']
+    st.session_state.csv_dialect = dialect
+    journal['next_row'] = max(journal['next_row'], int(working.index.max()) + 1 if len(working) else 0)
+    st.session_state.editor_version += 1
+    rebuild_session_summary()
+    persist_journal(rewrite=True)
+
+    message = (f"The file changed remotely: {counts['changed']} row(s) changed, {counts['added']} added, "
+               f"{counts['removed']} removed. Your edits were kept on top.")
+    if conflicts:
+        message += " Conflicts: " + "; ".join(conflicts)
+    return message
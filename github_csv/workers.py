@@ -0,0 +1,262 @@
+# Worker processes for CPU-heavy steps: parsing a download, serialising a commit payload or an
+# export, and row fingerprints. While a worker runs, the calling thread only waits, so the GIL stays
+# free for every other session in the process. Frames travel as Arrow IPC files in shared memory.
+import os
+import time
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+import streamlit as st
+from github_csv.core import get_env_variable
+
+# Worker processes shared by all sessions; 0 runs everything on the calling thread
+WORKER_PROCESSES = int(get_env_variable('WORKER_PROCESSES', str(min(4, os.cpu_count() or 1))))
+
+# Downloads smaller than this, and frames with fewer rows, are not worth the transfer
+WORKER_MIN_BYTES = int(get_env_variable('WORKER_MIN_BYTES', str(8 * 1024 * 1024)))
+WORKER_MIN_ROWS = int(get_env_variable('WORKER_MIN_ROWS', '100000'))
+
+# Where job files go: shared memory when the host has it
+WORKER_DIR = get_env_variable(
+    'WORKER_DIR', os.path.join('/dev/shm' if os.access('/dev/shm', os.W_OK) else tempfile.gettempdir(), 'st_change_csv_jobs')
+)
+
+# Seconds between progress updates while waiting for a job
+WORKER_POLL_SECONDS = 0.25
+
+# Set in worker processes, so the steps they run do not hand work off again
+IN_WORKER = False
+
+# Progress reporters for the threads that have one (the script thread inside worker_progress)
+LOCAL = threading.local()
+
+# A job was cancelled before it finished
+class JobCancelled(Exception):
+    pass
+
+# Pool initializer: marks the process as a worker
+def init_worker():
+    global IN_WORKER
+    IN_WORKER = True
+
+# The process-wide pool; spawned, not forked, because the server process runs many threads
+@st.cache_resource
+def get_worker_pool():
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(max_workers=WORKER_PROCESSES, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=init_worker)
+
+# Whether a step of this size should run in a worker process
+def offload(size=None, rows=None):
+    if IN_WORKER or WORKER_PROCESSES <= 0:
+        return False
+    return (size is not None and size >= WORKER_MIN_BYTES) or (rows is not None and rows >= WORKER_MIN_ROWS)
+
+# Write a frame for the other side of a job, as Arrow IPC
+# Columns mixing types (57 and "n/a" after an edit) cannot become Arrow columns; with text=True
+# they are sent as text, which is what CSV output and fingerprints make of them anyway.
+# Frames Arrow still rejects are pickled. Returns the path written.
+def write_frame(df, path, text=False):
+    import pickle
+    import pyarrow as pa
+
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        table = None
+        if text:
+            try:
+                table = pa.Table.from_pandas(
+                    df.astype({col: 'string' for col in df.columns if df[col].dtype == object}), preserve_index=True
+                )
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                pass
+    if table is None:
+        with open(path + ".pickle", 'wb') as f:
+            pickle.dump(df, f, protocol=5)
+        return path + ".pickle"
+    with pa.OSFile(path + ".arrow", 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return path + ".arrow"
+
+# Read a frame written by write_frame; missing text comes back as NaN, as a parse leaves it
+def read_frame(path):
+    import pickle
+    import numpy as np
+    import pyarrow as pa
+
+    if path.endswith(".pickle"):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    with pa.memory_map(path) as source:
+        df = pa.ipc.open_file(source).read_all().to_pandas()
+    for col in df.columns:
+        if df[col].dtype == object:
+            missing = df[col].isna()
+            if missing.any():
+                df[col] = df[col].where(~missing, np.nan)
+    return df
+
+# Report a job's progress, done out of total, and stop it if the caller cancelled
+# Runs in the worker, between the blocks of a step.
+def report_progress(job_dir, done, total):
+    if os.path.exists(os.path.join(job_dir, "cancel")):
+        raise JobCancelled()
+    with open(os.path.join(job_dir, "progress.tmp"), 'w') as f:
+        f.write(f"{done} {total}")
+    os.replace(os.path.join(job_dir, "progress.tmp"), os.path.join(job_dir, "progress"))
+
+def read_progress(job_dir):
+    try:
+        with open(os.path.join(job_dir, "progress")) as f:
+            done, total = f.read().split()
+        return int(done), int(total)
+    except (OSError, ValueError):
+        return 0, 0
+
+# Blocks of a frame, reporting progress and checking for cancellation before each one
+def tracked_chunks(df, job_dir, chunk_rows=None):
+    from github_csv.csv_io import frame_chunks
+
+    done = 0
+    for chunk in frame_chunks(df, chunk_rows):
+        report_progress(job_dir, done, len(df))
+        yield chunk
+        done += len(chunk)
+    report_progress(job_dir, len(df), len(df))
+
+# Worker side of a parse: raw bytes in, frame out
+# read_csv cannot be interrupted, so a cancel takes effect once the parse returns.
+def parse_task(job_dir, dialect, projection):
+    from github_csv.csv_io import parse_csv
+
+    report_progress(job_dir, 0, 2)
+    with open(os.path.join(job_dir, "input.csv"), 'rb') as f:
+        df = parse_csv(f.read(), dialect, projection=projection)
+    report_progress(job_dir, 1, 2)
+    return write_frame(df, os.path.join(job_dir, "output"))
+
+# Worker side of a commit payload: frame in, PUT body out
+def payload_task(job_dir, input_path, dialect, fields):
+    import json
+    from github_csv.csv_io import iter_csv_chunks, iter_base64_chunks
+
+    df = read_frame(input_path)
+    with open(os.path.join(job_dir, "output.json"), 'wb') as body:
+        body.write(json.dumps(fields)[:-1].encode() + b', "content": "')
+        for chunk in iter_base64_chunks(iter_csv_chunks(tracked_chunks(df, job_dir), dialect)):
+            body.write(chunk)
+        body.write(b'"}')
+    return body.name
+
+# Worker side of an export: frame in, export file out (in the temporary directory, for the caller)
+def export_task(job_dir, input_path, export_format, dialect):
+    from github_csv.csv_io import export_frame
+
+    return export_frame(tracked_chunks(read_frame(input_path), job_dir), export_format, dialect)
+
+# Worker side of row fingerprints: frame in, one uint64 per row out
+def fingerprint_task(job_dir, input_path):
+    import numpy as np
+    from github_csv.csv_io import row_fingerprints
+
+    df = read_frame(input_path)
+    path = os.path.join(job_dir, "output.npy")
+    np.save(path, np.concatenate(
+        [row_fingerprints(chunk).to_numpy() for chunk in tracked_chunks(df, job_dir)] or [np.empty(0, 'uint64')]
+    ))
+    return path
+
+# A directory for one job's files, removed once the caller has read the result
+@contextmanager
+def job():
+    os.makedirs(WORKER_DIR, exist_ok=True)
+    job_dir = tempfile.mkdtemp(prefix="job-", dir=WORKER_DIR)
+    try:
+        yield job_dir
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+# Run a task in the pool and wait for it, reporting progress to the thread's reporter
+# Anything that interrupts the wait (a Streamlit rerun, a Cancel click) cancels the job.
+def run_job(job_dir, task, *args):
+    from concurrent.futures import TimeoutError
+    from concurrent.futures.process import BrokenProcessPool
+
+    try:
+        future = get_worker_pool().submit(task, job_dir, *args)
+    except BrokenProcessPool:
+        # A worker died (out of memory, killed); start a fresh pool for the next job
+        get_worker_pool.clear()
+        future = get_worker_pool().submit(task, job_dir, *args)
+    reporter = getattr(LOCAL, 'reporter', None)
+    try:
+        while True:
+            try:
+                return future.result(timeout=WORKER_POLL_SECONDS)
+            except TimeoutError:
+                if reporter:
+                    reporter(*read_progress(job_dir))
+    except BaseException:
+        future.cancel()
+        open(os.path.join(job_dir, "cancel"), 'w').close()
+        raise
+
+# Parse raw CSV bytes in a worker; same result as parse_csv
+def run_parse(raw, dialect, projection=None):
+    with job() as job_dir:
+        with open(os.path.join(job_dir, "input.csv"), 'wb') as f:
+            f.write(raw)
+        return read_frame(run_job(job_dir, parse_task, dialect, projection))
+
+# Build a commit payload in a worker; same body as commit_payload, as an open file
+# The file is unlinked once open, so it goes away when the caller closes it.
+def run_payload(df, dialect, fields):
+    with job() as job_dir:
+        input_path = write_frame(df, os.path.join(job_dir, "input"), text=True)
+        body = open(run_job(job_dir, payload_task, input_path, dialect, fields), 'rb')
+        try:
+            os.remove(body.name)
+        except OSError:
+            pass
+        return body
+
+# Export a frame in a worker; same file as export_frame
+def run_export(df, export_format, dialect=None):
+    with job() as job_dir:
+        input_path = write_frame(df, os.path.join(job_dir, "input"), text=True)
+        return run_job(job_dir, export_task, input_path, export_format, dialect)
+
+# Row fingerprints from a worker; same values as row_fingerprints
+def run_fingerprints(df):
+    import numpy as np
+    import pandas as pd
+
+    with job() as job_dir:
+        input_path = write_frame(df, os.path.join(job_dir, "input"), text=True)
+        return pd.Series(np.load(run_job(job_dir, fingerprint_task, input_path)), index=df.index)
+
+# Show a progress bar and a Cancel button for worker jobs started inside the block
+# Both appear only once a job has run for a moment, so quick steps do not flash them.
+# Clicking Cancel reruns the script, which interrupts the wait and cancels the job.
+@contextmanager
+def worker_progress(label):
+    placeholder = st.empty()
+    shown = {}
+
+    def reporter(done, total):
+        if not shown:
+            with placeholder.container():
+                shown['bar'] = st.progress(0.0, text=label)
+                st.button("Cancel", key=f"cancel_{label}")
+        shown['bar'].progress(min(done / total, 1.0) if total else 0.0, text=label)
+
+    LOCAL.reporter = reporter
+    try:
+        yield
+    finally:
+        LOCAL.reporter = None
+        placeholder.empty()
@@ -0,0 +1,4 @@
+# GitHub token, repository and file access checker - run with: streamlit run github_token_checker.py
+from github_csv.app import main
+
+main("token_checker")
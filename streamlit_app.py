@@ -0,0 +1,4 @@
+# All modes behind one app (pick with APP_MODE or the sidebar) - run with: streamlit run streamlit_app.py
+from github_csv.app import main
+
+main()
@@ -0,0 +1,5 @@
+# Tests import the package from the repository root, like the entry scripts do
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
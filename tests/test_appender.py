@@ -0,0 +1,11 @@
+# Appended lines are written the way the file already is
+from github_csv.appender import encode_new_lines
+
+def test_new_lines_keep_encoding_and_line_terminator():
+    raw = "名前,点数\r\n太郎,80\r\n".encode('cp932')
+    added = encode_new_lines(raw, 'cp932', ["花子,95", "次郎,70"])
+    assert raw + added == "名前,点数\r\n太郎,80\r\n花子,95\r\n次郎,70\r\n".encode('cp932')
+
+def test_new_lines_start_on_a_new_line_without_a_second_bom():
+    raw = "﻿a,b\n1,2".encode('utf-8')
+    assert encode_new_lines(raw, 'utf-8-sig', ["3,é"]) == "\n3,é".encode('utf-8')
@@ -0,0 +1,26 @@
+# Formula evaluation in bulk edits
+import numpy as np
+import pandas as pd
+import pytest
+from github_csv.bulk import evaluate_formula, plan_bulk
+
+FRAME = pd.DataFrame({"A": ["a", "b"], "B": [1, 2]})
+
+# Inputs that would hang the server or allocate gigabytes are refused quickly
+@pytest.mark.parametrize("formula", ["9 ** 9 ** 9", "'x' * 10 ** 9", "10 ** 9 * 'x'", "'x' * B", "1 / 0"])
+def test_formula_refuses_runaway_inputs(formula):
+    with pytest.raises(ValueError):
+        evaluate_formula(FRAME, formula)
+
+def test_formula_arithmetic_and_text():
+    assert evaluate_formula(FRAME, "B * 1.5").tolist() == [1.5, 3.0]
+    assert evaluate_formula(FRAME, "A + 1").tolist() == ["a1", "b1"]
+    assert evaluate_formula(FRAME, "round(B / 3, 2)").tolist() == [0.33, 0.67]
+    # A large exponent on a column overflows to inf instead of running on
+    assert np.isinf(evaluate_formula(FRAME, "B ** 9 ** 9").iloc[1])
+
+# Whole results of a formula keep an integer column's type
+def test_formula_keeps_integer_column():
+    plan = plan_bulk(FRAME, "formula", ["B"], np.ones(2, dtype=bool), {"formula": "B * 2"})
+    assert plan['step'][0]['new']['B'].dtype == FRAME['B'].dtype
+    assert plan['step'][0]['new']['B'].tolist() == [2, 4]
@@ -0,0 +1,24 @@
+# Dialect sniffing and parse/serialise round trips
+import pytest
+from github_csv.csv_io import available_engines, sniff_csv, parse_csv, iter_csv_chunks
+
+# Files the Sniffer would call header-less still keep their first row as column names
+@pytest.mark.parametrize("raw", [b"name,city\nalice,paris\nbob,rome\n",
+                                 "名前,点数\n太郎,80\n花子,95\n".encode('cp932')])
+def test_first_row_is_header_by_default(raw):
+    dialect = sniff_csv(raw)
+    assert dialect['header'] is True
+    assert parse_csv(raw, dialect, engine='c').shape == (2, 2)
+    assert sniff_csv(raw, header=False)['header'] is False
+
+# Unedited cells are written back exactly as every engine read them
+@pytest.mark.parametrize("engine", available_engines())
+def test_round_trip_keeps_dates_as_written(engine):
+    raw = (b"id,stamp,day,clock,note\n"
+           b"1,2024-01-02T10:00:00,2024-01-02,10:00:00,a\n"
+           b"2,,2024-01-03,11:30:00,\n"
+           b"3,2024-02-29T23:59:59,,,c\n")
+    dialect = sniff_csv(raw)
+    df = parse_csv(raw, dialect, engine=engine)
+    assert b"".join(iter_csv_chunks(df, dialect)) == raw
+    assert df.equals(parse_csv(raw, dialect, engine='c'))
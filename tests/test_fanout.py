@@ -0,0 +1,62 @@
+# Fan-out over several repositories: one target's failure stays in its own row
+import json
+import base64
+import requests
+import pandas as pd
+import github_csv.fanout as fanout
+from github_csv.fanout import run_fanout, check_fanout_target, commit_fanout_target
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code, self.payload, self.headers, self.text = status_code, payload, {}, ""
+
+    def json(self):
+        return self.payload
+
+# A file per repository; "down/repo" cannot be reached and "bad/repo" rejects the commit body
+def fake_github(files, puts):
+    def request(method, url, headers, **kwargs):
+        repo = "/".join(url.split("/repos/")[1].split("/")[:2])
+        if repo == "down/repo":
+            raise requests.ConnectionError("connection refused")
+        if method == "PUT":
+            if repo == "bad/repo":
+                raise ValueError("body could not be written")
+            puts[repo] = base64.b64decode(json.loads(kwargs['data'].read())['content'])
+            return FakeResponse(200, {"content": {"sha": "new"}})
+        if "/contents/" not in url:
+            return FakeResponse(200, {})
+        return FakeResponse(200, {"sha": "sha", "content": base64.b64encode(files[repo]).decode(), "size": 1})
+    return request
+
+def budget():
+    return fanout.new_rate_budget(0)
+
+def test_failing_targets_do_not_stop_the_fanout(monkeypatch):
+    files = {repo: b"A,B\na,1\nb,2\n" for repo in ("ok/repo", "bad/repo")}
+    puts = {}
+    monkeypatch.setattr(fanout.requests, "request", fake_github(files, puts))
+    targets = [("down", "repo", None), ("ok", "repo", None), ("bad", "repo", None)]
+
+    checks = run_fanout(check_fanout_target, targets, "t.csv", {}, budget())
+    assert [row['repository'] for row in checks] == ["error: connection refused", "ok", "ok"]
+
+    step = [{"op": "edit", "row": 0, "col": "B", "old": 1, "new": 10}]
+    rows = run_fanout(commit_fanout_target, targets, "t.csv", [step], None, {}, budget(), "msg")
+    assert [row['status'] for row in rows] == ["failed", "committed", "failed"]
+    assert rows[0]['detail'] == "Request failed: connection refused"
+    assert rows[2]['detail'] == "Commit failed: body could not be written"
+    assert puts == {"ok/repo": b"A,B\na,10\nb,2\n"}
+
+# A delete only removes the row in another file when that row holds the deleted values
+def test_fanout_delete_keeps_other_records(monkeypatch):
+    files = {"same/repo": b"A,B\na,1\nb,2\n", "other/repo": b"A,B\nz,9\na,1\n"}
+    puts = {}
+    monkeypatch.setattr(fanout.requests, "request", fake_github(files, puts))
+    step = [{"op": "delete", "row": 0, "pos": 0, "values": {"A": "a", "B": 1}}]
+    bulk = [{"op": "delete_rows", "rows": [1], "pos": [1],
+             "values": pd.DataFrame({"A": ["b"], "B": [2]}, index=[1])}]
+    rows = run_fanout(commit_fanout_target, [("same", "repo", None), ("other", "repo", None)],
+                      "t.csv", [step, bulk], None, {}, budget(), "msg")
+    assert [row['conflicts'] for row in rows] == [0, 2]
+    assert puts == {"same/repo": b"A,B\n", "other/repo": b"A,B\nz,9\na,1\n"}
@@ -0,0 +1,119 @@
+# Replaying an edit journal onto a base that changed remotely
+import pandas as pd
+from github_csv.journal import apply_step, revert_step, replay_journal
+
+def base():
+    return pd.DataFrame({"A": ["a", "b", "c"], "B": [1.0, 2.0, 3.0]})
+
+# An added row whose label the remote side took moves to a new label, and later edits follow it
+def test_added_row_keeps_its_edits_when_relabelled():
+    steps = [
+        [{"op": "add", "row": 3, "values": {"A": "new", "B": 9.0}}],
+        [{"op": "edit", "row": 3, "col": "B", "old": 9.0, "new": 10.0}],
+    ]
+    remote = pd.concat([base(), pd.DataFrame({"A": ["remote"], "B": [4.0]}, index=[3])])
+    df, conflicts, _ = replay_journal(remote, steps)
+    assert conflicts == []
+    assert df.loc[3].tolist() == ["remote", 4.0]
+    assert df.loc[4].tolist() == ["new", 10.0]
+
+# Bulk ops on added rows follow them too
+def test_added_rows_keep_their_patch_and_delete_when_relabelled():
+    added = pd.DataFrame({"A": ["x", "y"], "B": [5.0, 6.0]}, index=[3, 4])
+    steps = [
+        [{"op": "add_rows", "rows": [3, 4], "values": added}],
+        [{"op": "patch", "rows": [3], "old": added.loc[[3], ["B"]],
+          "new": pd.DataFrame({"B": [50.0]}, index=[3])}],
+        [{"op": "delete_rows", "rows": [4], "pos": [4], "values": added.loc[[4]]}],
+    ]
+    remote = pd.concat([base(), pd.DataFrame({"A": ["remote"], "B": [4.0]}, index=[3])])
+    df, conflicts, _ = replay_journal(remote, steps)
+    assert conflicts == []
+    assert df["A"].tolist() == ["a", "b", "c", "remote", "x"]
+    assert df["B"].tolist() == [1.0, 2.0, 3.0, 4.0, 50.0]
+
+# Adds, edits and deletes replay onto a base with remote edits elsewhere; a cell changed on both
+# sides is a conflict and keeps the remote value
+def test_replay_adds_edits_and_deletes():
+    steps = [
+        [{"op": "edit", "row": 0, "col": "B", "old": 1.0, "new": 11.0},
+         {"op": "edit", "row": 1, "col": "A", "old": "b", "new": "bee"}],
+        [{"op": "delete", "row": 2, "pos": 2, "values": {"A": "c", "B": 3.0}}],
+        [{"op": "add", "row": 3, "values": {"A": "d", "B": 4.0}}],
+    ]
+    remote = base()
+    remote.loc[1, "A"] = "remote"
+    remote.loc[0, "A"] = "alpha"
+    df, conflicts, _ = replay_journal(remote, steps)
+    assert len(conflicts) == 1 and "Row 1, column A" in conflicts[0]
+    assert df["A"].tolist() == ["alpha", "remote", "d"]
+    assert df["B"].tolist() == [11.0, 2.0, 4.0]
+    assert list(df.index) == [0, 1, 3]
+
+# A step that edits, deletes and adds rows applies and reverts back to the same frame
+def test_apply_and_revert_step_with_adds_edits_and_deletes():
+    step = [
+        {"op": "edit", "row": 0, "col": "B", "old": 1.0, "new": 10.0},
+        {"op": "delete", "row": 1, "pos": 1, "values": {"A": "b", "B": 2.0}},
+        {"op": "add", "row": 3, "values": {"A": "d", "B": 4.0}},
+    ]
+    applied = apply_step(base(), step)
+    assert applied["A"].tolist() == ["a", "c", "d"]
+    assert applied["B"].tolist() == [10.0, 3.0, 4.0]
+
+    reverted = revert_step(applied, step)
+    assert reverted.index.tolist() == [0, 1, 2]
+    assert reverted["A"].tolist() == ["a", "b", "c"]
+    assert reverted["B"].astype(float).tolist() == [1.0, 2.0, 3.0]
+
+# Bulk ops undo to the rows and positions they started from
+def test_apply_and_revert_bulk_step():
+    added = pd.DataFrame({"A": ["x"], "B": [9.0]}, index=[3])
+    step = [
+        {"op": "patch", "rows": [2], "old": base().loc[[2], ["B"]], "new": pd.DataFrame({"B": [30.0]}, index=[2])},
+        {"op": "delete_rows", "rows": [0], "pos": [0], "values": base().loc[[0]]},
+        {"op": "add_rows", "rows": [3], "values": added},
+    ]
+    applied = apply_step(base(), step)
+    assert applied.index.tolist() == [1, 2, 3]
+    assert applied["B"].tolist() == [2.0, 30.0, 9.0]
+    assert revert_step(applied, step).equals(base())
+
+# A delete only removes the record it was made on, not whatever row took its label remotely
+def test_replayed_deletes_skip_rows_that_hold_another_record():
+    steps = [
+        [{"op": "delete", "row": 1, "pos": 1, "values": {"A": "b", "B": 2.0}}],
+        [{"op": "delete_rows", "rows": [2, 0], "pos": [0, 2], "values": base().loc[[2, 0]]}],
+    ]
+    # Remote inserted a row at the top, so every label now holds the row above it
+    remote = pd.DataFrame({"A": ["top", "a", "b", "c"], "B": [0.0, 1.0, 2.0, 3.0]})
+    df, conflicts, _ = replay_journal(remote, steps)
+    assert df["A"].tolist() == ["top", "a", "b", "c"]
+    assert len(conflicts) == 2
+
+    # Unchanged rows are still deleted
+    df, conflicts, _ = replay_journal(base(), steps)
+    assert df.empty and conflicts == []
+
+# Undoing replayed steps restores the new base: relabelled adds and remotely changed old values
+def test_replayed_steps_undo_onto_the_new_base():
+    steps = [
+        [{"op": "add", "row": 3, "values": {"A": "new", "B": 9.0}}],
+        [{"op": "edit", "row": 0, "col": "B", "old": 1.0, "new": 10.0},
+         {"op": "edit", "row": 1, "col": "B", "old": 2.0, "new": 20.0}],
+        [{"op": "delete", "row": 2, "pos": 2, "values": {"A": "c", "B": 3.0}}],
+    ]
+    remote = pd.DataFrame({"A": ["top", "a", "b", "c"], "B": [0.0, 1.0, 2.0, 3.0]}, index=[10, 0, 1, 2])
+    remote.loc[1, "B"] = 25.0
+    remote = pd.concat([remote, pd.DataFrame({"A": ["remote"], "B": [4.0]}, index=[3])])
+    df, conflicts, replayed = replay_journal(remote, steps)
+    assert len(conflicts) == 1
+    assert replayed[0][0]['row'] == 11
+    assert [op['row'] for op in replayed[1]] == [0]
+    assert replayed[2][0]['pos'] == 3
+
+    for step in reversed(replayed):
+        df = revert_step(df, step)
+    assert df.index.tolist() == remote.index.tolist()
+    assert df["A"].tolist() == remote["A"].tolist()
+    assert df["B"].astype(float).tolist() == remote["B"].tolist()
@@ -0,0 +1,29 @@
+# Building a SQLite mirror block by block
+import github_csv.mirror as mirror_module
+from github_csv.mirror import build_mirror, query_page, iter_mirror_frames
+
+class RawResponse:
+    def __init__(self, raw):
+        self.raw = raw
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield self.raw
+
+# Every block is stored with the types of the first, whatever a later block looks like on its own
+def test_mirror_types_follow_the_first_block(tmp_path, monkeypatch):
+    raw = b"code,n\nA1,1\nB2,2\n7,3\n8,\n"
+    monkeypatch.setattr(mirror_module, "MIRROR_DIR", str(tmp_path))
+    monkeypatch.setattr(mirror_module, "MIRROR_CHUNK_ROWS", 2)
+    monkeypatch.setattr(mirror_module, "fetch_file_raw", lambda *args, **kwargs: RawResponse(raw))
+
+    mirror = build_mirror(str(tmp_path / "m.sqlite3"), "o", "r", "t.csv", {}, "sha")
+    page, total = query_page(mirror)
+    assert total == 4
+    assert page['code'].tolist() == ["A1", "B2", "7", "8"]
+    assert page['n'].tolist()[:3] == [1, 2, 3]
+    with mirror_module.connect(mirror) as conn:
+        assert {row[0] for row in conn.execute('SELECT typeof("n") FROM data WHERE "n" IS NOT NULL')} == {"integer"}
+    assert sum(len(frame) for frame in iter_mirror_frames(mirror)) == 4
@@ -0,0 +1,53 @@
+# Durable journal: a queued save survives a reload of the file
+import pandas as pd
+import streamlit as st
+import github_csv.offline as offline
+from github_csv.offline import persist_journal, find_stored_journal, update_sync_state, journal_key
+
+def open_file(tmp_path, monkeypatch, steps):
+    monkeypatch.setattr(offline, "JOURNAL_DB_PATH", str(tmp_path / "journal.sqlite3"))
+    offline.init_journal_db.clear()
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    st.session_state.update(file_path="t.csv", repo_owner="o", repo_name="r", file_sha="sha",
+                            csv_data=pd.DataFrame({"A": [1]}), csv_projection=None,
+                            csv_dialect={"encoding": "utf-8", "sep": ",", "quotechar": '"', "header": True},
+                            edit_journal={"done": steps, "undone": [], "next_row": 1}, stored_journal=None)
+
+def test_reload_keeps_a_queued_journal(tmp_path, monkeypatch):
+    step = [{"op": "edit", "row": 0, "col": "A", "old": 1, "new": 2}]
+    open_file(tmp_path, monkeypatch, [step])
+    persist_journal()
+    update_sync_state(journal_key(), 'queued')
+
+    # A reload starts an empty journal; neither it nor later edits touch the queued steps
+    st.session_state.edit_journal = {"done": [], "undone": [], "next_row": 1}
+    persist_journal(rewrite=True)
+    st.session_state.edit_journal['done'].append([{"op": "edit", "row": 0, "col": "A", "old": 1, "new": 3}])
+    persist_journal()
+
+    stored = find_stored_journal()
+    assert stored['pending'] and stored['steps'] == [step]
+
+# Steps are stored as JSON and Arrow, never pickled, and read back with their frames and missing values
+def test_steps_round_trip_without_pickle(tmp_path, monkeypatch):
+    import numpy as np
+    rows = [np.int64(0), 5]
+    mixed = pd.DataFrame({"A": np.array([1, "x"], dtype=object), "B": [1.5, np.nan]}, index=rows)
+    steps = [[{"op": "edit", "row": np.int64(0), "col": "A", "old": np.int64(1), "new": np.nan}],
+             [{"op": "patch", "rows": rows, "old": mixed, "new": mixed.assign(B=[2.0, 3.0])},
+              {"op": "delete_rows", "rows": rows, "pos": np.array([0, 1]), "values": mixed},
+              {"op": "delete", "row": 7, "pos": 2, "values": {"A": None, "B": np.float64(2.5)}}]]
+    open_file(tmp_path, monkeypatch, steps)
+    persist_journal()
+
+    with offline.connect() as conn:
+        assert conn.execute("SELECT step FROM journal_steps ORDER BY seq").fetchone()[0].startswith('[')
+    stored = offline.read_stored_journal(journal_key())
+    edit, (patch, delete_rows, delete) = stored['steps']
+    assert edit[0]['row'] == 0 and edit[0]['old'] == 1 and np.isnan(edit[0]['new'])
+    pd.testing.assert_frame_equal(patch['old'], mixed)
+    assert patch['new']['B'].tolist() == [2.0, 3.0]
+    assert delete_rows['pos'] == [0, 1] and delete_rows['values']['A'].tolist() == [1, "x"]
+    assert delete['values'] == {"A": None, "B": 2.5}
+    assert stored['dialect']['header'] is True
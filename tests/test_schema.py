@@ -0,0 +1,15 @@
+# Schema validation
+import datetime
+import pandas as pd
+from github_csv.schema import validate_dataframe
+
+SCHEMA = {"columns": {"A": {"required": True}}}
+
+# Required object columns are checked whether or not they hold text
+def test_required_blank_cells_in_object_columns():
+    for values in (["x", "  ", None], [None, None, None], [1, datetime.date(2024, 1, 2), None]):
+        df = pd.DataFrame({"A": pd.Series(values, dtype=object)})
+        errors, messages = validate_dataframe(df, SCHEMA)
+        expected = [value is None or (isinstance(value, str) and not value.strip()) for value in values]
+        assert errors['A'].tolist() == expected
+        assert messages
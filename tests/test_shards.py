@@ -0,0 +1,76 @@
+# Planning saves of sharded tables
+import json
+import pandas as pd
+import github_csv.shards as shards_module
+from github_csv.csv_io import DEFAULT_DIALECT, parse_csv
+from github_csv.journal import apply_step
+from github_csv.shards import SHARD_LABEL_STRIDE, plan_new_table, plan_shard_save
+
+MANIFEST = "data/table.shards.json"
+TABLE = pd.DataFrame({"K": ["a", "a", "b", "b"], "V": [1, 2, 3, 4]})
+
+# A new table's files and the state a load of them gives: rows labelled by shard id and position
+def new_table(df, partition):
+    files, manifest = plan_new_table(df, DEFAULT_DIALECT, MANIFEST, partition)
+    frames = []
+    for shard in manifest['shards']:
+        part = parse_csv(files["data/" + shard['path']], DEFAULT_DIALECT)
+        frames.append(part.set_axis(pd.RangeIndex(shard['id'] * SHARD_LABEL_STRIDE,
+                                                  shard['id'] * SHARD_LABEL_STRIDE + len(part))))
+    state = {"manifest_path": MANIFEST, "manifest": manifest, "manifest_sha": "sha", "shas": {}}
+    return files, manifest, state, pd.concat(frames)
+
+def plan(state, base, steps):
+    working = base.copy()
+    for step in steps:
+        working = apply_step(working, step)
+    return plan_shard_save(state, base, working, steps)
+
+def rows_of(data):
+    return parse_csv(data, DEFAULT_DIALECT).values.tolist()
+
+def test_new_table_by_key_and_by_rows():
+    files, manifest, _, base = new_table(TABLE, {"by": "key", "column": "K"})
+    assert [shard['key'] for shard in manifest['shards']] == ["a", "b"]
+    assert json.loads(files[MANIFEST])['next_id'] == 2
+    assert base.reset_index(drop=True).equals(TABLE)
+
+    files, manifest, _, base = new_table(TABLE, {"by": "rows", "rows": 3})
+    assert [rows_of(files["data/" + shard['path']]) for shard in manifest['shards']] == [
+        [["a", 1], ["a", 2], ["b", 3]], [["b", 4]]]
+    assert manifest['partition'] == {"by": "rows"}
+
+# A row whose key changes moves to the other key's shard; only the two shards are written
+def test_key_change_moves_row_between_shards():
+    _, _, state, base = new_table(TABLE, {"by": "key", "column": "K"})
+    # Label 1 is the second row of shard 0
+    steps = [[{"op": "edit", "row": 1, "col": "K", "old": "a", "new": "b"}]]
+    files, deletions, new_manifest, ids, labels = plan(state, base, steps)
+    assert rows_of(files["data/table/part-00000.csv"]) == [["a", 1]]
+    assert rows_of(files["data/table/part-00001.csv"]) == [["b", 2], ["b", 3], ["b", 4]]
+    assert deletions == [] and new_manifest is None
+    assert list(labels // SHARD_LABEL_STRIDE) == [0, 1, 1, 1]
+
+# A new key gets a new shard and an emptied key's shard is deleted, both recorded in the manifest
+def test_new_key_adds_a_shard_and_an_empty_key_drops_one():
+    _, _, state, base = new_table(TABLE, {"by": "key", "column": "K"})
+    steps = [[{"op": "edit", "row": row, "col": "K", "old": "a", "new": "c"} for row in (0, 1)]]
+    files, deletions, new_manifest, ids, labels = plan(state, base, steps)
+    assert deletions == ["data/table/part-00000.csv"]
+    assert [(shard['id'], shard['key']) for shard in new_manifest['shards']] == [(1, "b"), (2, "c")]
+    assert new_manifest['next_id'] == 3
+    assert rows_of(files["data/table/part-00002.csv"]) == [["c", 1], ["c", 2]]
+    assert "data/table/part-00001.csv" not in files
+
+# Rows added past SHARD_MAX_BYTES split the last shard and keep the untouched one as it is
+def test_added_rows_split_the_last_shard(monkeypatch):
+    _, _, state, base = new_table(TABLE, {"by": "rows", "rows": 2})
+    monkeypatch.setattr(shards_module, "SHARD_MAX_BYTES", 16)
+    added = pd.DataFrame({"K": ["c", "d"], "V": [5, 6]}, index=[2 * SHARD_LABEL_STRIDE, 2 * SHARD_LABEL_STRIDE + 1])
+    steps = [[{"op": "add_rows", "rows": list(added.index), "values": added}]]
+    files, deletions, new_manifest, ids, labels = plan(state, base, steps)
+    assert "data/table/part-00000.csv" not in files and deletions == []
+    assert [shard['id'] for shard in new_manifest['shards']] == [0, 1, 2]
+    assert rows_of(files["data/table/part-00001.csv"]) == [["b", 3], ["b", 4]]
+    assert rows_of(files["data/table/part-00002.csv"]) == [["c", 5], ["d", 6]]
+    assert len(set(labels)) == len(labels)
@@ -0,0 +1,43 @@
+# Patching the base and working data with a remote version of the file
+import pandas as pd
+from github_csv.journal import apply_step, revert_step
+from github_csv.watch import rebase_remote, remote_changes, remote_step, rebase_journal, follow_order
+
+BASE = pd.DataFrame({"A": ["a", "b", "c", "d"], "B": [1, 2, 3, 4]})
+
+def patch_with_remote(df, base, remote):
+    cells, removed, added = remote_changes(base, remote)
+    return follow_order(apply_step(df, remote_step(df, remote, cells, removed, added)), remote.index)
+
+# Only changed rows are touched; inserted rows land where the remote has them
+def test_remote_changes_patch_base_and_working():
+    remote = pd.DataFrame({"A": ["new", "a", "b", "c"], "B": [0, 1, 20, 3]})
+    rebased, counts = rebase_remote(BASE, remote, next_row=5)
+    assert counts == {"changed": 1, "added": 1, "removed": 1}
+
+    base = patch_with_remote(BASE.copy(), BASE, rebased)
+    assert base.equals(rebased)
+
+    # Locally: c edited, d edited (removed remotely), a row added
+    steps = [[{"op": "edit", "row": 2, "col": "B", "old": 3, "new": 30}],
+             [{"op": "edit", "row": 3, "col": "B", "old": 4, "new": 40},
+              {"op": "add", "row": 4, "values": {"A": "local", "B": 9}}]]
+    working, conflicts, replayed = rebase_journal(base, steps, rebased.index)
+    assert conflicts == ["Row 3 was deleted remotely; edit of B skipped"]
+    assert working.index.tolist() == [5, 0, 1, 2, 4]
+    assert working["B"].tolist() == [0, 1, 20, 30, 9]
+
+    # The rebased steps undo back to the patched base
+    assert [len(step) for step in replayed] == [1, 1]
+    for step in reversed(replayed):
+        working = revert_step(working, step)
+    assert working.astype(object).equals(base.astype(object))
+
+# A remote edit of a cell edited locally keeps the remote value and is reported
+def test_remote_edit_of_locally_edited_cell():
+    remote = BASE.assign(B=[1, 22, 3, 4])
+    base = patch_with_remote(BASE.copy(), BASE, remote)
+    steps = [[{"op": "edit", "row": 1, "col": "B", "old": 2, "new": 99}]]
+    working, conflicts, replayed = rebase_journal(base, steps, remote.index)
+    assert len(conflicts) == 1 and conflicts[0].startswith("Row 1, column B changed remotely")
+    assert working["B"].tolist() == [1, 22, 3, 4] and replayed == []
@@ -0,0 +1,56 @@
+# Measure the cold-start import cost of each app mode and check it against a budget
+#
+# Usage: python tools/cold_start.py [budget_ms]
+# The budget defaults to IMPORT_BUDGET_MS or 500 ms. Each mode is imported in a fresh
+# interpreter with -X importtime; the run fails if a mode goes over budget or pulls in
+# pandas before any CSV is parsed.
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from github_csv import MODES  # noqa: E402
+
+# Modules that must stay out of a cold start
+LAZY_MODULES = ['pandas', 'requests']
+
+# Import one mode module in a fresh interpreter; returns (total ms, lazy modules that got loaded)
+def measure_mode(module):
+    code = (
+        "import importlib, sys\n"
+        f"importlib.import_module({module!r})\n"
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+    # Top-level imports are the lines whose module name is not indented
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):
+            total_us += int(cumulative)
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return total_us / 1000, loaded
+
+def main():
+    budget_ms = float(sys.argv[1] if len(sys.argv) > 1 else os.getenv('IMPORT_BUDGET_MS', '500'))
+    failed = False
+    for mode, (label, module) in MODES.items():
+        total_ms, loaded = measure_mode(module)
+        over = total_ms > budget_ms
+        failed = failed or over or bool(loaded)
+        status = "OVER BUDGET" if over else "ok"
+        if loaded:
+            status += f", eagerly imports {', '.join(loaded)}"
+        print(f"{mode:<15} {total_ms:8.1f} ms  (budget {budget_ms:.0f} ms)  {status}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+# Soak-test the editor: many concurrent sessions against a local GitHub stand-in
+#
+# Usage: python tools/soak_test.py [--sessions 20] [--workers N] [--rounds 5] [--rows 1000] [--grow 5000]
+# Each session runs Steps 1-4 of st_change_csv_02.py in AppTest: token check, repository
+# check, file load, one edit and a save. All sessions edit the same file, so saves race and
+# some of them hit a commit conflict. Sessions stay open between rounds, like browser tabs,
+# and the file grows by --grow rows before each round. Later rounds skip Steps 1-3: open
+# sessions edit their last saved copy, and the save reloads the grown file on a conflict.
+# Each round reports p50/p99 latency per step, the commit conflict rate and RSS growth per
+# session. AppTest runs one script at a time per process, so sessions are spread over
+# --workers processes (one per CPU by default).
+import os
+import sys
+import json
+import time
+import base64
+import random
+import hashlib
+import argparse
+import threading
+import statistics
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+OWNER, REPO, FILE_PATH = "soak", "csv", "soak.csv"
+STEPS = ["token", "repo", "load", "edit", "save"]
+
+# Script each session runs: the editor entry point, plus a hook that feeds it a data editor delta
+# AppTest cannot type into st.data_editor, so the delta goes through the same capture callback
+DRIVER = f"""
+import runpy
+import streamlit as st
+if st.session_state.get('soak_edit'):
+    from github_csv.journal import capture_editor_changes
+    st.session_state['soak_delta'] = st.session_state.pop('soak_edit')
+    capture_editor_changes('soak_delta')
+runpy.run_path({os.path.join(ROOT, 'st_change_csv_02.py')!r})
+"""
+
+# Minimal GitHub REST API: token and repository checks, and file contents with SHA checks on PUT
+class GitHubStandIn(BaseHTTPRequestHandler):
+    files = {}
+    lock = threading.Lock()
+    puts = 0
+    conflicts = 0
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status, body, headers=None):
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/user":
+            return self.send(200, {"login": "soak"}, {"X-OAuth-Scopes": "repo"})
+        if path == "/rate_limit":
+            return self.send(200, {"resources": {"core": {"limit": 5000, "remaining": 5000}}})
+        if path == f"/repos/{OWNER}/{REPO}":
+            return self.send(200, {"full_name": f"{OWNER}/{REPO}", "default_branch": "main"})
+        prefix = f"/repos/{OWNER}/{REPO}/contents/"
+        if not path.startswith(prefix) or path[len(prefix):] not in self.files:
+            return self.send(404, {"message": "Not Found"})
+
+        with self.lock:
+            content = self.files[path[len(prefix):]]
+        if "raw" in self.headers.get("Accept", ""):
+            return self.send(200, content)
+        return self.send(200, {"sha": blob_sha(content), "size": len(content), "encoding": "base64",
+                               "content": base64.b64encode(content).decode()})
+
+    def do_PUT(self):
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        name = self.path.split("?")[0][len(f"/repos/{OWNER}/{REPO}/contents/"):]
+        with self.lock:
+            GitHubStandIn.puts += 1
+            if name in self.files and blob_sha(self.files[name]) != data.get("sha"):
+                GitHubStandIn.conflicts += 1
+                return self.send(409, {"message": "sha does not match"})
+            self.files[name] = base64.b64decode(data["content"])
+            sha = blob_sha(self.files[name])
+        self.send(200, {"content": {"sha": sha}})
+
+# Git blob sha of some content, as the Contents API reports it
+def blob_sha(content):
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+# Append generated rows to the file under test
+def grow_file(rows):
+    with GitHubStandIn.lock:
+        content = GitHubStandIn.files.get(FILE_PATH, b"A,B,C\n")
+        start = content.count(b"\n") - 1
+        content += b"".join(b"name%d,%d.0,Japanese\n" % (i, i % 100) for i in range(start, start + rows))
+        GitHubStandIn.files[FILE_PATH] = content
+        return content.count(b"\n") - 1
+
+# Resident set size of this process in MB
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# Click a button by label and rerun; returns the rerun time in seconds
+def click(at, label):
+    button = next(b for b in at.button if b.label.startswith(label))
+    button.click()
+    start = time.perf_counter()
+    at.run()
+    return time.perf_counter() - start
+
+# One session's pass through Steps 1-4; returns per-step timings and whether the save succeeded
+def run_session(at, index, rows):
+    from streamlit.testing.v1 import AppTest
+
+    timings = {}
+    if at is None:
+        at = AppTest.from_string(DRIVER, default_timeout=120)
+        at.session_state["github_token"] = f"soak-token-{index}"
+        at.run()
+        timings["token"] = click(at, "Test Token Authorization")
+        timings["repo"] = click(at, "Test Repository Access")
+        timings["load"] = click(at, "Load CSV File")
+    # An open session keeps editing its last saved copy; the save reloads the grown file on conflict
+
+    row = random.randrange(min(rows, len(at.session_state["working_data"])))
+    at.session_state["soak_edit"] = {
+        "edited_rows": {row: {"B": float(index)}},
+        "added_rows": [{"A": f"soak{index}", "B": 0.0, "C": "USA"}],
+        "deleted_rows": []
+    }
+    start = time.perf_counter()
+    at.run()
+    timings["edit"] = time.perf_counter() - start
+    timings["save"] = click(at, "Save Changes to GitHub")
+
+    errors = [e.value for e in at.error] + [str(e.value) for e in at.exception]
+    return at, timings, not errors
+
+# p50 and p99 of a list of seconds, in milliseconds
+def percentiles(values):
+    if not values:
+        return "-", "-"
+    if len(values) == 1:
+        return f"{values[0] * 1000:.0f}", f"{values[0] * 1000:.0f}"
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return f"{cuts[49] * 1000:.0f}", f"{cuts[98] * 1000:.0f}"
+
+# Worker process: AppTest allows one script run per process at a time, so each worker holds
+# its share of the sessions and runs them one after another on every round
+def session_worker(conn, indices, env):
+    os.environ.update(env)
+    random.seed(indices[0] if indices else 0)
+    import streamlit.testing.v1  # noqa: F401  (keep import cost out of the per-session RSS)
+
+    sessions = {index: None for index in indices}
+    conn.send(rss_mb())
+    while True:
+        rows = conn.recv()
+        if rows is None:
+            break
+        results = []
+        for index in indices:
+            sessions[index], timings, ok = run_session(sessions[index], index, rows)
+            results.append((timings, ok))
+        conn.send((results, rss_mb()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak-test the editor with concurrent sessions")
+    parser.add_argument("--sessions", type=int, default=20, help="sessions kept open")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="worker processes; sessions in one worker take turns")
+    parser.add_argument("--rounds", type=int, default=5, help="edit/save rounds per session")
+    parser.add_argument("--rows", type=int, default=1000, help="rows in the file at the start")
+    parser.add_argument("--grow", type=int, default=5000, help="rows appended before each later round")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GitHubStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    grow_file(args.rows)
+
+    # The app reads these at import time, so workers set them before anything imports github_csv
+    env = {
+        "GITHUB_API_URL": f"http://127.0.0.1:{server.server_port}",
+        "GITHUB_TOKEN": "",
+        "REPO_OWNER": OWNER,
+        "REPO_NAME": REPO,
+        "FILE_PATH": FILE_PATH,
+        "CSV_SCHEMA": "",
+        "APP_MODE": "editor"
+    }
+    workers = max(1, min(args.workers, args.sessions))
+    context = multiprocessing.get_context("spawn")
+    pipes = []
+    for worker in range(workers):
+        parent_conn, child_conn = context.Pipe()
+        context.Process(target=session_worker, daemon=True,
+                        args=(child_conn, list(range(worker, args.sessions, workers)), env)).start()
+        pipes.append(parent_conn)
+    baseline = sum(conn.recv() for conn in pipes)
+
+    print(f"{args.sessions} sessions in {workers} worker(s) x {args.rounds} rounds against {env['GITHUB_API_URL']}")
+    header = f"{'round':>5} {'rows':>8} " + " ".join(f"{step + ' p50/p99':>17}" for step in STEPS)
+    print(header + f" {'saved':>7} {'conflicts':>10} {'RSS MB':>8} {'MB/session':>11}")
+
+    for round_number in range(args.rounds):
+        rows = grow_file(args.grow) if round_number else args.rows
+        puts, conflicts = GitHubStandIn.puts, GitHubStandIn.conflicts
+        for conn in pipes:
+            conn.send(rows)
+        replies = [conn.recv() for conn in pipes]
+
+        results = [result for worker_results, _ in replies for result in worker_results]
+        saved = sum(ok for _, ok in results)
+        round_puts = GitHubStandIn.puts - puts
+        round_conflicts = GitHubStandIn.conflicts - conflicts
+        rss = sum(worker_rss for _, worker_rss in replies)
+        cells = []
+        for step in STEPS:
+            p50, p99 = percentiles([timings[step] for timings, _ in results if step in timings])
+            cells.append(f"{p50 + '/' + p99:>17}")
+        conflict_rate = round_conflicts / round_puts if round_puts else 0.0
+        print(f"{round_number + 1:>5} {rows:>8} " + " ".join(cells)
+              + f" {saved:>3}/{args.sessions:<3} {conflict_rate:>10.1%} {rss:>8.0f}"
+              + f" {(rss - baseline) / args.sessions:>11.1f}")
+
+    for conn in pipes:
+        conn.send(None)
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()